@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the probe, convert and split pipeline
+
+Synthesizes deterministic fixtures with ffmpeg (sine and pink-noise audio,
+CBR/VBR MP3 and MP4 with AAC audio), then times ``get_file_info``,
+``convert_video_to_mp3`` and ``MediaProcessor.split_media`` on them. Every
+run happens in a fresh interpreter with an empty cache directory so the
+numbers cover cold work only, and the results are written as JSON so runs
+from different commits can be compared:
+
+    python benchmarks/run_benchmarks.py --profile quick
+    python benchmarks/run_benchmarks.py --profile quick --compare benchmarks/results/<old>.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows: wall and CPU time of this process only
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+
+DEFAULT_FIXTURE_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+# Fixture durations in seconds for each profile
+PROFILES = {
+    'quick': (60, 600),
+    'standard': (60, 600, 3600),
+    'full': (60, 600, 3600, 36000),
+}
+
+# name: (extension, ffmpeg arguments producing it from a duration)
+FIXTURE_KINDS = {
+    'sine_cbr': ('mp3', lambda seconds: [
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={seconds}',
+        '-ac', '2', '-c:a', 'libmp3lame', '-b:a', '128k',
+    ]),
+    'noise_vbr': ('mp3', lambda seconds: [
+        '-f', 'lavfi', '-i', f'anoisesrc=color=pink:amplitude=0.3:seed=42:sample_rate=44100:duration={seconds}',
+        '-ac', '2', '-c:a', 'libmp3lame', '-q:a', '4',
+    ]),
+    'sine_aac': ('mp4', lambda seconds: [
+        '-f', 'lavfi', '-i', f'testsrc=size=160x120:rate=1:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=44100:duration={seconds}',
+        '-c:v', 'mpeg4', '-q:v', '31', '-c:a', 'aac', '-b:a', '128k', '-ac', '2', '-shortest',
+    ]),
+}
+
+PART_COUNTS = (2, 10, 100)
+SPLIT_MODES = ('copy', 'segment', 'stream', 'encode')
+
+# pydub holds the whole decoded file in memory (~635 MB per hour of 44.1 kHz
+# stereo), so longer fixtures skip conversion ("encode" splits map the PCM from disk)
+MAX_IN_MEMORY_SECONDS = 3600
+
+# Slowdowns smaller than this are timer noise, whatever the percentage
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def fixture_name(kind, seconds):
+    extension = FIXTURE_KINDS[kind][0]
+    return f"{kind}_{seconds}s.{extension}"
+
+
+def ensure_fixtures(fixture_dir, durations):
+    """
+    Create the fixtures for ``durations`` that don't exist yet. The lavfi
+    sources are deterministic, so existing files are reused between runs.
+
+    Returns:
+        list: ``(kind, seconds, path)`` for every fixture
+    """
+    from src.config import setup_ffmpeg, get_ffmpeg_path
+
+    if not setup_ffmpeg():
+        raise RuntimeError("FFmpeg configuration failed. Cannot create fixtures.")
+    os.makedirs(fixture_dir, exist_ok=True)
+
+    fixtures = []
+    for seconds in durations:
+        for kind, (_, make_args) in FIXTURE_KINDS.items():
+            path = os.path.join(fixture_dir, fixture_name(kind, seconds))
+            if not os.path.exists(path):
+                print(f"🎛️  Creating fixture: {os.path.basename(path)}")
+                temp_path = path + ".tmp" + os.path.splitext(path)[1]
+                result = subprocess.run(
+                    [get_ffmpeg_path(), '-y', '-v', 'error'] + make_args(seconds) + [temp_path],
+                    stdin=subprocess.DEVNULL, capture_output=True, text=True
+                )
+                if result.returncode != 0:
+                    raise RuntimeError(f"Creating {os.path.basename(path)} failed: {result.stderr.strip()}")
+                os.replace(temp_path, path)
+            fixtures.append((kind, seconds, path))
+    return fixtures
+
+
+def plan_cases(fixtures, modes, part_counts):
+    """
+    Benchmark cases for the fixtures. Cases that can't run (conversions
+    too long to hold in memory, or copy mode on a non-MP3) are kept with a
+    ``skipped`` reason so every result file lists the same cases.
+
+    Returns:
+        list: Case dicts with ``id``, ``operation``, ``input`` and options
+    """
+    cases = []
+    for kind, seconds, path in fixtures:
+        name = os.path.basename(path)
+        is_mp3 = name.endswith('.mp3')
+        cases.append({'id': f"probe/{name}", 'operation': 'probe', 'input': path})
+
+        if not is_mp3:
+            case = {'id': f"convert/{name}", 'operation': 'convert', 'input': path}
+            if seconds > MAX_IN_MEMORY_SECONDS:
+                case['skipped'] = "decodes the whole file in memory"
+            cases.append(case)
+
+        for mode in modes:
+            for num_parts in part_counts:
+                case = {
+                    'id': f"split/{mode}/{name}/parts={num_parts}",
+                    'operation': 'split', 'input': path, 'mode': mode, 'num_parts': num_parts,
+                }
+                if mode == 'copy' and not is_mp3:
+                    case['skipped'] = "copy mode needs an MP3 input"
+                cases.append(case)
+    return cases
+
+
+def _resource_totals():
+    """CPU seconds and peak RSS in MB of this process and its waited-for children."""
+    if resource is None:
+        return time.process_time(), None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    peak_rss = max(own.ru_maxrss, children.ru_maxrss) * unit / (1024 * 1024)
+    return cpu, peak_rss
+
+
+def _bytes_written(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def run_case(case, work_dir, bitrate):
+    """
+    Run one case in this process and measure it. Called in a fresh
+    interpreter by ``measure_case``; FFmpeg setup happens before timing.
+
+    Returns:
+        dict: ``wall_seconds``, ``cpu_seconds``, ``peak_rss_mb`` and
+              ``bytes_written``
+    """
+    from src.config import setup_ffmpeg
+
+    if not setup_ffmpeg():
+        raise RuntimeError("FFmpeg configuration failed. Cannot proceed.")
+
+    operation = case['operation']
+    output = os.path.join(work_dir, 'output')
+    cpu_start, _ = _resource_totals()
+    start = time.perf_counter()
+
+    if operation == 'probe':
+        from src.utils import get_file_info
+        get_file_info(case['input'], use_cache=False)
+        output = None
+    elif operation == 'convert':
+        from src.utils import convert_video_to_mp3
+        output += '.mp3'
+        convert_video_to_mp3(case['input'], output, bitrate=bitrate)
+    elif operation == 'split':
+        from src.mp3_splitter import MediaProcessor
+        processor = MediaProcessor(case['input'], use_cache=False)
+        processor.split_media(case['num_parts'], output, bitrate=bitrate, mode=case['mode'])
+    else:
+        raise ValueError(f"Unknown benchmark operation: {operation}")
+
+    wall = time.perf_counter() - start
+    cpu_end, peak_rss = _resource_totals()
+    return {
+        'wall_seconds': round(wall, 4),
+        'cpu_seconds': round(cpu_end - cpu_start, 4),
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'bytes_written': _bytes_written(output) if output else 0,
+    }
+
+
+def measure_case(case, bitrate, repeat=1, verbose=False):
+    """
+    Run ``case`` ``repeat`` times, each in a fresh interpreter with an empty
+    cache directory, and summarise the runs (median times, largest RSS).
+    """
+    runs = []
+    for _ in range(repeat):
+        work_dir = tempfile.mkdtemp(prefix="mp3_splitter_bench_")
+        try:
+            result_file = os.path.join(work_dir, 'result.json')
+            env = dict(os.environ, MP3_SPLITTER_CACHE_DIR=os.path.join(work_dir, 'cache'))
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(case),
+                 '--work-dir', work_dir, '--result-file', result_file, '--bitrate', bitrate],
+                cwd=PROJECT_ROOT, env=env, stdin=subprocess.DEVNULL,
+                stdout=None if verbose else subprocess.DEVNULL,
+                stderr=None if verbose else subprocess.PIPE, text=True
+            )
+            if completed.returncode != 0 or not os.path.exists(result_file):
+                error = (completed.stderr or '').strip().splitlines()
+                return {'error': error[-1] if error else f"exit code {completed.returncode}"}
+            with open(result_file, 'r', encoding='utf-8') as f:
+                runs.append(json.load(f))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    rss = [run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None]
+    return {
+        'wall_seconds': statistics.median(run['wall_seconds'] for run in runs),
+        'cpu_seconds': statistics.median(run['cpu_seconds'] for run in runs),
+        'peak_rss_mb': max(rss) if rss else None,
+        'bytes_written': runs[-1]['bytes_written'],
+        'runs': [run['wall_seconds'] for run in runs],
+    }
+
+
+def _command_output(cmd):
+    try:
+        return subprocess.run(cmd, cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def environment_info(profile, bitrate, repeat):
+    """Where and on what the benchmarks ran, stored alongside the results."""
+    from src.config import get_ffmpeg_path
+
+    commit = _command_output(['git', 'rev-parse', 'HEAD'])
+    ffmpeg_version = _command_output([get_ffmpeg_path(), '-version']).splitlines()
+    return {
+        'commit': commit or None,
+        'dirty': bool(_command_output(['git', 'status', '--porcelain', '--untracked-files=no'])),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'profile': profile,
+        'bitrate': bitrate,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ffmpeg': ffmpeg_version[0] if ffmpeg_version else None,
+    }
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Print the wall-time change of every case found in both result sets.
+
+    Returns:
+        int: Number of cases slower than ``threshold`` (a fraction)
+    """
+    old_cases = {case['id']: case for case in baseline['cases']}
+    regressions = 0
+    print(f"📊 Compared with {(baseline['environment'].get('commit') or 'unknown')[:12]}")
+    for case in current['cases']:
+        old = old_cases.get(case['id'])
+        if not old or 'wall_seconds' not in case or 'wall_seconds' not in old or not old['wall_seconds']:
+            continue
+        change = case['wall_seconds'] / old['wall_seconds'] - 1
+        marker = "  "
+        if change > threshold and case['wall_seconds'] - old['wall_seconds'] >= MIN_REGRESSION_SECONDS:
+            marker = "⚠️ "
+            regressions += 1
+        print(f"{marker}{case['id']}: {old['wall_seconds']:.3f}s → {case['wall_seconds']:.3f}s ({change:+.1%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark probing, conversion and splitting")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default='quick',
+                        help="Fixture durations: quick (1-10 min), standard (up to 1 h), full (up to 10 h)")
+    parser.add_argument("--modes", default=','.join(SPLIT_MODES),
+                        help=f"Comma-separated split modes to time (default: {','.join(SPLIT_MODES)})")
+    parser.add_argument("--parts", default=','.join(str(n) for n in PART_COUNTS),
+                        help="Comma-separated part counts (default: %(default)s)")
+    parser.add_argument("--filter", default='', help="Only run cases whose id contains this text")
+    parser.add_argument("--bitrate", default='320k', help="Bitrate for converted and encoded parts")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; times are medians")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR, help="Fixture directory (reused)")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Slowdown reported as a regression (default: 0.10 = 10%%)")
+    parser.add_argument("--verbose", action="store_true", help="Show the splitter's own output")
+    # Internal: run a single case in this interpreter
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.run_case:
+        result = run_case(json.loads(args.run_case), args.work_dir, args.bitrate)
+        with open(args.result_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return 0
+
+    modes = [mode for mode in args.modes.split(',') if mode]
+    unknown = set(modes) - set(SPLIT_MODES)
+    if unknown:
+        print(f"❌ Unknown split mode(s): {', '.join(sorted(unknown))}")
+        return 2
+    part_counts = [int(count) for count in args.parts.split(',') if count]
+
+    fixtures = ensure_fixtures(args.fixtures, PROFILES[args.profile])
+    cases = [case for case in plan_cases(fixtures, modes, part_counts) if args.filter in case['id']]
+
+    print(f"⏱️  Running {len(cases)} benchmark cases ({args.profile} profile)")
+    results = []
+    for case in cases:
+        entry = {key: value for key, value in case.items() if key != 'input'}
+        entry['input'] = os.path.basename(case['input'])
+        if 'skipped' not in case:
+            entry.update(measure_case(case, args.bitrate, args.repeat, args.verbose))
+        results.append(entry)
+
+        if 'skipped' in entry:
+            print(f"   ⏭️  {case['id']}: skipped ({entry['skipped']})")
+        elif 'error' in entry:
+            print(f"   ❌ {case['id']}: {entry['error']}")
+        else:
+            rss = f"{entry['peak_rss_mb']:.0f} MB" if entry['peak_rss_mb'] is not None else "n/a"
+            print(f"   ✅ {case['id']}: {entry['wall_seconds']:.3f}s wall, "
+                  f"{entry['cpu_seconds']:.3f}s CPU, {rss} peak RSS, "
+                  f"{entry['bytes_written'] / (1024 * 1024):.1f} MB written")
+
+    report = {'environment': environment_info(args.profile, args.bitrate, args.repeat), 'cases': results}
+    output = args.output
+    if not output:
+        commit = (report['environment']['commit'] or 'nogit')[:12]
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Results saved: {output}")
+
+    failed = sum(1 for entry in results if 'error' in entry)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, report, args.threshold)
+        if regressions:
+            print(f"⚠️  {regressions} case(s) slower than {args.threshold:.0%}")
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
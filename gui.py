@@ -9,6 +9,8 @@ import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 
+import numpy as np
+
 # Add src to path
 current_dir = os.path.dirname(os.path.abspath(__file__))
 src_path = os.path.join(current_dir, 'src')
@@ -16,6 +18,167 @@ if src_path not in sys.path:
     sys.path.insert(0, src_path)
 
 from src.mp3_splitter import MediaProcessor
+from src.sniff import sniff_media
+from src.peaks import cached_peak_index
+from src.utils import calculate_part_ranges, format_time
+from src.progress import SplitCancelled, format_progress
+from src.metrics import configure_logging
+
+# Split mode labels shown in the GUI -> MediaProcessor.split_media modes
+SPLIT_MODE_LABELS = {
+    "Re-encode": "encode",
+    "Lossless copy (MP3 only)": "copy",
+    "Single pass (FFmpeg)": "segment",
+    "Low memory (streaming)": "stream",
+}
+
+WAVEFORM_HEIGHT = 90
+WAVEFORM_COLOR = "#4a78c2"
+CUT_COLOR = "#d9342b"
+
+
+class WaveformView:
+    """
+    Waveform of the selected file, drawn from its peak index (see
+    ``src/peaks.py``), with the proposed part boundaries overlaid.
+
+    Drag a boundary to move it; the mouse wheel zooms around the pointer,
+    Shift+wheel scrolls and a double click shows the whole file again.
+    Every redraw folds the index into one min/max per pixel column, so it
+    stays interactive however long the file is.
+    """
+
+    GRAB_PIXELS = 6
+    ZOOM_FACTOR = 1.25
+    # Closest two cuts may be dragged together
+    MIN_PART_MS = 100
+
+    def __init__(self, parent, on_cuts_changed=None):
+        self.canvas = tk.Canvas(parent, height=WAVEFORM_HEIGHT, background="white", highlightthickness=0)
+        self.on_cuts_changed = on_cuts_changed
+        self.index = None
+        self.message = "Select a file to see its waveform"
+        self.cuts_ms = []
+        self.edited = False
+        self.view = (0, 0)
+        self.dragging = None
+
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<ButtonPress-1>", self.start_drag)
+        self.canvas.bind("<B1-Motion>", self.drag)
+        self.canvas.bind("<ButtonRelease-1>", self.end_drag)
+        self.canvas.bind("<Double-Button-1>", lambda e: self.show_all())
+        self.canvas.bind("<MouseWheel>", lambda e: self.zoom(e.x, e.delta > 0))
+        self.canvas.bind("<Shift-MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        # X11 reports the wheel as buttons 4 and 5
+        self.canvas.bind("<Button-4>", lambda e: self.zoom(e.x, True))
+        self.canvas.bind("<Button-5>", lambda e: self.zoom(e.x, False))
+        self.canvas.bind("<Shift-Button-4>", lambda e: self.scroll(-1))
+        self.canvas.bind("<Shift-Button-5>", lambda e: self.scroll(1))
+
+    def show_message(self, message):
+        """Replace the waveform with a line of text (while loading, or on errors)."""
+        self.index = None
+        self.message = message
+        self.redraw()
+
+    def set_index(self, index):
+        self.index = index
+        self.show_all()
+
+    def set_cuts(self, cuts_ms):
+        """Show proposed cut points (ms), discarding any the user moved."""
+        self.cuts_ms = list(cuts_ms)
+        self.edited = False
+        self.redraw()
+
+    def show_all(self):
+        if self.index:
+            self.view = (0, self.index.frame_count)
+        self.redraw()
+
+    def _width(self):
+        return max(1, self.canvas.winfo_width())
+
+    def _x(self, time_ms):
+        start, end = self.view
+        return (time_ms * self.index.sample_rate / 1000 - start) * self._width() / max(1, end - start)
+
+    def _time_ms(self, x):
+        start, end = self.view
+        return (start + x * (end - start) / self._width()) * 1000 / self.index.sample_rate
+
+    def redraw(self):
+        self.canvas.delete("all")
+        width, height = self._width(), WAVEFORM_HEIGHT
+        if self.index is None:
+            self.canvas.create_text(width / 2, height / 2, text=self.message, fill="gray", font=("Arial", 9))
+            return
+
+        middle, scale = height / 2, height / 2 - 2
+        mins, maxs = self.index.columns(*self.view, width)
+        # One polygon: along the maxima, back along the minima
+        xs = np.arange(width, dtype=float)
+        outline = np.concatenate((np.column_stack((xs, middle - maxs * scale)).ravel(),
+                                  np.column_stack((xs[::-1], middle - mins[::-1] * scale)).ravel()))
+        self.canvas.create_polygon(outline.tolist(), fill=WAVEFORM_COLOR, outline=WAVEFORM_COLOR)
+        self.canvas.create_line(0, middle, width, middle, fill=WAVEFORM_COLOR)
+
+        # Part numbers sit after each part's start: part_001 before the first cut, and so on
+        for i, start_ms in enumerate([0.0] + self.cuts_ms):
+            x = self._x(start_ms)
+            if i and 0 <= x <= width:
+                self.canvas.create_line(x, 0, x, height, fill=CUT_COLOR, width=2)
+            if -40 < x < width:
+                self.canvas.create_text(max(x, 0) + 3, 2, text=f"{i+1:03d}", anchor="nw",
+                                        fill=CUT_COLOR, font=("Arial", 7))
+
+    def start_drag(self, event):
+        if self.index is None:
+            return
+        distances = [abs(self._x(cut) - event.x) for cut in self.cuts_ms]
+        if distances and min(distances) <= self.GRAB_PIXELS:
+            self.dragging = distances.index(min(distances))
+
+    def drag(self, event):
+        if self.dragging is None:
+            return
+        i = self.dragging
+        lowest = (self.cuts_ms[i - 1] if i else 0) + self.MIN_PART_MS
+        highest = (self.cuts_ms[i + 1] if i + 1 < len(self.cuts_ms) else self.index.duration_ms) - self.MIN_PART_MS
+        if lowest > highest:
+            return  # No room between its neighbours: leave the cut where it is
+        self.cuts_ms[i] = round(min(max(self._time_ms(event.x), lowest), highest), 3)
+        self.edited = True
+        self.redraw()
+
+    def end_drag(self, event):
+        if self.dragging is not None:
+            self.dragging = None
+            if self.on_cuts_changed:
+                self.on_cuts_changed(self.cuts_ms)
+
+    def zoom(self, x, zoom_in):
+        if self.index is None:
+            return
+        start, end = self.view
+        # The sample under the pointer stays put; at most one sample per pixel, at least the whole file
+        anchor = start + x * (end - start) / self._width()
+        span = (end - start) / self.ZOOM_FACTOR if zoom_in else (end - start) * self.ZOOM_FACTOR
+        span = min(max(span, self._width()), self.index.frame_count)
+        start = anchor - (anchor - start) * span / max(1, end - start)
+        start = min(max(0, start), self.index.frame_count - span)
+        self.view = (start, start + span)
+        self.redraw()
+
+    def scroll(self, direction):
+        if self.index is None:
+            return
+        start, end = self.view
+        shift = (end - start) * 0.1 * direction
+        shift = min(max(shift, -start), self.index.frame_count - end)
+        self.view = (start + shift, end + shift)
+        self.redraw()
 
 
 class MediaProcessorGUI:
@@ -23,14 +186,19 @@ class MediaProcessorGUI:
         # Setup the main window
         self.root = tk.Tk()
         self.root.title("🎵 Media Processor Pro")
-        self.root.geometry("700x600")  # Good default size
-        self.root.minsize(650, 550)   # Set minimum size
+        self.root.geometry("700x720")  # Good default size
+        self.root.minsize(650, 660)   # Set minimum size
         self.root.resizable(True, True)
 
         # Initialize variables
         self.input_file = None
         self.processing = False
         self.media_info = None
+        self.cancel_event = threading.Event()
+        # Bumped on every file selection so stale analysis results are dropped
+        self.analysis_id = 0
+        # Set when another file is selected, so its predecessor's waveform decode stops
+        self.waveform_cancel = threading.Event()
 
         self.setup_ui()
 
@@ -100,6 +268,15 @@ class MediaProcessorGUI:
         )
         self.media_info_label.pack(anchor="w")
 
+        self.waveform = WaveformView(self.info_frame, on_cuts_changed=self.show_custom_cuts)
+        self.waveform.canvas.pack(fill="x", pady=(8, 0))
+        tk.Label(
+            self.info_frame,
+            text="Drag a red line to move a cut • Wheel: zoom • Shift+Wheel: scroll • Double-click: whole file",
+            font=("Arial", 8),
+            foreground="gray"
+        ).pack(anchor="w")
+
         # Processing options
         options_frame = ttk.LabelFrame(self.main_frame, text="Processing Options", padding="10")
         options_frame.pack(fill="x", pady=(0, 15))
@@ -119,6 +296,21 @@ class MediaProcessorGUI:
         )
         quality_options.pack(side="left", padx=(10, 0))
 
+        # Split mode selection
+        mode_frame = ttk.Frame(options_frame)
+        mode_frame.pack(fill="x", pady=5)
+
+        tk.Label(mode_frame, text="Split Mode:", font=("Arial", 9)).pack(side="left")
+        self.split_mode_var = tk.StringVar(value="Re-encode")
+        mode_options = ttk.Combobox(
+            mode_frame,
+            values=list(SPLIT_MODE_LABELS),
+            textvariable=self.split_mode_var,
+            state="readonly",
+            width=24
+        )
+        mode_options.pack(side="left", padx=(10, 0))
+
         # Splitting options
         splitting_frame = ttk.Frame(options_frame)
         splitting_frame.pack(fill="x", pady=10)
@@ -132,6 +324,13 @@ class MediaProcessorGUI:
         )
         self.split_check.pack(anchor="w")
 
+        self.silence_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            splitting_frame,
+            text="Cut at the quietest point near each split (avoids chopping words)",
+            variable=self.silence_var
+        ).pack(anchor="w")
+
         # Splitting details frame
         self.splitting_details_frame = ttk.Frame(options_frame)
         self.splitting_details_frame.pack(fill="x", pady=5)
@@ -165,6 +364,14 @@ class MediaProcessorGUI:
         )
         self.process_button.pack(fill="x", pady=5)
 
+        self.cancel_button = ttk.Button(
+            button_frame,
+            text="⛔ CANCEL",
+            command=self.cancel_processing,
+            state="disabled"
+        )
+        self.cancel_button.pack(fill="x", pady=5)
+
         # Output info
         self.output_label = tk.Label(
             self.main_frame,
@@ -212,6 +419,7 @@ class MediaProcessorGUI:
             if self.media_info:
                 self.update_duration_info()
         else:
+            self.waveform.set_cuts([])
             # Show disabled state message
             disabled_label = tk.Label(
                 self.splitting_details_frame,
@@ -224,9 +432,9 @@ class MediaProcessorGUI:
     def browse_file(self):
         """Open file browser to select media file"""
         file_types = [
-            ("Media Files", "*.mp4 *.avi *.mov *.wmv *.mkv *.mp3 *.wav *.flac *.m4a *.aac"),
+            ("Media Files", "*.mp4 *.avi *.mov *.wmv *.mkv *.mp3 *.wav *.flac *.m4a *.m4b *.aac"),
             ("Video Files", "*.mp4 *.avi *.mov *.wmv *.mkv"),
-            ("Audio Files", "*.mp3 *.wav *.flac *.m4a *.aac"),
+            ("Audio Files", "*.mp3 *.wav *.flac *.m4a *.m4b *.aac"),
             ("All Files", "*.*")
         ]
 
@@ -245,10 +453,14 @@ class MediaProcessorGUI:
             if os.path.exists(file_path):
                 # Get basic file info
                 file_size = os.path.getsize(file_path) / (1024 * 1024)
-                file_ext = os.path.splitext(file_path)[1].lower()
-
-                file_type = "Video" if file_ext in ['.mp4', '.avi', '.mov', '.wmv', '.mkv'] else "Audio"
-                info_text = f"{file_type} file • {file_size:.2f} MB • {file_ext.upper()}"
+                kind = sniff_media(file_path)
+                if kind is None:
+                    self.file_info_label.configure(text=f"Not a supported media file • {file_size:.2f} MB")
+                    self.media_info_label.configure(text="")
+                    return
+
+                file_type = "Video" if kind['is_video'] else "Audio"
+                info_text = f"{file_type} file • {file_size:.2f} MB • {kind['container'].upper()}"
                 self.file_info_label.configure(text=info_text)
 
                 # Get detailed media info
@@ -257,21 +469,93 @@ class MediaProcessorGUI:
             self.file_info_label.configure(text="Could not read file info")
 
     def load_media_info(self, file_path):
-        """Load detailed media information"""
-        try:
-            processor = MediaProcessor(file_path)
-            self.media_info = processor.get_media_info()
+        """Load detailed media information without blocking the window"""
+        self.analysis_id += 1
+        self.waveform_cancel.set()
+        self.media_info = None
+        self.media_info_label.configure(text="Analyzing media...")
+        self.waveform.set_cuts([])
+        self.waveform.show_message("Analyzing media...")
 
-            info_text = f"Duration: {self.media_info['formatted_duration']} • Size: {self.media_info['file_size_mb']} MB"
-            if self.media_info['is_video']:
-                info_text += " • Type: Video"
-            else:
-                info_text += " • Type: Audio"
+        thread = threading.Thread(
+            target=self._load_media_info_thread,
+            args=(file_path, self.analysis_id)
+        )
+        thread.daemon = True
+        thread.start()
 
-            self.media_info_label.configure(text=info_text)
-            self.update_duration_info()
+    def _load_media_info_thread(self, file_path, analysis_id):
+        """Probe the file in the background and hand the result to the Tk thread"""
+        try:
+            media_info = MediaProcessor(file_path).get_media_info()
         except Exception:
+            media_info = None
+        self.root.after(0, lambda: self._show_media_info(media_info, analysis_id))
+
+    def _show_media_info(self, media_info, analysis_id):
+        if analysis_id != self.analysis_id:
+            return  # Another file was selected meanwhile
+        if media_info is None:
             self.media_info_label.configure(text="Could not load media details")
+            return
+
+        self.media_info = media_info
+        info_text = f"Duration: {self.media_info['formatted_duration']} • Size: {self.media_info['file_size_mb']} MB"
+        if self.media_info['is_video']:
+            info_text += " • Type: Video"
+        else:
+            info_text += " • Type: Audio"
+
+        self.media_info_label.configure(text=info_text)
+        self.update_duration_info()
+        self.load_waveform(self.input_file, analysis_id)
+
+    def load_waveform(self, file_path, analysis_id):
+        """Build (or fetch from the cache) the file's peak index in the background"""
+        self.waveform.show_message("Building waveform...")
+        duration_ms = self.media_info['duration_ms']
+        sample_rate, channels = self.media_info.get('sample_rate'), self.media_info.get('channels')
+        cancel_event = self.waveform_cancel = threading.Event()
+
+        def report(processed_ms):
+            percent = min(100, int(processed_ms * 100 / max(1, duration_ms)))
+            self.root.after(0, lambda: self._show_waveform_progress(percent, analysis_id))
+
+        def build():
+            try:
+                index = cached_peak_index(file_path, sample_rate, channels, on_progress=report,
+                                          cancel_event=cancel_event)
+            except SplitCancelled:
+                return  # Another file was selected
+            except Exception:
+                index = None
+            self.root.after(0, lambda: self._show_waveform(index, analysis_id))
+
+        thread = threading.Thread(target=build)
+        thread.daemon = True
+        thread.start()
+
+    def _show_waveform_progress(self, percent, analysis_id):
+        if analysis_id == self.analysis_id and self.waveform.index is None:
+            self.waveform.show_message(f"Building waveform... {percent}%")
+
+    def _show_waveform(self, index, analysis_id):
+        if analysis_id != self.analysis_id:
+            return  # Another file was selected meanwhile
+        if index is None:
+            self.waveform.show_message("Could not build the waveform")
+            return
+        self.waveform.set_index(index)
+
+    def show_custom_cuts(self, cuts_ms):
+        """Describe the parts after a cut was dragged on the waveform"""
+        if not self.split_var.get() or not self.media_info:
+            return
+        edges = [0] + list(cuts_ms) + [self.media_info['duration_ms']]
+        lengths = [end - start for start, end in zip(edges, edges[1:])]
+        self.duration_info_label.configure(
+            text=f"Custom cut points: parts of {format_time(min(lengths))} to {format_time(max(lengths))}"
+        )
 
     def update_duration_info(self):
         """Update duration per part information"""
@@ -286,6 +570,9 @@ class MediaProcessorGUI:
                     seconds = int(total_seconds % 60)
                     duration_text = f"Duration per part: {minutes:02d}:{seconds:02d}"
                     self.duration_info_label.configure(text=duration_text)
+                    # Equal cuts as the split would place them (before any silence search)
+                    ranges = calculate_part_ranges(duration_ms, num_parts, self.media_info.get('sample_rate'))
+                    self.waveform.set_cuts([start for start, _ in ranges[1:]])
             except Exception:
                 self.duration_info_label.configure(text="Duration per part: --:--")
 
@@ -303,7 +590,11 @@ class MediaProcessorGUI:
                     return False
                     
                 # Ask for confirmation with duration info
-                if self.media_info and self.media_info.get('duration_ms', 0) > 0:
+                if self.waveform.edited:
+                    confirm_msg = f"Split into {num_parts} parts at the cut points on the waveform?"
+                    if not messagebox.askyesno("Confirm Splitting", confirm_msg):
+                        return False
+                elif self.media_info and self.media_info.get('duration_ms', 0) > 0:
                     duration_ms = self.media_info['duration_ms']
                     part_duration_ms = duration_ms / num_parts
                     total_seconds = part_duration_ms / 1000
@@ -327,40 +618,56 @@ class MediaProcessorGUI:
             return
 
         self.processing = True
+        self.cancel_event.clear()
         self.process_button.configure(state="disabled", text="PROCESSING...")
+        self.cancel_button.configure(state="normal")
         self.progress_bar['value'] = 0
         self.status_label.configure(text="Initializing...")
         self.output_label.configure(text="")
 
         split_media = self.split_var.get()
         num_parts = int(self.parts_var.get()) if split_media else 1
-
-        thread = threading.Thread(target=self._process_media_thread, args=(num_parts, split_media))
+        split_mode = SPLIT_MODE_LABELS[self.split_mode_var.get()]
+        split_strategy = "silence" if self.silence_var.get() else "equal"
+        # Cut points moved on the waveform are used exactly as placed
+        cut_points_ms = list(self.waveform.cuts_ms) if split_media and self.waveform.edited else None
+        if cut_points_ms is not None:
+            num_parts, split_strategy = None, "equal"
+
+        thread = threading.Thread(
+            target=self._process_media_thread,
+            args=(num_parts, split_media, split_mode, split_strategy, cut_points_ms)
+        )
         thread.daemon = True
         thread.start()
 
-    def _process_media_thread(self, num_parts, split_media):
+    def _process_media_thread(self, num_parts, split_media, split_mode="encode", split_strategy="equal",
+                              cut_points_ms=None):
         """Processing logic"""
         try:
-            self.update_status("Loading media file...", 10)
+            self.update_status("Loading media file...", 2)
             processor = MediaProcessor(self.input_file)
             info = processor.get_media_info()
             is_video = info['is_video']
 
             if is_video:
                 if split_media:
-                    self.update_status("Converting video to MP3 and splitting...", 30)
+                    self.update_status("Converting video to MP3 and splitting...", 5)
                 else:
-                    self.update_status("Converting video to MP3...", 30)
+                    self.update_status("Converting video to MP3...", 5)
             else:
                 if split_media:
-                    self.update_status("Splitting audio file...", 30)
+                    self.update_status("Splitting audio file...", 5)
                 else:
-                    self.update_status("Processing audio file...", 30)
+                    self.update_status("Processing audio file...", 5)
 
             if split_media:
-                self.update_status("Processing and splitting...", 60)
-                converted_path, output_files = processor.split_media(num_parts, bitrate=self.quality_var.get())
+                converted_path, output_files = processor.split_media(
+                    num_parts, bitrate=self.quality_var.get(), mode=split_mode,
+                    split_strategy=split_strategy, progress_callback=self.report_progress,
+                    cancel_event=self.cancel_event, cut_points_ms=cut_points_ms,
+                    keep_converted=is_video
+                )
             else:
                 self.update_status("Converting media...", 60)
                 converted_path = processor.convert_to_mp3(bitrate=self.quality_var.get())
@@ -385,6 +692,9 @@ class MediaProcessorGUI:
             # Don't cleanup to preserve converted files
             # processor.cleanup()
 
+        except SplitCancelled:
+            self.update_status("Cancelled", 0)
+            self.root.after(0, lambda: self.output_label.configure(text="⛔ Processing cancelled"))
         except Exception as e:
             self.root.after(0, lambda: self.show_error(f"Error: {str(e)}"))
         finally:
@@ -394,6 +704,22 @@ class MediaProcessorGUI:
         self.root.after(0, lambda: self.status_label.configure(text=message))
         self.root.after(0, lambda: self.progress_bar.configure(value=progress))
 
+    def report_progress(self, info):
+        """Progress callback from split_media (runs on the worker thread)"""
+        if info['event'] == 'stage':
+            message = f"{info['message']}..."
+        else:
+            message = f"{info['message']} • {format_progress(info)}"
+        # Keep 10% for loading and analysis before the split itself starts
+        self.update_status(message, 10 + info['fraction'] * 90)
+
+    def cancel_processing(self):
+        """Ask the running split to stop at its next progress point"""
+        if self.processing:
+            self.cancel_event.set()
+            self.cancel_button.configure(state="disabled")
+            self.status_label.configure(text="Cancelling...")
+
     def show_error(self, message):
         messagebox.showerror("Processing Error", message)
         self.output_label.configure(text="❌ Processing failed!")
@@ -401,6 +727,7 @@ class MediaProcessorGUI:
     def processing_complete(self):
         self.processing = False
         self.process_button.configure(state="normal", text="🔄 PROCESS MEDIA")
+        self.cancel_button.configure(state="disabled")
 
     def run(self):
         self.root.mainloop()
@@ -485,6 +812,8 @@ class MediaProcessorWithPreservation(MediaProcessor):
 
 
 if __name__ == "__main__":
+    configure_logging()
+    
     # Replace the original MediaProcessor with our preservation version
     import src.mp3_splitter
     src.mp3_splitter.MediaProcessor = MediaProcessorWithPreservation
@@ -14,11 +14,13 @@ if src_path not in sys.path:
 
 try:
     from src.mp3_splitter import MediaProcessor
+    from src.metrics import configure_logging
 except ImportError as e:
     print(f"❌ Import error: {e}")
     sys.exit(1)
 
 def main():
+    configure_logging()
     print("🎵 Enhanced Media Processor")
     print("===========================")
     print("Supports: MP4, AVI, MOV, WMV + MP3, WAV, FLAC")
@@ -65,11 +67,11 @@ def main():
         
         # Process the media file
         print(f"\nStarting {action} process...")
-        converted_path, output_files = processor.split_media(num_parts)
+        converted_path, output_files = processor.split_media(num_parts, keep_converted=info['is_video'])
         
         # Display results
         print(f"\n🎉 Successfully created {len(output_files)} parts!")
-        if info['is_video']:
+        if converted_path:
             print(f"🎥 Converted: {os.path.basename(converted_path)}")
         print(f"📁 Output folder: {os.path.dirname(output_files[0])}")
         
@@ -5,32 +5,225 @@ Enhanced Media Processor - Command Line Version
 
 import os
 import sys
+import time
+import argparse
 
 # Auto-configure paths
 current_dir = os.path.dirname(os.path.abspath(__file__))
 src_path = os.path.join(current_dir, 'src')
 sys.path.insert(0, src_path)
 
-from src.mp3_splitter import MediaProcessor
+from src.mp3_splitter import MediaProcessor, SPLIT_MODES, SPLIT_STRATEGIES, DEFAULT_SILENCE_WINDOW_MS
+from src.batch import BatchProcessor
+from src.ffmpeg_tools import OUTPUT_FORMATS
+from src.scheduler import AUTO_WORKERS
+from src.progress import SplitCancelled, format_progress
+from src.metrics import configure_logging, configure_metrics, flush_metrics, LOG_LEVELS, METRICS_FORMATS
 
-def main():
-    if len(sys.argv) != 3:
-        print("Enhanced Media Processor - Command Line Interface")
-        print("Supports: MP4, AVI, MOV, WMV + MP3, WAV, FLAC")
-        print("Usage: python simple_splitter.py <media_file> <num_parts>")
-        print("Example: python simple_splitter.py 'video.mp4' 5")
+# Seconds between progress lines while a single ffmpeg pass is running
+PROGRESS_INTERVAL = 5
+
+def jobs_count(value):
+    """``--jobs`` value: a count, or "auto" to let the splitter tune it."""
+    if value == AUTO_WORKERS:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a number or '{AUTO_WORKERS}', got '{value}'")
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Enhanced Media Processor - Command Line Interface. "
+                    "Supports: MP4, AVI, MOV, WMV + MP3, WAV, FLAC",
+        epilog="Examples: python simple_splitter.py 'video.mp4' 5\n"
+               "          python simple_splitter.py 'podcast.mp3' --mode copy --max-part-size 25\n"
+               "          python simple_splitter.py 'audiobook.m4b' --split-strategy chapters\n"
+               "          python simple_splitter.py --batch videos/ --glob '*.mp4' 5",
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("media_file", nargs="?", help="Path to the media file (omit with --batch)")
+    parser.add_argument("num_parts", nargs="?", help="Number of parts to split into")
+    parser.add_argument("--bitrate", default="320k", help="Audio quality for encoding (default: 320k)")
+    parser.add_argument(
+        "--mode", choices=SPLIT_MODES, default="encode",
+        help="encode: re-encode each part; copy: lossless MP3 split at frame boundaries; "
+             "segment: single ffmpeg pass straight from the source; "
+             "stream: bounded-memory decode piped into each part's encoder"
+    )
+    parser.add_argument(
+        "--output", action="append", dest="outputs", metavar="FORMAT[:BITRATE]",
+        help=f"Write each part in this format too, all from one decode; repeat for several "
+             f"({', '.join(OUTPUT_FORMATS)}; e.g. --output mp3:320k --output opus:64k). "
+             f"Default: MP3 at --bitrate"
+    )
+    parser.add_argument(
+        "--loudness", type=float, metavar="LUFS",
+        help="Normalize every part to this integrated loudness (EBU R128; e.g. -23 broadcast, "
+             "-16 podcasts), measured during the split's own decode; encode mode only"
+    )
+    parser.add_argument(
+        "--keep-converted", action="store_true",
+        help="In segment or encode mode, also keep the full-length MP3 of a video input"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=jobs_count, default=1,
+        help="Encode this many parts concurrently in encode mode, run this many segmenting "
+             "processes in segment mode, or process this many files concurrently with --batch "
+             "(0 = one per available CPU, respecting container CPU limits; auto = in encode mode, "
+             "start there and tune the count to the measured encode throughput)"
+    )
+    parser.add_argument(
+        "--split-strategy", choices=SPLIT_STRATEGIES, default="equal",
+        help="equal: exact equal-length parts; silence: cut at the quietest point near each split; "
+             "chapters: one part per embedded chapter or CUE track (no part count needed)"
+    )
+    parser.add_argument(
+        "--cue", metavar="FILE",
+        help="CUE sheet for --split-strategy chapters (default: a .cue next to the media file)"
+    )
+    parser.add_argument(
+        "--silence-window-ms", type=int, default=DEFAULT_SILENCE_WINDOW_MS,
+        help=f"Search distance either side of each cut for --split-strategy silence "
+             f"(default: {DEFAULT_SILENCE_WINDOW_MS})"
+    )
+    parser.add_argument(
+        "--max-part-duration", type=float, metavar="SECONDS",
+        help="Instead of a number of parts, cut parts of at most this many seconds"
+    )
+    parser.add_argument(
+        "--max-part-size", type=float, metavar="MB",
+        help="Instead of a number of parts, cut parts of at most this many megabytes"
+    )
+    parser.add_argument(
+        "--cuts", metavar="SECONDS,...",
+        help="Instead of a number of parts, cut at exactly these times (e.g. 95.5,310,742.25)"
+    )
+    parser.add_argument(
+        "--fresh", action="store_true",
+        help="Ignore the manifest of an earlier run in the output directory and redo every part"
+    )
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="Decode the source and the parts afterwards and fail unless the parts hold exactly "
+             "the source's samples"
+    )
+    parser.add_argument("--batch", metavar="DIR", help="Split every matching file in DIR")
+    parser.add_argument("--glob", default="*", help="File pattern for --batch (default: *)")
+    parser.add_argument("--recursive", action="store_true", help="Include subdirectories with --batch")
+    parser.add_argument(
+        "--output-root", default="batch_output",
+        help="Root directory for --batch outputs (default: batch_output)"
+    )
+    parser.add_argument(
+        "--log-level", choices=LOG_LEVELS, default="INFO",
+        help="Detail of the processing messages; DEBUG also shows every stage timing (default: INFO)"
+    )
+    parser.add_argument("--metrics", metavar="FILE", help="Write per-stage timing metrics to FILE")
+    parser.add_argument(
+        "--metrics-format", choices=METRICS_FORMATS, default="jsonl",
+        help="jsonl: one JSON line per stage span; prometheus: per-stage totals for the "
+             "node_exporter textfile collector (default: jsonl)"
+    )
+    args = parser.parse_args()
+    
+    # In batch mode the only positional argument is the number of parts
+    if args.batch and args.num_parts is None:
+        args.num_parts, args.media_file = args.media_file, None
+    limited = args.max_part_duration is not None or args.max_part_size is not None or args.cuts is not None
+    by_chapters = args.split_strategy == "chapters"
+    if (args.num_parts is None and not (limited or by_chapters)) or (args.media_file is None and not args.batch):
+        parser.print_usage()
         sys.exit(1)
+    if args.cue and args.batch:
+        print("Error: --cue applies to a single file; with --batch, put a .cue next to each file")
+        sys.exit(1)
+    if args.num_parts is not None and (limited or by_chapters):
+        print("Error: Give only one of a number of parts, --max-part-duration/--max-part-size, "
+              "--cuts or --split-strategy chapters")
+        sys.exit(1)
+    return args
+
+def split_limits(args):
+    """
+    split_media keyword arguments for the --max-part-*, --cuts, --cue, --output, --loudness, --fresh
+    and --verify options.
+    """
+    limits = {}
+    if args.outputs:
+        limits['outputs'] = args.outputs
+    if args.loudness is not None:
+        limits['loudness_target'] = args.loudness
+    if args.fresh:
+        limits['resume'] = False
+    if args.verify:
+        limits['verify'] = True
+    if args.cue:
+        limits['cue_file'] = args.cue
+    if args.max_part_duration is not None:
+        limits['max_part_duration_ms'] = int(args.max_part_duration * 1000)
+    if args.max_part_size is not None:
+        limits['max_part_bytes'] = int(args.max_part_size * 1024 * 1024)
+    if args.cuts is not None:
+        limits['cut_points_ms'] = [float(cut) * 1000 for cut in args.cuts.split(',') if cut.strip()]
+    return limits
+
+def make_progress_printer():
+    """Progress callback that prints throughput and ETA after each part."""
+    last_printed = [0.0]
     
-    input_file = sys.argv[1]
+    def print_progress(info):
+        if info['event'] == 'progress' and time.time() - last_printed[0] < PROGRESS_INTERVAL:
+            return
+        if info['event'] in ('part', 'progress'):
+            last_printed[0] = time.time()
+            print(f"     ⏳ {format_progress(info)}")
+        elif info['event'] == 'done':
+            print(f"📈 {format_progress(info)} • {info['elapsed_seconds']:.1f}s")
     
+    return print_progress
+
+def run_batch(args, num_parts):
     try:
-        num_parts = int(sys.argv[2])
-        if num_parts <= 0:
-            print("Error: Number of parts must be greater than 0")
-            sys.exit(1)
-    except ValueError:
-        print("Error: Number of parts must be a valid integer")
+        batch = BatchProcessor.from_directory(
+            args.batch, args.glob, recursive=args.recursive,
+            output_root=args.output_root, num_parts=num_parts,
+            bitrate=args.bitrate, mode=args.mode, workers=args.jobs,
+            split_strategy=args.split_strategy, silence_window_ms=args.silence_window_ms,
+            **split_limits(args)
+        )
+        results = batch.run()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    
+    if any(result['error'] for result in results):
         sys.exit(1)
+
+def main():
+    args = parse_args()
+    input_file = args.media_file
+    configure_logging(args.log_level)
+    if args.metrics:
+        configure_metrics(args.metrics, args.metrics_format)
+    
+    num_parts = None
+    if args.num_parts is not None:
+        try:
+            num_parts = int(args.num_parts)
+            if num_parts <= 0:
+                print("Error: Number of parts must be greater than 0")
+                sys.exit(1)
+        except ValueError:
+            print("Error: Number of parts must be a valid integer")
+            sys.exit(1)
+    
+    if args.batch:
+        try:
+            run_batch(args, num_parts)
+        finally:
+            flush_metrics()
+        return
     
     try:
         print("🚀 Starting Enhanced Media Processor...")
@@ -41,17 +234,30 @@ def main():
         print(f"Type: {'Video' if info['is_video'] else 'Audio'}")
         print(f"Duration: {info['formatted_duration']}")
         
-        converted_path, output_files = processor.split_media(num_parts)
+        converted_path, output_files = processor.split_media(
+            num_parts, bitrate=args.bitrate, mode=args.mode, keep_converted=args.keep_converted,
+            workers=args.jobs, split_strategy=args.split_strategy,
+            silence_window_ms=args.silence_window_ms, progress_callback=make_progress_printer(),
+            **split_limits(args)
+        )
         
         action = "converted and split" if info['is_video'] else "split"
-        print(f"✅ Successfully {action} into {len(output_files)} parts")
+        print(f"✅ Successfully {action} into {len(output_files) // len(processor.targets)} parts")
         print(f"📁 Location: {os.path.dirname(output_files[0])}")
+        if processor.loudness and processor.loudness['integrated'] is not None:
+            print(f"🔊 Source {processor.loudness['integrated']:.1f} LUFS, parts normalized to "
+                  f"{processor.loudness['target']:.1f} LUFS")
         
         processor.cleanup()
         
+    except (KeyboardInterrupt, SplitCancelled):
+        print("\n⛔ Cancelled")
+        sys.exit(130)
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
+    finally:
+        flush_metrics()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,312 @@
+"""
+Asyncio facade over MediaProcessor for embedding the splitter in async services
+"""
+
+import os
+import asyncio
+import functools
+import threading
+
+from .ffmpeg_tools import (
+    ffmpeg_command, parse_progress_line, build_segment_args, build_range_args,
+    segment_groups, resolve_workers
+)
+from .scheduler import EncoderScheduler, AUTO_WORKERS
+from .mp3_splitter import MediaProcessor
+from .manifest import partial_path
+from .progress import SplitProgress
+
+
+async def run_ffmpeg_async(args, description="FFmpeg", on_progress=None):
+    """
+    Run ffmpeg as an asyncio subprocess, raising on failure. If the calling
+    task is cancelled, ffmpeg is killed before the cancellation propagates.
+
+    Args:
+        args (list): Arguments after the executable (inputs, filters, outputs)
+        description (str): What the command does, used in error messages
+        on_progress (callable): Called with the output time in milliseconds
+                                as ffmpeg reports it
+    """
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_command(args, progress=True),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    # Drain stderr concurrently so ffmpeg never blocks on a full pipe
+    stderr_task = asyncio.ensure_future(process.stderr.read())
+    try:
+        async for line in process.stdout:
+            time_ms = parse_progress_line(line.decode(errors='replace'))
+            if time_ms is not None and on_progress:
+                on_progress(time_ms)
+        await process.wait()
+        stderr = (await stderr_task).decode(errors='replace')
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr_task.cancel()
+        await asyncio.gather(stderr_task, return_exceptions=True)
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"{description} failed: {stderr.strip()}")
+
+
+class AsyncMediaSplitter:
+    """
+    Run splits from asyncio code, with at most ``max_concurrent_jobs``
+    running at once (0/None = one per CPU core); further jobs wait their turn.
+
+    "segment" and "encode" jobs drive ffmpeg through asyncio subprocesses
+    ("encode" always seeks on the input per part, ``workers`` parts at a
+    time). "copy" and "stream" jobs, "encode" jobs with a
+    ``loudness_target`` (measured on a full decode) and the analysis
+    before any split (probing, silence search, chapters) run in the
+    default executor.
+
+    Cancelling the awaiting task kills the job's ffmpeg processes, or stops
+    executor work at its next progress point. As with ``split_media``,
+    parts only get their final names once complete and are recorded in
+    the output directory's manifest, so a later run resumes the job.
+    """
+
+    def __init__(self, max_concurrent_jobs=None):
+        self.max_concurrent_jobs = resolve_workers(max_concurrent_jobs)
+        self._limiter = None
+
+    @property
+    def limiter(self):
+        # Created lazily so it belongs to the loop that first uses it
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(self.max_concurrent_jobs)
+        return self._limiter
+
+    async def split(self, input_file, num_parts=None, output_dir=None, bitrate='320k', mode='segment',
+                    workers=1, progress_callback=None, use_cache=True, **split_options):
+        """
+        Split ``input_file`` like ``MediaProcessor.split_media``.
+
+        Args:
+            input_file (str): Source media file
+            num_parts (int): Number of parts (or pass ``max_part_duration_ms``,
+                             ``max_part_bytes`` or ``split_strategy="chapters"``)
+            output_dir (str): Output directory (default ``<name>_parts``)
+            bitrate (str): MP3 bitrate for the parts
+            mode (str): "segment", "encode", "copy" or "stream"
+            workers (int): Parts encoded concurrently in "encode" mode
+                           ("auto" tunes it, see ``EncoderScheduler``),
+                           or segmenting processes in "segment" mode
+            progress_callback (callable): Receives progress event dicts (see
+                                          ``SplitProgress``), always on the
+                                          event loop thread
+            use_cache (bool): Use the persistent probe cache
+            **split_options: ``split_strategy``, ``silence_window_ms``,
+                             ``max_part_duration_ms``, ``max_part_bytes``,
+                             ``cue_file``, ``outputs``, ``loudness_target``,
+                             ``cut_points_ms``, ``resume`` and ``verify``
+                             (as in ``split_media``; parts are written under
+                             ``.partial`` names and recorded in the
+                             output directory's manifest)
+
+        Returns:
+            list: Paths of the created parts, in order (with several
+                  ``outputs``, each part's files in the order given)
+        """
+        async with self.limiter:
+            return await self._split(input_file, num_parts, output_dir, bitrate, mode, workers,
+                                     progress_callback, use_cache, split_options)
+
+    async def split_events(self, input_file, num_parts=None, **kwargs):
+        """
+        Run ``split`` and yield its progress events as they happen. The final
+        event is ``"done"`` with ``output_files``; errors are raised from the
+        iteration. Closing the iterator early cancels the job.
+        """
+        queue = asyncio.Queue()
+        finished = object()
+        task = asyncio.ensure_future(
+            self.split(input_file, num_parts, progress_callback=queue.put_nowait, **kwargs)
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(finished))
+        try:
+            while True:
+                event = await queue.get()
+                if event is finished:
+                    break
+                yield event
+            task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def _split(self, input_file, num_parts, output_dir, bitrate, mode, workers,
+                     progress_callback, use_cache, split_options):
+        loop = asyncio.get_running_loop()
+        loop_thread = threading.get_ident()
+        cancel_event = threading.Event()
+
+        def emit(event):
+            if not progress_callback:
+                return
+            if threading.get_ident() == loop_thread:
+                progress_callback(event)
+            else:
+                loop.call_soon_threadsafe(progress_callback, event)
+
+        async def in_thread(func, *args, **kwargs):
+            future = loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Executor work can't be interrupted; ask it to stop and wait
+                cancel_event.set()
+                await asyncio.gather(future, return_exceptions=True)
+                raise
+
+        processor = await in_thread(MediaProcessor, input_file, use_cache)
+        processor.progress = progress = SplitProgress(emit, cancel_event)
+        verify = split_options.pop('verify', False)
+
+        if output_dir is None:
+            output_dir = f"{os.path.splitext(os.path.basename(processor.input_file))[0]}_parts"
+        # Async encode seeks per part, so plan it like segment (no full decode),
+        # unless it normalizes loudness: that is measured on the decode parts are encoded from
+        normalize = split_options.get('loudness_target') is not None
+        plan_mode = 'segment' if mode == 'encode' and not normalize else mode
+        ranges, index, pending = await in_thread(processor.prepare_split, output_dir, num_parts, mode=mode,
+                                                 bitrate=bitrate, workers=workers, plan_mode=plan_mode,
+                                                 **split_options)
+        gains = [part['gain_db'] for part in processor.loudness['parts']] if processor.loudness else None
+        output_paths = processor.part_paths(output_dir, len(ranges))
+
+        try:
+            if (pending is not None and mode != 'copy') or (mode == 'encode' and not normalize):
+                # Encode, or the missing parts of a resumed job: one input-side seek per part
+                await self._encode_parts(processor, ranges, output_paths, bitrate, workers, pending, gains)
+            elif mode == 'segment':
+                await self._segment_parts(processor, ranges, output_paths, bitrate, workers)
+            else:
+                await in_thread(processor.write_parts, ranges, output_dir, bitrate=bitrate, mode=mode,
+                                index=index, pending=pending, gains=gains)
+        finally:
+            processor.manifest.save()
+        output_files = processor.all_target_files(output_paths)
+
+        if verify:
+            await in_thread(processor.verify_parts, output_files, ranges)
+        progress.finish(output_files=output_files)
+        return output_files
+
+    @staticmethod
+    async def _complete_part(processor, i, ranges, output_path):
+        """
+        Move a part from its ``.partial`` name to its final one and record
+        it in the manifest (checksums are read off the event loop).
+        """
+        def complete():
+            processor._finish_part(partial_path(output_path), output_path)
+            processor._report_part(i, len(ranges), output_path, *ranges[i])
+
+        await asyncio.get_running_loop().run_in_executor(None, complete)
+
+    async def _segment_parts(self, processor, ranges, output_paths, bitrate, workers):
+        """Segment the parts with one ffmpeg per ``segment_groups`` group, ``workers`` groups at a time."""
+        targets = processor.targets
+        workers = resolve_workers(workers)
+        groups = segment_groups(output_paths, outputs_per_part=len(targets), min_groups=workers)
+        slots = asyncio.Semaphore(min(workers, len(groups)))
+        processed = [0] * len(groups)
+
+        def group_progress(number, time_ms):
+            first, last = groups[number]
+            processed[number] = min(time_ms, ranges[last - 1][1] - ranges[first][0])
+            processor.progress.advance(ranges[0][0] + sum(processed))
+
+        async def segment(number, first, last):
+            args = build_segment_args(processor.input_file, ranges[first:last],
+                                      [partial_path(path) for path in output_paths[first:last]],
+                                      bitrate, to_end=last == len(ranges), targets=targets)
+            async with slots:
+                await run_ffmpeg_async(args, "Segmenting", functools.partial(group_progress, number))
+            for i in range(first, last):
+                await self._complete_part(processor, i, ranges, output_paths[i])
+
+        tasks = [asyncio.ensure_future(segment(number, first, last)) for number, (first, last) in enumerate(groups)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # On failure or cancellation, stop the groups still running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _encode_parts(self, processor, ranges, output_paths, bitrate, workers, todo=None, gains=None):
+        """
+        Encode every range in ``todo`` (default: all; each to every output
+        target) with its own ffmpeg, ``workers`` at a time ("auto": as many
+        as ``EncoderScheduler`` currently allows), scaled by ``gains`` (dB
+        per part) if given.
+        """
+        todo = list(range(len(ranges))) if todo is None else list(todo)
+        scheduler = EncoderScheduler(len(todo), workers if workers == AUTO_WORKERS else resolve_workers(workers),
+                                     processor.input_file)
+        # A semaphore whose size the scheduler may change between parts
+        slots = asyncio.Condition()
+        running = 0
+
+        async def encode(i):
+            nonlocal running
+            start_ms, end_ms = ranges[i]
+            # The last part runs to the end of the input, however the probed duration rounded
+            to_ms = None if i == len(ranges) - 1 else end_ms
+            async with slots:
+                await slots.wait_for(lambda: running < scheduler.concurrency)
+                running += 1
+            try:
+                await run_ffmpeg_async(build_range_args(processor.input_file, start_ms, to_ms,
+                                                        partial_path(output_paths[i]), bitrate, processor.targets,
+                                                        gains[i] if gains else None),
+                                       f"Encoding {os.path.basename(output_paths[i])}")
+                if to_ms is not None:
+                    scheduler.record(end_ms - start_ms)
+            finally:
+                async with slots:
+                    running -= 1
+                    slots.notify_all()
+            await self._complete_part(processor, i, ranges, output_paths[i])
+
+        tasks = [asyncio.ensure_future(encode(i)) for i in todo]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # On failure or cancellation, stop the parts still running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_DEFAULT_SPLITTER = None
+
+
+def get_async_splitter():
+    """Shared ``AsyncMediaSplitter`` (one job per CPU core) for this process."""
+    global _DEFAULT_SPLITTER
+    if _DEFAULT_SPLITTER is None:
+        _DEFAULT_SPLITTER = AsyncMediaSplitter()
+    return _DEFAULT_SPLITTER
+
+
+async def split_media_async(input_file, num_parts=None, splitter=None, **kwargs):
+    """
+    ``await split_media_async("talk.mp4", 5)`` — split without blocking the
+    event loop. Uses the shared splitter unless ``splitter`` is given; see
+    ``AsyncMediaSplitter.split`` for the options.
+
+    Returns:
+        list: Paths of the created parts, in order
+    """
+    splitter = splitter or get_async_splitter()
+    return await splitter.split(input_file, num_parts, **kwargs)
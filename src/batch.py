@@ -0,0 +1,156 @@
+"""
+Batch processing: split many media files over one shared worker pool
+"""
+
+import os
+import glob
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import setup_ffmpeg
+from .ffmpeg_tools import resolve_workers
+from .mp3_splitter import MediaProcessor
+from .cache import cached_probe_media
+from .utils import validate_file_path
+
+logger = logging.getLogger(__name__)
+
+
+class BatchProcessor:
+    """
+    Split a set of media files with a shared pool of workers.
+
+    Files whose content isn't a supported media format are skipped up
+    front (reported apart from failures); the rest are scheduled largest-first (by probed duration, falling
+    back to size) so the longest jobs start early and the batch finishes sooner.
+    Each file's parts go to ``<output_root>/<relative dir>/<name>_parts``.
+    Extra keyword arguments (e.g. ``split_strategy`` or ``max_part_bytes``
+    in place of ``num_parts``) are passed on to
+    ``MediaProcessor.split_media`` for every file.
+    """
+
+    def __init__(self, input_files, output_root, num_parts=None, bitrate='320k', mode='encode',
+                 workers=None, base_dir=None, **split_options):
+        limited = (split_options.get('max_part_duration_ms') or split_options.get('max_part_bytes')
+                   or split_options.get('cut_points_ms') or split_options.get('split_strategy') == 'chapters')
+        if not limited and (num_parts is None or num_parts <= 0):
+            raise ValueError("Number of parts must be greater than 0")
+        if not input_files:
+            raise ValueError("No input files to process")
+
+        # Configure FFmpeg once for the whole batch
+        if not setup_ffmpeg():
+            raise RuntimeError("FFmpeg configuration failed. Cannot proceed.")
+
+        self.input_files = [os.path.abspath(path) for path in input_files]
+        self.output_root = output_root
+        self.num_parts = num_parts
+        self.bitrate = bitrate
+        self.mode = mode
+        self.workers = resolve_workers(workers)
+        self.base_dir = os.path.abspath(base_dir) if base_dir else None
+        self.split_options = split_options
+
+    @classmethod
+    def from_directory(cls, directory, pattern='*', recursive=False, **kwargs):
+        """
+        Create a batch from the files in ``directory`` matching ``pattern``.
+
+        Args:
+            directory (str): Directory to scan
+            pattern (str): Glob pattern, e.g. ``*.mp4``
+            recursive (bool): Also scan subdirectories
+            **kwargs: Passed to ``BatchProcessor``
+
+        Returns:
+            BatchProcessor: The configured batch
+        """
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"Directory not found: {directory}")
+
+        search = os.path.join(directory, '**', pattern) if recursive else os.path.join(directory, pattern)
+        input_files = sorted(path for path in glob.glob(search, recursive=recursive) if os.path.isfile(path))
+        return cls(input_files, base_dir=directory, **kwargs)
+
+    def output_dir_for(self, input_file):
+        """Output directory for one input, mirroring its place under ``base_dir``."""
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        relative_dir = ''
+        if self.base_dir:
+            relative_dir = os.path.relpath(os.path.dirname(input_file), self.base_dir)
+        return os.path.normpath(os.path.join(self.output_root, relative_dir, f"{base_name}_parts"))
+
+    def schedule(self, input_files=None):
+        """Return the input files (default: all of them) ordered largest-first."""
+        def job_size(path):
+            try:
+                return cached_probe_media(path)['duration_ms']
+            except RuntimeError:
+                return os.path.getsize(path)
+
+        return sorted(self.input_files if input_files is None else input_files, key=job_size, reverse=True)
+
+    def reject_unsupported(self):
+        """
+        Check every input's content with ``validate_file_path`` before
+        anything is probed or decoded. Rejected files (notes, cover art, CUE
+        sheets, ... next to the media) are skipped, not failed.
+
+        Returns:
+            tuple: (media files, {path: result dict} for the skipped files)
+        """
+        media_files, rejected = [], {}
+        for input_file in self.input_files:
+            try:
+                validate_file_path(input_file)
+                media_files.append(input_file)
+            except (OSError, ValueError) as e:
+                rejected[input_file] = {'input_file': input_file, 'output_files': [], 'error': None,
+                                        'skipped': str(e), 'elapsed_seconds': 0.0}
+                logger.info(f"⏭️  Skipping {os.path.basename(input_file)}: {e}")
+        return media_files, rejected
+
+    def _process_one(self, input_file):
+        started = time.time()
+        result = {'input_file': input_file, 'output_files': [], 'error': None, 'skipped': None}
+        try:
+            processor = MediaProcessor(input_file)
+            _, result['output_files'] = processor.split_media(
+                self.num_parts,
+                output_dir=self.output_dir_for(input_file),
+                bitrate=self.bitrate,
+                mode=self.mode,
+                **self.split_options
+            )
+            processor.cleanup()
+        except Exception as e:
+            result['error'] = str(e)
+            logger.error(f"❌ {os.path.basename(input_file)}: {e}")
+        result['elapsed_seconds'] = round(time.time() - started, 2)
+        return result
+
+    def run(self):
+        """
+        Process every file and return one result per input.
+
+        Returns:
+            list: Dicts with ``input_file``, ``output_files``, ``error``,
+                  ``skipped`` (why a non-media file was left out, else None)
+                  and ``elapsed_seconds``, in the original input order
+        """
+        media_files, results = self.reject_unsupported()
+        scheduled = self.schedule(media_files)
+        os.makedirs(self.output_root, exist_ok=True)
+
+        logger.info(f"📦 Batch: {len(scheduled)} files, {self.workers} workers, mode '{self.mode}'")
+        logger.info(f"📁 Output root: {self.output_root}")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results.update(zip(scheduled, executor.map(self._process_one, scheduled)))
+
+        failed = sum(1 for result in results.values() if result['error'])
+        skipped = sum(1 for result in results.values() if result['skipped'])
+        logger.info(f"🎉 Batch complete: {len(results) - failed - skipped} succeeded, {failed} failed, "
+                    f"{skipped} skipped")
+        return [results[path] for path in self.input_files]
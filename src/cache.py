@@ -0,0 +1,244 @@
+"""
+Persistent, content-addressed cache for probe results, waveform peaks,
+decoded PCM and converted audio
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+from .config import get_cache_dir
+from .probe import probe_media
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 64 * 1024
+CACHE_LIMIT_ENV = "MP3_SPLITTER_CACHE_MAX_MB"
+DEFAULT_CACHE_LIMIT_MB = 2048
+MEDIA_CACHE_SUBDIR = "media"
+# Bumped when probe results change meaning, so stale entries are not reused
+PROBE_CACHE_VERSION = 2
+# Likewise for the layout of waveform peak indexes (see peaks.py)
+PEAK_CACHE_VERSION = 1
+# Largest share of the cache one decoded PCM file may take; bigger ones aren't kept
+MAX_PCM_CACHE_FRACTION = 0.5
+
+
+def file_fingerprint(file_path):
+    """
+    Identify a file's content cheaply: size, mtime and a hash of its first
+    and last blocks (never the whole file).
+
+    Returns:
+        str: Hex digest that changes whenever the file does
+    """
+    stat = os.stat(file_path)
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(HASH_BLOCK_SIZE))
+        if stat.st_size > 2 * HASH_BLOCK_SIZE:
+            f.seek(-HASH_BLOCK_SIZE, os.SEEK_END)
+            digest.update(f.read(HASH_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+class MediaCache:
+    """
+    On-disk cache of probe metadata, waveform peak indexes, decoded PCM and
+    converted MP3s.
+
+    Entries are keyed by the source fingerprint (plus the decode format or
+    bitrate for audio). Reads refresh an entry's mtime, and writes evict the least
+    recently used entries once the cache exceeds ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.path.join(get_cache_dir(), MEDIA_CACHE_SUBDIR)
+        if max_bytes is None:
+            try:
+                max_mb = int(os.environ.get(CACHE_LIMIT_ENV, DEFAULT_CACHE_LIMIT_MB))
+            except ValueError:
+                logger.warning(f"⚠️  Ignoring {CACHE_LIMIT_ENV}={os.environ[CACHE_LIMIT_ENV]!r} (not a whole number "
+                               f"of MB); using {DEFAULT_CACHE_LIMIT_MB} MB")
+                max_mb = DEFAULT_CACHE_LIMIT_MB
+            max_bytes = max_mb * 1024 * 1024
+        self.max_bytes = max_bytes
+
+    def key(self, file_path, *extra):
+        """Cache key for a source file and any settings that affect the entry."""
+        raw = ":".join([file_fingerprint(file_path)] + [str(value) for value in extra])
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _entry_path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get_probe(self, file_path):
+        """Return cached probe metadata for ``file_path``, or None."""
+        path = self._entry_path(self.key(file_path, 'probe', PROBE_CACHE_VERSION), '.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return info
+
+    def put_probe(self, file_path, info):
+        """Store probe metadata for ``file_path``."""
+        path = self._entry_path(self.key(file_path, 'probe', PROBE_CACHE_VERSION), '.json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_peaks(self, file_path):
+        """Return the cached waveform peak index of ``file_path`` (serialized), or None."""
+        path = self._entry_path(self.key(file_path, 'peaks', PEAK_CACHE_VERSION), '.npz')
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._touch(path)
+        return data
+
+    def put_peaks(self, file_path, data):
+        """Store a serialized waveform peak index for ``file_path``, next to its probe entry."""
+        path = self._entry_path(self.key(file_path, 'peaks', PEAK_CACHE_VERSION), '.npz')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def get_pcm(self, file_path, sample_rate, channels):
+        """Return the path of cached raw s16le PCM of ``file_path``, or None."""
+        path = self._entry_path(self.key(file_path, 'pcm', sample_rate, channels), '.pcm')
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    def put_pcm(self, file_path, sample_rate, channels, pcm_path):
+        """
+        Store decoded PCM (hard-linked when possible, otherwise copied),
+        unless it would take more than ``MAX_PCM_CACHE_FRACTION`` of the cache.
+
+        Returns:
+            str: Path of the cached copy, or None if it was too large to keep
+        """
+        if os.path.getsize(pcm_path) > self.max_bytes * MAX_PCM_CACHE_FRACTION:
+            return None
+        return self._put_file(self._entry_path(self.key(file_path, 'pcm', sample_rate, channels), '.pcm'),
+                              pcm_path)
+
+    def get_converted(self, file_path, bitrate):
+        """Return the path of a cached MP3 conversion of ``file_path``, or None."""
+        path = self._entry_path(self.key(file_path, 'mp3', bitrate), '.mp3')
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    def put_converted(self, file_path, bitrate, mp3_path):
+        """
+        Store a converted MP3 (hard-linked when possible, otherwise copied).
+
+        Returns:
+            str: Path of the cached copy
+        """
+        return self._put_file(self._entry_path(self.key(file_path, 'mp3', bitrate), '.mp3'), mp3_path)
+
+    def _put_file(self, path, source_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def entries(self):
+        """List ``(mtime, size, path)`` for every cache entry."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used entries until the cache fits ``max_bytes``.
+
+        Returns:
+            int: Bytes freed
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            freed += size
+        return freed
+
+    def clear(self):
+        """Remove every cache entry."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+_MEDIA_CACHE = None
+
+
+def get_media_cache():
+    """Shared ``MediaCache`` instance for this process."""
+    global _MEDIA_CACHE
+    if _MEDIA_CACHE is None:
+        _MEDIA_CACHE = MediaCache()
+    return _MEDIA_CACHE
+
+
+def cached_probe_media(file_path, use_cache=True):
+    """``probe_media`` backed by the persistent cache."""
+    if not use_cache:
+        return probe_media(file_path)
+
+    cache = get_media_cache()
+    try:
+        info = cache.get_probe(file_path)
+    except OSError:
+        return probe_media(file_path)
+    if info is None:
+        info = probe_media(file_path)
+        try:
+            cache.put_probe(file_path, info)
+        except OSError:
+            pass
+    return info
@@ -0,0 +1,200 @@
+"""
+Chapter tables (embedded chapters or CUE sheets) as split points
+"""
+
+import os
+import re
+import json
+import logging
+import subprocess
+
+from .config import get_ffmpeg_path, get_ffprobe_path
+from .probe import PROBE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+CUE_FRAMES_PER_SECOND = 75
+MAX_TITLE_LENGTH = 80
+_UNSAFE_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def read_chapters_ffprobe(file_path):
+    """
+    Read embedded chapters (MP4/M4B chapters, ID3 CHAP frames, Matroska
+    editions, ...) with ``ffprobe -show_chapters``.
+
+    Returns:
+        list: ``{'title', 'start_ms', 'end_ms'}`` dicts in file order
+    """
+    ffprobe = get_ffprobe_path()
+    if not ffprobe or 'ffprobe' not in os.path.basename(ffprobe).lower():
+        raise RuntimeError("FFprobe is not available")
+
+    cmd = [ffprobe, '-v', 'error', '-print_format', 'json', '-show_chapters', file_path]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFprobe failed: {result.stderr.strip()}")
+
+    chapters = []
+    for chapter in json.loads(result.stdout).get('chapters', []):
+        chapters.append({
+            'title': chapter.get('tags', {}).get('title', ''),
+            'start_ms': int(round(float(chapter['start_time']) * 1000)),
+            'end_ms': int(round(float(chapter['end_time']) * 1000)),
+        })
+    return chapters
+
+
+def read_chapters_ffmpeg(file_path):
+    """
+    Read embedded chapters from the summary ``ffmpeg -i`` prints.
+    Used when only the ffmpeg binary is available.
+
+    Returns:
+        list: ``{'title', 'start_ms', 'end_ms'}`` dicts in file order
+    """
+    ffmpeg = get_ffmpeg_path()
+    if not ffmpeg:
+        raise RuntimeError("FFmpeg is not available")
+
+    result = subprocess.run(
+        [ffmpeg, '-hide_banner', '-i', file_path],
+        capture_output=True, text=True, timeout=PROBE_TIMEOUT
+    )
+
+    chapters = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'\s*Chapter #\S+: start (-?[\d.]+), end (-?[\d.]+)', line)
+        if match:
+            chapters.append({
+                'title': '',
+                'start_ms': int(round(float(match.group(1)) * 1000)),
+                'end_ms': int(round(float(match.group(2)) * 1000)),
+            })
+            continue
+        # The chapter's metadata block follows its "Chapter #" line
+        match = re.match(r'\s*title\s*: (.*)$', line)
+        if match and chapters and not chapters[-1]['title']:
+            chapters[-1]['title'] = match.group(1).strip()
+        elif re.match(r'\s*Stream #', line):
+            break
+    return chapters
+
+
+def _cue_value(text):
+    """Strip the optional quotes around a CUE command argument."""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        return text[1:-1]
+    return text
+
+
+def parse_cue_sheet(cue_path):
+    """
+    Parse the tracks of a single-file CUE sheet.
+
+    Args:
+        cue_path (str): Path to the ``.cue`` file
+
+    Returns:
+        list: ``{'title', 'performer', 'start_ms'}`` dicts in track order,
+              starting at each track's ``INDEX 01``
+    """
+    with open(cue_path, 'rb') as f:
+        raw = f.read()
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+
+    files = 0
+    tracks = []
+    album_performer = ''
+    for line in text.splitlines():
+        command, _, argument = line.strip().partition(' ')
+        command = command.upper()
+        if command == 'FILE':
+            files += 1
+        elif command == 'TRACK':
+            tracks.append({'title': '', 'performer': album_performer, 'start_ms': None})
+        elif command == 'TITLE' and tracks:
+            tracks[-1]['title'] = _cue_value(argument)
+        elif command == 'PERFORMER':
+            if tracks:
+                tracks[-1]['performer'] = _cue_value(argument)
+            else:
+                album_performer = _cue_value(argument)
+        elif command == 'INDEX' and tracks:
+            number, _, timestamp = argument.strip().partition(' ')
+            if int(number) == 1:
+                minutes, seconds, frames = (int(value) for value in timestamp.strip().split(':'))
+                tracks[-1]['start_ms'] = int(round(
+                    (minutes * 60 + seconds + frames / CUE_FRAMES_PER_SECOND) * 1000
+                ))
+
+    if files > 1:
+        raise ValueError(f"CUE sheets referencing several files are not supported: {cue_path}")
+    missing = [i + 1 for i, track in enumerate(tracks) if track['start_ms'] is None]
+    if missing:
+        raise ValueError(f"CUE track {missing[0]} has no INDEX 01: {cue_path}")
+    return tracks
+
+
+def find_cue_sheet(input_file):
+    """Return the ``.cue`` file next to ``input_file`` with the same name, or None."""
+    base_name = os.path.splitext(input_file)[0]
+    for extension in ('.cue', '.CUE'):
+        if os.path.isfile(base_name + extension):
+            return base_name + extension
+    return None
+
+
+def load_chapters(input_file, duration_ms, cue_file=None):
+    """
+    Chapter ranges for ``input_file``, from a CUE sheet (``cue_file`` or a
+    sidecar ``.cue`` next to the input) or else from embedded chapters.
+
+    Args:
+        input_file (str): Source media file
+        duration_ms (float): Duration of the audio, used to end the last chapter
+        cue_file (str): Explicit CUE sheet (optional)
+
+    Returns:
+        list: ``{'title', 'start_ms', 'end_ms'}`` dicts covering the audio
+              in order, without gaps or overlaps
+    """
+    cue_file = cue_file or find_cue_sheet(input_file)
+    if cue_file:
+        logger.info(f"📑 Reading CUE sheet: {os.path.basename(cue_file)}")
+        chapters = []
+        for track in parse_cue_sheet(cue_file):
+            title = track['title']
+            if title and track['performer']:
+                title = f"{track['performer']} - {title}"
+            chapters.append({'title': title, 'start_ms': track['start_ms'], 'end_ms': None})
+    else:
+        try:
+            chapters = read_chapters_ffprobe(input_file)
+        except (OSError, ValueError, RuntimeError, subprocess.SubprocessError):
+            chapters = read_chapters_ffmpeg(input_file)
+
+    # Sort, drop chapters starting at or past the end, and make the ranges contiguous
+    chapters = sorted((c for c in chapters if c['start_ms'] < duration_ms), key=lambda c: c['start_ms'])
+    if not chapters:
+        raise ValueError(f"No chapters found in {os.path.basename(input_file)}")
+    chapters[0]['start_ms'] = 0
+    for chapter, following in zip(chapters, chapters[1:] + [None]):
+        chapter['end_ms'] = following['start_ms'] if following else duration_ms
+    return [c for c in chapters if c['end_ms'] > c['start_ms']]
+
+
+def chapter_file_name(index, title):
+    """
+    File name for the part holding chapter ``index`` (0-based), carrying
+    its title when there is one, e.g. ``003 - The Return.mp3``.
+    """
+    title = _UNSAFE_FILENAME_CHARS.sub('_', title or '').strip().strip('.')
+    title = title[:MAX_TITLE_LENGTH].rstrip()
+    if not title:
+        return f"part_{index+1:03d}.mp3"
+    return f"{index+1:03d} - {title}.mp3"
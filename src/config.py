@@ -1,19 +1,110 @@
 """
 FFmpeg configuration for MP3 Splitter - Auto-Configuring Version
+
+Discovery is lazy: nothing is searched until FFmpeg is first needed, and the
+result is cached on disk between runs (keyed by PATH, validated by binary mtime).
+A failed search is remembered for the rest of the process.
 """
 
 import os
 import sys
 import glob
-from pydub import AudioSegment
+import json
+import hashlib
+import logging
+
+from .metrics import span
+
+CACHE_DIR_ENV = "MP3_SPLITTER_CACHE_DIR"
+FFMPEG_CACHE_FILE = "ffmpeg_paths.json"
+
+logger = logging.getLogger(__name__)
 
 # Cache for found paths to avoid repeated searches
 _FFMPEG_CACHE = {
     'ffmpeg': None,
     'ffprobe': None,
-    'project_root': None
+    'project_root': None,
+    'search_failed': False
 }
 
+def _project_ffmpeg_paths(project_root):
+    """Candidate locations of ffmpeg inside the project folder."""
+    return [
+        os.path.join(project_root, "ffmpeg", "bin", "ffmpeg.exe"),
+        os.path.join(project_root, "ffmpeg", "ffmpeg.exe"),
+        os.path.join(project_root, "ffmpeg-win64", "bin", "ffmpeg.exe"),
+        os.path.join(project_root, "ffmpeg", "bin", "ffmpeg"),  # Linux/Mac
+        os.path.join(project_root, "ffmpeg", "ffmpeg"),         # Linux/Mac
+    ]
+
+def get_cache_dir():
+    """
+    Directory for on-disk caches (override with MP3_SPLITTER_CACHE_DIR).
+    """
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        if sys.platform == "win32":
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base, "mp3-splitter")
+    return cache_dir
+
+def _discovery_key(project_root):
+    """Key for the discovery cache: changes when PATH or project binaries change."""
+    existing = [path for path in _project_ffmpeg_paths(project_root) if os.path.exists(path)]
+    raw = "\n".join([os.environ.get("PATH", ""), project_root] + existing)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except (OSError, TypeError):
+        return None
+
+def _load_discovery_cache(project_root):
+    """Restore paths from the disk cache if the key and binary mtimes still match."""
+    cache_file = os.path.join(get_cache_dir(), FFMPEG_CACHE_FILE)
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return False
+    
+    if cached.get("key") != _discovery_key(project_root):
+        return False
+    for tool in ("ffmpeg", "ffprobe"):
+        if cached.get(tool) and _mtime(cached[tool]) != cached.get(f"{tool}_mtime"):
+            return False
+    if not cached.get("ffmpeg"):
+        return False
+    
+    _FFMPEG_CACHE.update({
+        'ffmpeg': cached["ffmpeg"],
+        'ffprobe': cached.get("ffprobe"),
+        'project_root': project_root
+    })
+    return True
+
+def _save_discovery_cache(project_root):
+    """Best-effort write of the discovered paths to the disk cache."""
+    cached = {"key": _discovery_key(project_root)}
+    for tool in ("ffmpeg", "ffprobe"):
+        cached[tool] = _FFMPEG_CACHE[tool]
+        cached[f"{tool}_mtime"] = _mtime(_FFMPEG_CACHE[tool])
+    
+    cache_dir = get_cache_dir()
+    cache_file = os.path.join(cache_dir, FFMPEG_CACHE_FILE)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cached, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass
+
 def find_ffmpeg_automatically():
     """
     Automatically find FFmpeg in common locations without manual configuration.
@@ -27,15 +118,7 @@ def find_ffmpeg_automatically():
     _FFMPEG_CACHE['project_root'] = project_root
     
     # Priority 1: Project's ffmpeg folder (various possible structures)
-    project_paths = [
-        os.path.join(project_root, "ffmpeg", "bin", "ffmpeg.exe"),
-        os.path.join(project_root, "ffmpeg", "ffmpeg.exe"),
-        os.path.join(project_root, "ffmpeg-win64", "bin", "ffmpeg.exe"),
-        os.path.join(project_root, "ffmpeg", "bin", "ffmpeg"),  # Linux/Mac
-        os.path.join(project_root, "ffmpeg", "ffmpeg"),         # Linux/Mac
-    ]
-    
-    for ffmpeg_path in project_paths:
+    for ffmpeg_path in _project_ffmpeg_paths(project_root):
         if os.path.exists(ffmpeg_path):
             _FFMPEG_CACHE['ffmpeg'] = ffmpeg_path
             # Find corresponding ffprobe
@@ -66,40 +149,66 @@ def setup_ffmpeg():
     # If already configured, return cached values
     if _FFMPEG_CACHE['ffmpeg'] and os.path.exists(_FFMPEG_CACHE['ffmpeg']):
         return True
+    # Helpers ask before every subprocess; search (and explain the failure) only once
+    if _FFMPEG_CACHE['search_failed']:
+        return False
     
-    print("🔄 Auto-configuring FFmpeg...")
+    # Then the result of a previous run, if still valid
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with span('ffmpeg_discovery', source='cache') as discovery:
+        if _load_discovery_cache(project_root):
+            return True
+        
+        discovery['source'] = 'search'
+        logger.info("🔄 Auto-configuring FFmpeg...")
+        found = find_ffmpeg_automatically()
+        discovery['found'] = found
     
-    if find_ffmpeg_automatically():
+    if found:
         ffmpeg_path = _FFMPEG_CACHE['ffmpeg']
         ffprobe_path = _FFMPEG_CACHE['ffprobe']
-        
-        # Configure pydub
-        AudioSegment.converter = ffmpeg_path
-        AudioSegment.ffprobe = ffprobe_path or ffmpeg_path.replace("ffmpeg", "ffprobe")
+        _save_discovery_cache(project_root)
 
         if ffprobe_path and os.path.exists(ffprobe_path):
-            AudioSegment.ffprobe = ffprobe_path
-            print(f"✅ FFprobe auto-configured: {os.path.basename(ffprobe_path)}")
+            logger.info(f"✅ FFprobe auto-configured: {os.path.basename(ffprobe_path)}")
         
-        print(f"✅ FFmpeg auto-configured: {os.path.basename(ffmpeg_path)}")
-        print(f"📁 Location: {os.path.dirname(ffmpeg_path)}")
+        logger.info(f"✅ FFmpeg auto-configured: {os.path.basename(ffmpeg_path)}")
+        logger.info(f"📁 Location: {os.path.dirname(ffmpeg_path)}")
         return True
     else:
-        print("❌ Could not auto-configure FFmpeg")
-        print("💡 Please ensure FFmpeg is either:")
-        print("   1. In project/ffmpeg/bin/ folder")
-        print("   2. In system PATH")
-        print("   3. In a standard installation location")
+        _FFMPEG_CACHE['search_failed'] = True
+        logger.error("❌ Could not auto-configure FFmpeg")
+        logger.error("💡 Please ensure FFmpeg is either:")
+        logger.error("   1. In project/ffmpeg/bin/ folder")
+        logger.error("   2. In system PATH")
+        logger.error("   3. In a standard installation location")
         return False
 
+def get_audio_segment():
+    """
+    Import pydub's AudioSegment on first use, pointed at the configured FFmpeg.
+    Kept out of module import so short-lived runs that never decode through
+    pydub don't pay for it.
+    """
+    from pydub import AudioSegment
+    
+    if setup_ffmpeg() and AudioSegment.converter != _FFMPEG_CACHE['ffmpeg']:
+        ffmpeg_path = _FFMPEG_CACHE['ffmpeg']
+        ffprobe_path = _FFMPEG_CACHE['ffprobe']
+        AudioSegment.converter = ffmpeg_path
+        AudioSegment.ffprobe = ffprobe_path or ffmpeg_path.replace("ffmpeg", "ffprobe")
+    return AudioSegment
+
 def get_ffmpeg_path():
-    """Get the full path to ffmpeg executable."""
+    """Get the full path to ffmpeg executable (configuring FFmpeg on first use)."""
+    setup_ffmpeg()
     if _FFMPEG_CACHE['ffmpeg'] and os.path.exists(_FFMPEG_CACHE['ffmpeg']):
         return _FFMPEG_CACHE['ffmpeg']
     return None
 
 def get_ffprobe_path():
-    """Get the full path to ffprobe executable."""
+    """Get the full path to ffprobe executable (configuring FFmpeg on first use)."""
+    setup_ffmpeg()
     if _FFMPEG_CACHE['ffprobe'] and os.path.exists(_FFMPEG_CACHE['ffprobe']):
         return _FFMPEG_CACHE['ffprobe']
     return None
@@ -112,9 +221,3 @@ def get_ffmpeg_info():
         'project_root': _FFMPEG_CACHE['project_root'],
         'is_configured': _FFMPEG_CACHE['ffmpeg'] is not None and os.path.exists(_FFMPEG_CACHE['ffmpeg'])
     }
-
-# Auto-configure on import
-if setup_ffmpeg():
-    print("🚀 FFmpeg auto-configuration completed successfully!")
-else:
-    print("⚠️  FFmpeg auto-configuration failed - manual setup may be required")
\ No newline at end of file
@@ -0,0 +1,427 @@
+"""
+Helpers for driving the ffmpeg command-line tool directly
+"""
+
+import os
+import subprocess
+import tempfile
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import get_ffmpeg_path
+from .metrics import span
+from .scheduler import EncoderScheduler, AUTO_WORKERS, available_cpus
+
+# Output formats a split can write: ffmpeg encoder and file extension
+OUTPUT_FORMATS = {
+    'mp3': ('libmp3lame', '.mp3'),
+    'aac': ('aac', '.m4a'),
+    'opus': ('libopus', '.opus'),
+    'vorbis': ('libvorbis', '.ogg'),
+}
+
+# Command-line budget for one segmenting process (Windows allows 32767 characters)
+SEGMENT_COMMAND_CHARS = 24000
+# Characters each part adds besides its path (map label, encoder options, cut point)
+SEGMENT_PART_CHARS = 60
+# After an input-side seek ffmpeg's MP3 decoder outputs silence until its bit
+# reservoir refills; seeks start this much earlier and discard the difference
+SEEK_PREROLL_MS = 500
+
+
+def ffmpeg_command(args, progress=False):
+    """
+    Full ffmpeg command line for ``args``: quiet, non-interactive and
+    overwriting outputs. With ``progress``, ffmpeg also writes machine-readable
+    progress (``key=value`` lines) to stdout.
+    """
+    cmd = [get_ffmpeg_path() or 'ffmpeg', '-hide_banner', '-nostdin', '-v', 'error', '-y']
+    if progress:
+        cmd += ['-progress', 'pipe:1', '-nostats']
+    return cmd + list(args)
+
+
+def parse_progress_line(line):
+    """
+    Output time in milliseconds from one ``-progress`` line, or None for
+    other keys. ``out_time_us`` (and the misnamed ``out_time_ms``) are in
+    microseconds.
+    """
+    key, _, value = line.strip().partition('=')
+    if key == 'out_time_us' and value.isdigit():
+        return int(value) / 1000
+    return None
+
+
+def run_ffmpeg(args, description="FFmpeg", on_progress=None):
+    """
+    Run ffmpeg with the given arguments, raising on failure.
+
+    Args:
+        args (list): Arguments after the executable (inputs, filters, outputs)
+        description (str): What the command does, used in error messages
+        on_progress (callable): Called with the output time in milliseconds
+                                as ffmpeg reports it; if it raises, ffmpeg
+                                is killed and the exception propagates
+
+    Returns:
+        subprocess.CompletedProcess: The finished process
+    """
+    cmd = ffmpeg_command(args, progress=on_progress is not None)
+    if on_progress is None:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{description} failed: {result.stderr.strip()}")
+        return result
+
+    # stderr is spooled to a file so a chatty ffmpeg can't block on a full pipe
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                                   stdin=subprocess.DEVNULL)
+        try:
+            for line in process.stdout:
+                time_ms = parse_progress_line(line.decode(errors='replace'))
+                if time_ms is not None:
+                    on_progress(time_ms)
+            process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace')
+    if process.returncode != 0:
+        raise RuntimeError(f"{description} failed: {stderr.strip()}")
+    return subprocess.CompletedProcess(cmd, process.returncode, '', stderr)
+
+
+def format_seconds(milliseconds):
+    """Format milliseconds as an ffmpeg time value in seconds (microsecond precision, so sample-exact)."""
+    return f"{milliseconds / 1000:.6f}"
+
+
+def parse_output(spec, bitrate='320k'):
+    """
+    Parse one output target: ``"format"`` or ``"format:bitrate"`` (e.g.
+    ``"opus:64k"``), or a dict with ``format`` and optional ``bitrate``.
+
+    Args:
+        spec (str|dict): The target
+        bitrate (str): Bitrate when the spec gives none
+
+    Returns:
+        dict: ``format``, ``bitrate``, ``codec`` and ``extension``
+    """
+    if isinstance(spec, dict):
+        output_format, bitrate = spec.get('format'), spec.get('bitrate') or bitrate
+    else:
+        output_format, _, spec_bitrate = str(spec).strip().partition(':')
+        bitrate = spec_bitrate or bitrate
+    output_format = str(output_format).lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}. "
+                         f"Supported formats: {', '.join(OUTPUT_FORMATS)}")
+    codec, extension = OUTPUT_FORMATS[output_format]
+    return {'format': output_format, 'bitrate': bitrate, 'codec': codec, 'extension': extension}
+
+
+def output_targets(outputs=None, bitrate='320k'):
+    """
+    Output targets of a split: the parsed ``outputs``, or a single MP3 at
+    ``bitrate`` when there are none. Each format may appear only once, as
+    its parts share file names and differ only in extension.
+    """
+    targets = [parse_output(spec, bitrate) for spec in outputs] if outputs else [parse_output('mp3', bitrate)]
+    formats = [target['format'] for target in targets]
+    duplicates = sorted({name for name in formats if formats.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Each output format can be given only once: {', '.join(duplicates)}")
+    return targets
+
+
+def target_path(path, target):
+    """``path`` with the file extension of ``target``'s format."""
+    return os.path.splitext(path)[0] + target['extension']
+
+
+def encoder_args(target):
+    """ffmpeg output options that encode to ``target``."""
+    return ['-c:a', target['codec'], '-b:a', target['bitrate']]
+
+
+def gain_args(gain_db=None):
+    """ffmpeg output options that scale the audio by ``gain_db`` (none for no gain)."""
+    return ['-af', f"volume={gain_db:.2f}dB"] if gain_db else []
+
+
+def segment_groups(output_paths, max_chars=SEGMENT_COMMAND_CHARS, outputs_per_part=1, min_groups=1):
+    """
+    Split part indexes into consecutive groups whose output paths fit in
+    ``max_chars`` of command line, so each group can be one ffmpeg process.
+    With ``min_groups`` the parts are spread over at least that many groups
+    of similar size (as far as there are parts), to run side by side.
+
+    Returns:
+        list: ``(first, last)`` index pairs (``last`` exclusive)
+    """
+    group_size = -(-len(output_paths) // max(1, min_groups))
+    groups = []
+    first = 0
+    length = 0
+    for i, path in enumerate(output_paths):
+        # Path, encoder options and filter graph label/cut point of one part, per output
+        cost = (len(path) + SEGMENT_PART_CHARS) * outputs_per_part
+        if i > first and (length + cost > max_chars or i - first >= group_size):
+            groups.append((first, i))
+            first, length = i, 0
+        length += cost
+    groups.append((first, len(output_paths)))
+    return groups
+
+
+def build_segment_args(input_file, ranges_ms, output_paths, bitrate='320k', converted_path=None, to_end=True,
+                       targets=None):
+    """
+    Build ffmpeg arguments that decode ``input_file``'s audio once and cut it
+    into parts with the ``asegment`` filter. Cuts are counted in samples, and
+    each part has its own encoder, so every part gets an exact LAME delay and
+    padding and the parts decode back to the source's samples. With several
+    ``targets`` the decoded audio is split once more per target, so every
+    format is cut from the same decode.
+
+    Args:
+        input_file (str): Source media file (audio or video)
+        ranges_ms (list): ``(start_ms, end_ms)`` tuples of consecutive parts;
+                          the input is read from the first start
+        output_paths (list): Destination path for each part
+        bitrate (str): MP3 bitrate for the parts
+        converted_path (str): Also write the full-length MP3 here, from the
+                              same decode (optional; needs a first start of 0)
+        to_end (bool): The last part runs to the end of the input instead of
+                       stopping at its end time
+        targets (list): Output targets (see ``output_targets``); each part is
+                        written to ``target_path(path, target)`` for every
+                        target. Defaults to MP3 at ``bitrate``
+
+    Returns:
+        list: ffmpeg arguments for ``run_ffmpeg``
+    """
+    targets = targets or output_targets(bitrate=bitrate)
+    origin = ranges_ms[0][0]
+    preroll = min(origin, SEEK_PREROLL_MS)
+    args = []
+    if origin > 0:
+        args += ['-ss', format_seconds(origin - preroll)]
+    if not to_end and not converted_path:
+        args += ['-t', format_seconds(ranges_ms[-1][1] - origin + preroll)]
+    args += ['-i', input_file]
+
+    # Cut points relative to the seek point; timestamps are recomputed from the
+    # sample count so a stream with a non-zero start time cuts in the same place
+    cut_times = [start for start, _ in ranges_ms[1:]]
+    if preroll:
+        cut_times.insert(0, origin)
+    if converted_path and not to_end:
+        # Decoding runs on for the full-length MP3; the rest of the parts' branch is dropped
+        cut_times.append(ranges_ms[-1][1])
+    timestamps = '|'.join(format_seconds(cut - origin + preroll) for cut in cut_times)
+
+    branches = [f"[t{t}]" for t in range(len(targets))]
+    if converted_path:
+        branches.append("[full]")
+    graph = []
+    if len(branches) > 1:
+        graph.append(f"[0:a:0]asplit={len(branches)}{''.join(branches)}")
+    else:
+        branches = ["[0:a:0]"]
+
+    outputs = []
+    for t, (target, source) in enumerate(zip(targets, branches)):
+        labels = [f"[t{t}s{i}]" for i in range(len(ranges_ms))]
+        dropped = []
+        if preroll:
+            dropped.append(f"[t{t}pre]")
+            labels.insert(0, dropped[-1])
+        if converted_path and not to_end:
+            dropped.append(f"[t{t}rest]")
+            labels.append(dropped[-1])
+        if cut_times:
+            graph.append(f"{source}asetpts=N/SR/TB,asegment=timestamps={timestamps}{''.join(labels)}")
+        else:
+            graph.append(f"{source}anull{labels[0]}")
+        graph += [f"{label}anullsink" for label in dropped]
+        labels = [label for label in labels if label not in dropped]
+        # Each part's timestamps restart from its sample count: an MP4 muxer's edit list
+        # would otherwise shift a part by a frame, and an Ogg stream lose a sample
+        graph += [f"{label}asetpts=N/SR/TB[t{t}p{i}]" for i, label in enumerate(labels)]
+        outputs += [
+            ['-map', f"[t{t}p{i}]"] + encoder_args(target) + [target_path(output_path, target)]
+            for i, output_path in enumerate(output_paths)
+        ]
+    args += ['-filter_complex', ';'.join(graph)]
+
+    for output in outputs:
+        args += output
+    if converted_path:
+        args += ['-map', '[full]', '-c:a', 'libmp3lame', '-b:a', bitrate, converted_path]
+    return args
+
+
+def segment_media(input_file, ranges_ms, output_paths, bitrate='320k', converted_path=None, on_progress=None,
+                  targets=None, workers=1):
+    """
+    Split a media file's audio into parts, decoding it once. Parts are
+    written by one long-lived ffmpeg process per ``segment_groups`` group,
+    each reading only its own stretch of the input, so even thousands of
+    parts cost a handful of process starts. With ``workers`` above 1 the
+    parts are spread over that many groups, run side by side.
+
+    Args:
+        input_file (str): Source media file (audio or video)
+        ranges_ms (list): ``(start_ms, end_ms)`` tuples, one per part
+        output_paths (list): Destination path for each part
+        bitrate (str): MP3 bitrate for the parts
+        converted_path (str): Also keep the full-length MP3 here (optional)
+        on_progress (callable): Called with the audio processed so far in
+                                milliseconds (see ``run_ffmpeg``)
+        targets (list): Output targets (see ``build_segment_args``)
+        workers (int): Concurrent ffmpeg processes (0/None = all cores)
+
+    Returns:
+        list: ``output_paths``, once every part is written
+    """
+    targets = targets or output_targets(bitrate=bitrate)
+    workers = resolve_workers(workers)
+    groups = segment_groups(output_paths, outputs_per_part=len(targets), min_groups=workers)
+    processed = [0] * len(groups)
+    lock = threading.Lock()
+    failed = threading.Event()
+    errors = []
+
+    def run_group(number, first, last):
+        span_ms = ranges_ms[last - 1][1] - ranges_ms[first][0]
+
+        def group_progress(time_ms):
+            # Raising kills this group's ffmpeg once another group has failed
+            if failed.is_set():
+                raise RuntimeError("Segmenting stopped: another group failed")
+            if on_progress is not None:
+                with lock:
+                    processed[number] = min(time_ms, span_ms)
+                    on_progress(ranges_ms[0][0] + sum(processed))
+
+        args = build_segment_args(input_file, ranges_ms[first:last], output_paths[first:last], bitrate,
+                                  converted_path if number == 0 else None, to_end=last == len(ranges_ms),
+                                  targets=targets)
+        try:
+            run_ffmpeg(args, "Segmenting", group_progress if on_progress or len(groups) > 1 else None)
+        except BaseException as e:
+            with lock:
+                # Only the first failure counts; the others are groups it stopped
+                if not failed.is_set():
+                    errors.append(e)
+                failed.set()
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(groups))) as executor:
+        for number, (first, last) in enumerate(groups):
+            executor.submit(run_group, number, first, last)
+    if errors:
+        raise errors[0]
+
+    written = [target_path(path, target) for path in output_paths for target in targets]
+    missing = [path for path in written if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"Segmenting produced {len(written) - len(missing)} of {len(written)} files")
+    return output_paths
+
+
+def build_range_args(input_file, start_ms, end_ms, output_path, bitrate='320k', targets=None, gain_db=None):
+    """
+    Build ffmpeg arguments that encode one time range of ``input_file``'s
+    audio to MP3 (or to every one of ``targets``, from the same decode).
+    The seek is on the input side, so only that range (plus
+    ``SEEK_PREROLL_MS`` of decoder warm-up) is read. ``end_ms=None`` runs to
+    the end of the input; ``gain_db`` scales the part before encoding.
+    """
+    args = []
+    preroll = min(start_ms, SEEK_PREROLL_MS)
+    # No seek from the very start: a seek to 0 trims codec priming unlike a plain decode
+    if start_ms > 0:
+        args += ['-ss', format_seconds(start_ms - preroll)]
+    if end_ms is not None:
+        args += ['-t', format_seconds(end_ms - start_ms + preroll)]
+    args += ['-i', input_file]
+    for target in targets or output_targets(bitrate=bitrate):
+        if preroll:
+            args += ['-ss', format_seconds(preroll)]
+        args += ['-map', '0:a:0', '-vn'] + gain_args(gain_db) + encoder_args(target)
+        args.append(target_path(output_path, target))
+    return args
+
+
+def build_convert_args(input_file, output_path, bitrate='320k'):
+    """Build ffmpeg arguments that encode all of ``input_file``'s audio to one MP3."""
+    return [
+        '-i', input_file,
+        '-map', '0:a:0', '-vn',
+        '-c:a', 'libmp3lame', '-b:a', bitrate,
+        output_path
+    ]
+
+
+def encode_range(input_file, start_ms, end_ms, output_path, bitrate='320k', targets=None, gain_db=None):
+    """Encode one time range of a media file's audio to an MP3 part (or one file per target)."""
+    targets = targets or output_targets(bitrate=bitrate)
+    with span('encode', output=os.path.basename(output_path)) as encode:
+        run_ffmpeg(build_range_args(input_file, start_ms, end_ms, output_path, bitrate, targets, gain_db),
+                   f"Encoding {os.path.basename(output_path)}")
+        encode['bytes'] = sum(os.path.getsize(target_path(output_path, target)) for target in targets)
+    return output_path
+
+
+def resolve_workers(workers):
+    """
+    Turn a ``workers`` setting into a thread count: 0/None/"auto" mean the
+    CPUs available to the process (affinity and cgroup CPU quota).
+    """
+    if not workers or workers == AUTO_WORKERS:
+        return available_cpus()
+    if not isinstance(workers, int):
+        raise ValueError(f"Number of workers must be a number or '{AUTO_WORKERS}'")
+    if workers < 0:
+        raise ValueError("Number of workers cannot be negative")
+    return workers
+
+
+def encode_ranges(input_file, ranges_ms, output_paths, bitrate='320k', workers=None, targets=None, gains_db=None):
+    """
+    Encode several parts concurrently, one ffmpeg process per part.
+
+    Args:
+        input_file (str): Source media file (audio or video)
+        ranges_ms (list): ``(start_ms, end_ms)`` tuples, one per part
+        output_paths (list): Destination path for each part
+        bitrate (str): MP3 bitrate for the parts
+        workers (int): Concurrent ffmpeg processes (0/None = available
+                       CPUs, "auto" = tuned by throughput, see
+                       ``EncoderScheduler``)
+        targets (list): Output targets, each written from the same decode
+                        (see ``build_segment_args``)
+        gains_db (list): Gain applied to each part (optional)
+
+    Yields:
+        tuple: ``(index, output_path)`` in part order, as each part is ready
+    """
+    if workers != AUTO_WORKERS:
+        workers = resolve_workers(workers)
+    scheduler = EncoderScheduler(len(ranges_ms), workers, input_file)
+    gains_db = gains_db or [None] * len(ranges_ms)
+    # The last part's length is open-ended; it is left out of the throughput measurement
+    tasks = [
+        (partial(encode_range, input_file, start_ms, end_ms, output_path, bitrate, targets, gain_db),
+         None if end_ms is None else end_ms - start_ms)
+        for (start_ms, end_ms), output_path, gain_db in zip(ranges_ms, output_paths, gains_db)
+    ]
+    yield from scheduler.run(tasks)
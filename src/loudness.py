@@ -0,0 +1,223 @@
+"""
+EBU R128 / ITU-R BS.1770 loudness of decoded PCM, measured in one streaming
+pass: integrated loudness of the whole source and of each part, from the
+same K-weighted block energies
+"""
+
+import math
+
+import numpy as np
+
+# Default target of EBU R128; streaming platforms and podcasts mostly use -16 to -14
+DEFAULT_TARGET_LUFS = -23.0
+# Highest sample peak a gain may raise a part to; parts that would clip get less gain
+PEAK_CEILING_DBFS = -1.0
+
+# BS.1770 gating: 400 ms blocks every 100 ms, absolute gate, then relative gate
+SUBBLOCK_SECONDS = 0.1
+SUBBLOCKS_PER_BLOCK = 4
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+LOUDNESS_OFFSET = -0.691
+# Surround channels of 5.1 are weighted +1.5 dB, LFE not at all
+CHANNEL_WEIGHTS = {6: (1.0, 1.0, 1.0, 0.0, 1.41, 1.41)}
+
+# The K-weighting IIR is applied as its impulse response, truncated once
+# the tail holds less than this fraction of the energy, by FFT convolution
+IMPULSE_TAIL_ENERGY = 1e-12
+FFT_SIZE = 1 << 15
+
+
+def _biquad(b, a, signal):
+    """Run a biquad over a short signal (direct form I); only used to build the impulse response."""
+    output = [0.0] * len(signal)
+    x1 = x2 = y1 = y2 = 0.0
+    for n, x0 in enumerate(signal):
+        y0 = b[0] * x0 + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+        output[n] = y0
+        x2, x1, y2, y1 = x1, x0, y1, y0
+    return output
+
+
+def k_weighting(sample_rate):
+    """
+    Impulse response of the BS.1770 K-weighting filter (high shelf, then
+    high-pass) at ``sample_rate``, its coefficients derived for any rate.
+    """
+    # Pre-filter: +4 dB shelf above ~1.7 kHz (head diffraction)
+    k = math.tan(math.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = ((vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0)
+    shelf_a = (1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0)
+    # RLB weighting: second-order high-pass at ~38 Hz
+    k = math.tan(math.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    highpass_b = (1.0, -2.0, 1.0)
+    highpass_a = (1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0)
+
+    # The high-pass rings longest; half a second of it is far past the truncation point
+    impulse = [1.0] + [0.0] * (sample_rate // 2)
+    response = np.array(_biquad(highpass_b, highpass_a, _biquad(shelf_b, shelf_a, impulse)))
+    tail = np.cumsum((response ** 2)[::-1])[::-1]
+    keep = int(np.searchsorted(-tail, -tail[0] * IMPULSE_TAIL_ENERGY))
+    return response[:max(keep, 1)]
+
+
+def _gated_loudness(energies):
+    """
+    Integrated loudness (LUFS) from 100 ms sub-block mean squares, gated
+    as BS.1770 prescribes; None if too short or entirely below the gate.
+    """
+    if len(energies) < SUBBLOCKS_PER_BLOCK:
+        return None
+    blocks = np.lib.stride_tricks.sliding_window_view(energies, SUBBLOCKS_PER_BLOCK).mean(axis=1)
+    # Gates compared as powers, so silent blocks need no log
+    blocks = blocks[blocks > 10 ** ((ABSOLUTE_GATE_LUFS - LOUDNESS_OFFSET) / 10)]
+    if not len(blocks):
+        return None
+    relative_gate = blocks.mean() * 10 ** (RELATIVE_GATE_LU / 10)
+    blocks = blocks[blocks > relative_gate]
+    return LOUDNESS_OFFSET + 10 * math.log10(blocks.mean())
+
+
+class _SubBlocks:
+    """Sums weighted sample powers into 100 ms sub-blocks, carrying the remainder between chunks."""
+
+    def __init__(self, size):
+        self.size = size
+        self.carry = np.zeros(0)
+        self.sums = []
+
+    def add(self, power):
+        if len(self.carry):
+            power = np.concatenate((self.carry, power))
+        full = len(power) - len(power) % self.size
+        if full:
+            self.sums.append(power[:full].reshape(-1, self.size).sum(axis=1))
+        self.carry = power[full:]
+
+    def loudness(self):
+        energies = np.concatenate(self.sums) / self.size if self.sums else np.zeros(0)
+        return _gated_loudness(energies)
+
+
+class LoudnessMeter:
+    """
+    Streaming BS.1770 meter over consecutive parts of one signal.
+
+    Feed it the samples in order (``feed``), calling ``next_part`` at each
+    part boundary; ``result`` then gives the integrated loudness of the
+    whole signal and of every part. Filtering and squaring are vectorized
+    per chunk, and memory stays at one chunk plus one number per 100 ms.
+    """
+
+    def __init__(self, sample_rate, channels):
+        self.response = k_weighting(sample_rate)
+        self.chunk_frames = FFT_SIZE - len(self.response) + 1
+        self._spectrum = np.fft.rfft(self.response, FFT_SIZE)
+        self.weights = np.array(CHANNEL_WEIGHTS.get(channels, (1.0,) * channels))
+        self._history = np.zeros((len(self.response) - 1, channels))
+        size = max(1, round(sample_rate * SUBBLOCK_SECONDS))
+        self._size = size
+        self._whole = _SubBlocks(size)
+        self._parts = [_SubBlocks(size)]
+        self._peaks = [0.0]
+        # Filter state of the current part while it still differs from the whole signal's
+        self._part_history = None
+        self._part_frames = 0
+
+    def next_part(self):
+        """
+        Start the next part: samples fed from now on count towards it. The
+        part is filtered from silence, as it will be once cut into its own
+        file, so the previous part's filter tail doesn't leak into it.
+        """
+        self._parts.append(_SubBlocks(self._size))
+        self._peaks.append(0.0)
+        self._part_history = np.zeros_like(self._history)
+        self._part_frames = 0
+
+    def _filter(self, history, chunk):
+        """K-weight ``chunk`` after ``history``; returns the weighted power and the new history."""
+        # Overlap-save: the previous samples complete the convolution at the chunk's start
+        extended = np.concatenate((history, chunk))
+        filtered = np.fft.irfft(np.fft.rfft(extended, FFT_SIZE, axis=0) * self._spectrum[:, None],
+                                FFT_SIZE, axis=0)[len(history):len(extended)]
+        return (filtered * filtered) @ self.weights, extended[len(extended) - len(history):]
+
+    def feed(self, samples):
+        """
+        Add int16 samples shaped ``(frames, channels)``; any number of
+        frames (they are filtered in chunks of ``chunk_frames``).
+        """
+        for offset in range(0, len(samples), self.chunk_frames):
+            chunk = samples[offset:offset + self.chunk_frames] / 32768.0
+            self._peaks[-1] = max(self._peaks[-1], float(np.abs(chunk).max()))
+            power, self._history = self._filter(self._history, chunk)
+            self._whole.add(power)
+            if self._part_history is not None:
+                # Until a filter length into the part, its output still depends on the start
+                power, self._part_history = self._filter(self._part_history, chunk)
+                self._part_frames += len(chunk)
+                if self._part_frames >= len(self._part_history):
+                    self._part_history = None
+            self._parts[-1].add(power)
+
+    def result(self):
+        """
+        Returns:
+            dict: ``integrated`` (LUFS, or None for silence) and ``parts``,
+                  each with ``loudness`` (LUFS or None) and ``peak`` (sample
+                  peak in dBFS, or None for digital silence)
+        """
+        return {
+            'integrated': self._whole.loudness(),
+            'parts': [
+                {'loudness': part.loudness(), 'peak': 20 * math.log10(peak) if peak else None}
+                for part, peak in zip(self._parts, self._peaks)
+            ],
+        }
+
+
+def measure_pcm(pcm, sample_ranges):
+    """
+    Measure a ``PCMStore`` and each of its consecutive parts.
+
+    Args:
+        pcm (PCMStore): Decoded audio
+        sample_ranges (list): ``(start_sample, end_sample)`` of each part;
+                              an ``end_sample`` of None runs to the end
+
+    Returns:
+        dict: See ``LoudnessMeter.result``
+    """
+    meter = LoudnessMeter(pcm.sample_rate, pcm.channels)
+    for i, (start_sample, end_sample) in enumerate(sample_ranges):
+        if i:
+            meter.next_part()
+        meter.feed(pcm.samples(start_sample, end_sample))
+    return meter.result()
+
+
+def normalization_gains(measurement, target_lufs=DEFAULT_TARGET_LUFS, peak_ceiling_dbfs=PEAK_CEILING_DBFS):
+    """
+    Gain (dB) that brings each measured part to ``target_lufs``, lowered
+    where the part's peak would pass ``peak_ceiling_dbfs``. Parts without
+    a loudness (silent or under 400 ms) are left as they are.
+
+    Returns:
+        list: Per part, ``gain_db`` and ``limited`` (the ceiling cut the gain)
+    """
+    gains = []
+    for part in measurement['parts']:
+        if part['loudness'] is None:
+            gains.append({'gain_db': 0.0, 'limited': False})
+            continue
+        gain = target_lufs - part['loudness']
+        headroom = peak_ceiling_dbfs - part['peak']
+        gains.append({'gain_db': round(min(gain, headroom), 2), 'limited': headroom < gain})
+    return gains
@@ -0,0 +1,181 @@
+"""
+Split manifests: what a split produced, so an interrupted job can resume
+"""
+
+import os
+import json
+import time
+import hashlib
+
+from .cache import file_fingerprint
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 2
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+# Minimum seconds between rewrites while parts are being finished (save() always writes)
+MANIFEST_SAVE_INTERVAL = 1.0
+
+
+def partial_path(path):
+    """
+    Temporary name a part is written under until it is complete, e.g.
+    ``part_001.partial.mp3`` (the extension is kept for ffmpeg and pydub).
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}.partial{extension}"
+
+
+def file_checksum(path):
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHECKSUM_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SplitManifest:
+    """
+    ``manifest.json`` in a split's output directory: the source fingerprint,
+    the settings, the planned cut points and each part's status and files
+    (one per output format) with their sizes and checksums.
+
+    A rerun with the same source and settings takes its ranges from the
+    manifest (no re-planning or decoding) and only writes the parts that
+    are missing, or whose file no longer matches its recorded checksum.
+    """
+
+    def __init__(self, output_dir, data):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.data = data
+        self._last_saved = 0.0
+
+    @classmethod
+    def create(cls, output_dir, input_file, settings, ranges, part_files, duration_ms):
+        """
+        New manifest with every part pending, saved at once.
+
+        Args:
+            output_dir (str): Directory the parts are written to
+            input_file (str): Source media file
+            settings (dict): Options that determine the parts' content
+            ranges (list): ``(start_ms, end_ms)`` of each part
+            part_files (list): File name of each part (relative to ``output_dir``)
+            duration_ms (float): Duration the ranges were planned against
+        """
+        manifest = cls(output_dir, {
+            'version': MANIFEST_VERSION,
+            'source': {
+                'path': os.path.abspath(input_file),
+                'fingerprint': file_fingerprint(input_file),
+            },
+            'settings': settings,
+            'duration_ms': duration_ms,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'parts': [
+                {'file': name, 'start_ms': start_ms, 'end_ms': end_ms, 'status': 'pending'}
+                for name, (start_ms, end_ms) in zip(part_files, ranges)
+            ],
+        })
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, output_dir):
+        """The manifest in ``output_dir``, or None if there is none or it is unreadable."""
+        try:
+            with open(os.path.join(output_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            return None
+        return cls(output_dir, data)
+
+    def matches(self, input_file, settings):
+        """Whether this manifest was written for the same source content and settings."""
+        return (self.data['settings'] == settings and
+                self.data['source']['fingerprint'] == file_fingerprint(input_file))
+
+    @property
+    def duration_ms(self):
+        return self.data['duration_ms']
+
+    @property
+    def ranges(self):
+        return [(part['start_ms'], part['end_ms']) for part in self.data['parts']]
+
+    @property
+    def part_files(self):
+        return [part['file'] for part in self.data['parts']]
+
+    @property
+    def loudness(self):
+        """Loudness measurement and per-part gains the parts were encoded with, if normalized."""
+        return self.data.get('loudness')
+
+    @property
+    def all_files(self):
+        """Every file the manifest's parts were written to, in all formats."""
+        names = []
+        for part in self.data['parts']:
+            names += [entry['file'] for entry in part.get('files', [])] or [part['file']]
+        return names
+
+    def part_is_valid(self, index):
+        """Whether part ``index`` is done and each of its files still matches its size and checksum."""
+        part = self.data['parts'][index]
+        if part['status'] != 'done':
+            return False
+        try:
+            for entry in part['files']:
+                path = os.path.join(self.output_dir, entry['file'])
+                if os.path.getsize(path) != entry['size'] or file_checksum(path) != entry['sha256']:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def pending_parts(self):
+        """
+        Indexes of the parts that still have to be written; parts whose file
+        is missing or corrupt are marked pending again.
+        """
+        pending = []
+        for i, part in enumerate(self.data['parts']):
+            if not self.part_is_valid(i):
+                part['status'] = 'pending'
+                pending.append(i)
+        return pending
+
+    def record_loudness(self, loudness):
+        """Record the loudness measurement and gains (see ``MediaProcessor.measure_loudness``), saved at once."""
+        self.data['loudness'] = loudness
+        self.save()
+
+    def mark_done(self, index, output_paths):
+        """Record a finished part with the size and checksum of each of its files."""
+        self.data['parts'][index].update({
+            'status': 'done',
+            'files': [
+                {'file': os.path.basename(path), 'size': os.path.getsize(path), 'sha256': file_checksum(path)}
+                for path in output_paths
+            ],
+        })
+        self.save(force=False)
+
+    def save(self, force=True):
+        """
+        Write the manifest atomically. With ``force=False`` the write is
+        skipped if the last one was under ``MANIFEST_SAVE_INTERVAL`` ago;
+        a part missing from the manifest is simply redone on resume.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_saved < MANIFEST_SAVE_INTERVAL:
+            return
+        self._last_saved = now
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,196 @@
+"""
+Per-stage timing spans, metrics sinks and logging setup
+
+Library code wraps each stage of a job in ``span()``; every finished span is
+handed to the configured sink. Two sinks are provided:
+
+- ``jsonl``: one JSON object per span, appended as it finishes
+- ``prometheus``: per-stage totals rewritten as a text file for the
+  node_exporter textfile collector
+
+The sink is set with ``configure_metrics`` (the CLIs' ``--metrics`` option) or
+the ``MP3_SPLITTER_METRICS`` / ``MP3_SPLITTER_METRICS_FORMAT`` environment
+variables. Without one, spans are only logged at DEBUG level.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+METRICS_ENV = "MP3_SPLITTER_METRICS"
+METRICS_FORMAT_ENV = "MP3_SPLITTER_METRICS_FORMAT"
+METRICS_FORMATS = ('jsonl', 'prometheus')
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+# Minimum seconds between rewrites of the Prometheus file (flush() always writes)
+PROMETHEUS_WRITE_INTERVAL = 1.0
+PROMETHEUS_PREFIX = "mp3_splitter_stage"
+
+logger = logging.getLogger(__name__)
+
+
+class JsonLinesSink:
+    """Append each span to ``path`` as one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        line = json.dumps(span, default=str) + "\n"
+        with self._lock:
+            # Append mode with one write per line keeps concurrent processes' lines whole
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+    def flush(self):
+        pass
+
+
+class PrometheusSink:
+    """
+    Keep per-stage totals (duration, count, bytes, errors) and write them to
+    ``path`` in the Prometheus text format. The file is replaced atomically
+    so a scraper never reads a partial write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def record(self, span):
+        with self._lock:
+            totals = self.totals.setdefault(span['stage'], {'seconds': 0.0, 'count': 0, 'bytes': 0, 'errors': 0})
+            totals['seconds'] += span['duration_seconds']
+            totals['count'] += 1
+            totals['bytes'] += span.get('bytes') or 0
+            totals['errors'] += span['status'] != 'ok'
+            if time.monotonic() - self._last_write >= PROMETHEUS_WRITE_INTERVAL:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def render(self):
+        """Current totals in the Prometheus text exposition format."""
+        lines = []
+        metrics = (
+            ('duration_seconds', 'summary', 'Time spent per pipeline stage', None),
+            ('bytes_total', 'counter', 'Bytes read or written per pipeline stage', 'bytes'),
+            ('errors_total', 'counter', 'Failed spans per pipeline stage', 'errors'),
+        )
+        for name, metric_type, description, key in metrics:
+            full_name = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {description}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for stage, totals in sorted(self.totals.items()):
+                label = f'{{stage="{stage}"}}'
+                if key is None:
+                    lines.append(f"{full_name}_sum{label} {totals['seconds']:.6f}")
+                    lines.append(f"{full_name}_count{label} {totals['count']}")
+                else:
+                    lines.append(f"{full_name}{label} {totals[key]}")
+        return "\n".join(lines) + "\n"
+
+    def _write(self):
+        self._last_write = time.monotonic()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️  Could not write metrics to {self.path}: {e}")
+
+
+_SINKS = {'jsonl': JsonLinesSink, 'prometheus': PrometheusSink}
+_sink = None
+_configured = False
+
+
+def configure_metrics(path=None, metrics_format='jsonl'):
+    """
+    Send finished spans to ``path`` in ``metrics_format`` ("jsonl" or
+    "prometheus"). ``path=None`` turns metrics output off.
+    """
+    global _sink, _configured
+    if metrics_format not in METRICS_FORMATS:
+        raise ValueError(f"Unknown metrics format: {metrics_format}. "
+                         f"Supported formats: {', '.join(METRICS_FORMATS)}")
+    flush_metrics()
+    _sink = _SINKS[metrics_format](path) if path else None
+    _configured = True
+    return _sink
+
+
+def get_sink():
+    """The configured sink, set up from the environment on first use."""
+    if not _configured:
+        configure_metrics(os.environ.get(METRICS_ENV) or None,
+                          os.environ.get(METRICS_FORMAT_ENV) or 'jsonl')
+    return _sink
+
+
+def flush_metrics():
+    """Write out anything the sink has buffered (the Prometheus totals)."""
+    if _sink is not None:
+        _sink.flush()
+
+
+@contextmanager
+def span(stage, **fields):
+    """
+    Time a pipeline stage::
+
+        with span('encode', part=3) as s:
+            ...
+            s['bytes'] = os.path.getsize(output_path)
+
+    The yielded dict becomes the span record; set ``bytes`` (or any other
+    field) on it before the block ends. The span is recorded with
+    ``status`` "error" when the block raises, and the exception propagates.
+    """
+    record = {'stage': stage, 'started': round(time.time(), 3), 'bytes': 0}
+    record.update(fields)
+    start = time.perf_counter()
+    try:
+        yield record
+        record['status'] = 'ok'
+    except BaseException as e:
+        record['status'] = 'error'
+        record['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record['duration_seconds'] = round(time.perf_counter() - start, 6)
+        logger.debug(f"⏱️  {stage}: {record['duration_seconds']:.3f}s, {record['bytes']} bytes ({record['status']})")
+        sink = get_sink()
+        if sink is not None:
+            try:
+                sink.record(record)
+            except OSError as e:
+                logger.warning(f"⚠️  Could not record metrics: {e}")
+
+
+def configure_logging(level='INFO', stream=None):
+    """
+    Log messages as plain lines to ``stream`` (default stdout), the way the
+    CLIs have always printed them. Meant for entry points; calling it again
+    replaces the previous setup.
+    """
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, str(level).upper()))
+    for handler in list(root.handlers):
+        if getattr(handler, '_mp3_splitter_handler', False):
+            root.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handler._mp3_splitter_handler = True
+    root.addHandler(handler)
+    return root
@@ -0,0 +1,525 @@
+"""
+MPEG audio frame parsing for lossless (stream-copy) MP3 splitting
+"""
+
+import os
+import mmap
+import struct
+from array import array
+from bisect import bisect_right
+
+# Bitrates in kbps, indexed by [version_key][layer][bitrate_index]
+_BITRATES = {
+    'V1': {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    'V2': {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+
+# Sample rates in Hz, indexed by header version bits
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),   # MPEG-1
+    2: (22050, 24000, 16000),   # MPEG-2
+    0: (11025, 12000, 8000),    # MPEG-2.5
+}
+
+# Header layer bits -> layer number
+_LAYERS = {3: 1, 2: 2, 1: 3}
+
+COPY_CHUNK_SIZE = 1024 * 1024
+# Samples of delay an MP3 decoder adds itself; gapless players skip it on top of the encoder delay
+DECODER_DELAY = 529
+# Frames decoded ahead of the one that outputs a part's first sample (its overlap state)
+PART_WARMUP_FRAMES = 1
+# Largest encoder delay a LAME tag can record (12 bits)
+MAX_TAG_DELAY = 0xFFF
+LAME_TAG_SIZE = 36
+XING_FLAGS_ALL = 0x0F   # frames | bytes | TOC | quality
+
+
+def parse_frame_header(header):
+    """
+    Parse a 4-byte MPEG audio frame header.
+
+    Args:
+        header (bytes): At least four bytes starting at a candidate sync word
+
+    Returns:
+        dict: Decoded header fields, or None if the bytes are not a valid header
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    layer = _LAYERS[layer_bits]
+    version_key = 'V1' if version_bits == 3 else 'V2'
+    bitrate = _BITRATES[version_key][layer][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    channel_mode = header[3] >> 6
+
+    if layer == 1:
+        samples_per_frame = 384
+        frame_size = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples_per_frame = 1152 if (layer == 2 or version_bits == 3) else 576
+        frame_size = samples_per_frame // 8 * bitrate * 1000 // sample_rate + padding
+
+    return {
+        'version_bits': version_bits,
+        'layer': layer,
+        'has_crc': not (header[1] & 0x01),
+        'bitrate_index': bitrate_index,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'padding': padding,
+        'channel_mode': channel_mode,
+        'channels': 1 if channel_mode == 3 else 2,
+        'samples_per_frame': samples_per_frame,
+        'frame_size': frame_size,
+    }
+
+
+def side_info_size(version_bits, channels):
+    """Size of the Layer III side information that precedes a Xing tag."""
+    if version_bits == 3:
+        return 17 if channels == 1 else 32
+    return 9 if channels == 1 else 17
+
+
+def id3v2_size(data):
+    """Return the total size of a leading ID3v2 tag in ``data`` (0 if absent)."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def crc16(data, crc=0):
+    """CRC-16/ARC as used by the LAME tag checksum."""
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+    return crc
+
+
+def find_sync(data, pos=0):
+    """
+    Find the next offset in ``data`` holding two consecutive valid frame
+    headers (a single sync word is too easily matched by chance).
+
+    Returns:
+        int: Offset of the first frame, or None if there is none
+    """
+    end = len(data)
+    while True:
+        pos = data.find(b'\xff', pos)
+        if pos < 0 or pos + 4 > end:
+            return None
+        header = parse_frame_header(data[pos:pos + 4])
+        if header and header['frame_size'] > 4:
+            nxt = pos + header['frame_size']
+            if nxt + 4 > end:
+                return pos
+            follow = parse_frame_header(data[nxt:nxt + 4])
+            if (follow and follow['version_bits'] == header['version_bits']
+                    and follow['layer'] == header['layer']
+                    and follow['sample_rate'] == header['sample_rate']):
+                return pos
+        pos += 1
+
+
+def parse_info_tag(frame, header):
+    """
+    Parse a Xing/Info (with optional LAME extension) or VBRI tag from a frame.
+
+    Args:
+        frame (bytes): The complete first frame of the stream
+        header (dict): Parsed header of that frame
+
+    Returns:
+        dict: Tag fields (``frames``, ``bytes``, ``encoder``, ``delay``,
+              ``padding``...), or None if the frame carries no tag
+    """
+    xing_pos = 4 + side_info_size(header['version_bits'], header['channels'])
+    tag = frame[xing_pos:xing_pos + 4]
+    if tag in (b'Xing', b'Info'):
+        info = {'type': tag.decode('ascii'), 'frames': None, 'bytes': None,
+                'toc': None, 'encoder': None, 'delay': 0, 'padding': 0, 'lame': None}
+        flags = struct.unpack('>I', frame[xing_pos + 4:xing_pos + 8])[0]
+        pos = xing_pos + 8
+        if flags & 0x01:
+            info['frames'] = struct.unpack('>I', frame[pos:pos + 4])[0]
+            pos += 4
+        if flags & 0x02:
+            info['bytes'] = struct.unpack('>I', frame[pos:pos + 4])[0]
+            pos += 4
+        if flags & 0x04:
+            info['toc'] = bytes(frame[pos:pos + 100])
+            pos += 100
+        if flags & 0x08:
+            pos += 4
+        lame = frame[pos:pos + LAME_TAG_SIZE]
+        if len(lame) == LAME_TAG_SIZE and lame[:4] in (b'LAME', b'Lavf', b'Lavc', b'GOGO', b'L3.9'):
+            delay_padding = int.from_bytes(lame[21:24], 'big')
+            info.update({
+                'encoder': bytes(lame[:9]),
+                'delay': delay_padding >> 12,
+                'padding': delay_padding & 0x0FFF,
+                'lame': bytes(lame),
+            })
+        return info
+
+    if frame[36:40] == b'VBRI':
+        version, delay, quality, total_bytes, total_frames = struct.unpack(
+            '>HHHII', frame[40:54])
+        return {'type': 'VBRI', 'frames': total_frames, 'bytes': total_bytes,
+                'toc': None, 'encoder': None, 'delay': delay, 'padding': 0, 'lame': None}
+
+    return None
+
+
+class MP3FrameIndex:
+    """
+    Index of every MPEG audio frame in an MP3 file.
+
+    Scans the file once (memory-mapped, header-to-header jumps) and records the
+    byte offset of each audio frame so parts can be copied byte-for-byte
+    without decoding. Times are on the gapless timeline: sample 0 is the first
+    sample after the source's encoder delay.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.offsets = array('Q')
+        self.bitrates = array('H')
+        self.info_tag = None
+        self.first_frame = None
+        self._scan()
+
+    def _header_at(self, data, pos, cache):
+        """Return the frame size at ``pos`` if it continues the stream, else 0."""
+        if data[pos] != 0xFF:
+            return 0
+        key = (data[pos + 1] << 8) | data[pos + 2]
+        size = cache.get(key)
+        if size is None:
+            header = parse_frame_header(data[pos:pos + 4])
+            compatible = (
+                header is not None
+                and header['version_bits'] == self.first_frame['version_bits']
+                and header['layer'] == self.first_frame['layer']
+                and header['sample_rate'] == self.first_frame['sample_rate']
+            )
+            size = header['frame_size'] if compatible else 0
+            cache[key] = size
+        return size
+
+    def _scan(self):
+        if os.path.getsize(self.file_path) == 0:
+            raise ValueError(f"Empty file: {self.file_path}")
+
+        with open(self.file_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = len(data)
+            pos = find_sync(data, id3v2_size(data[:10]))
+            if pos is None:
+                raise ValueError(f"No MPEG audio frames found in {self.file_path}")
+
+            self.first_frame = parse_frame_header(data[pos:pos + 4])
+            if self.first_frame['layer'] != 3:
+                raise ValueError("Not an MPEG Layer III (MP3) stream")
+            self.first_header = bytes(data[pos:pos + 4])
+
+            # A leading Xing/Info/VBRI frame describes the stream; it holds no audio
+            first_size = self.first_frame['frame_size']
+            self.info_tag = parse_info_tag(data[pos:pos + first_size], self.first_frame)
+            if self.info_tag is not None:
+                pos += first_size
+
+            cache = {}
+            offsets_append = self.offsets.append
+            bitrates_append = self.bitrates.append
+            while pos + 4 <= end:
+                size = self._header_at(data, pos, cache)
+                if not size:
+                    # Junk or trailing tags (ID3v1/APE): resync or stop
+                    nxt = find_sync(data, pos + 1)
+                    if nxt is None:
+                        break
+                    pos = nxt
+                    continue
+                if pos + size > end:
+                    break
+                offsets_append(pos)
+                bitrates_append(data[pos + 2] >> 4)
+                pos += size
+
+            self.end_offset = pos
+
+        if not self.offsets:
+            raise ValueError(f"No MPEG audio frames found in {self.file_path}")
+        self.offsets.append(self.end_offset)
+
+    @property
+    def frame_count(self):
+        return len(self.offsets) - 1
+
+    @property
+    def sample_rate(self):
+        return self.first_frame['sample_rate']
+
+    @property
+    def channels(self):
+        return self.first_frame['channels']
+
+    @property
+    def samples_per_frame(self):
+        return self.first_frame['samples_per_frame']
+
+    @property
+    def encoder_delay(self):
+        """Encoder delay in samples from the source's LAME tag (0 without one)."""
+        tag = self.info_tag or {}
+        return tag['delay'] if tag.get('lame') else 0
+
+    @property
+    def encoder_padding(self):
+        """End padding in samples from the source's LAME tag (0 without one)."""
+        tag = self.info_tag or {}
+        return tag['padding'] if tag.get('lame') else 0
+
+    @property
+    def sample_count(self):
+        """Samples per channel a gapless decoder outputs (delay and padding removed)."""
+        total = self.frame_count * self.samples_per_frame
+        return max(0, total - self.encoder_delay - self.encoder_padding)
+
+    @property
+    def duration_ms(self):
+        """Gapless duration of the audio in milliseconds."""
+        return self.sample_count * 1000 / self.sample_rate
+
+    def sample_at(self, time_ms):
+        """Index of the sample nearest to ``time_ms`` (gapless timeline)."""
+        sample = round(time_ms * self.sample_rate / 1000)
+        return max(0, min(self.sample_count, sample))
+
+    def sample_time_ms(self, sample):
+        """Time of ``sample`` in milliseconds."""
+        return sample * 1000 / self.sample_rate
+
+    def reservoir_start(self, frame):
+        """
+        First frame holding any of ``frame``'s main data. Layer III frames
+        borrow bytes from the frames before them (the bit reservoir), so a
+        decoder needs those frames too.
+        """
+        version_bits = self.first_frame['version_bits']
+        with open(self.file_path, 'rb') as f:
+            def side_info(j):
+                # Header, optional CRC and the first side info bytes (main_data_begin)
+                f.seek(self.offsets[j])
+                data = f.read(8)
+                header = parse_frame_header(data)
+                pos = 6 if header['has_crc'] else 4
+                overhead = pos + side_info_size(version_bits, header['channels'])
+                return data[pos:pos + 2], overhead
+
+            side, _ = side_info(frame)
+            back = (side[0] << 1) | (side[1] >> 7) if version_bits == 3 else side[0]
+            start = frame
+            while back > 0 and start > 0:
+                start -= 1
+                _, overhead = side_info(start)
+                back -= self.offsets[start + 1] - self.offsets[start] - overhead
+        return start
+
+    def start_frame_for(self, sample):
+        """
+        First frame a part starting at ``sample`` has to include: enough
+        frames ahead of the one that outputs it for the decoder to settle
+        (``PART_WARMUP_FRAMES`` plus their bit reservoir), as far back as
+        a LAME tag's delay can reach.
+        """
+        spf = self.samples_per_frame
+        output_frame = (sample + self.encoder_delay + DECODER_DELAY) // spf
+        frame = self.reservoir_start(max(0, min(self.frame_count - 1, output_frame - PART_WARMUP_FRAMES)))
+        earliest = -(-(sample + self.encoder_delay - MAX_TAG_DELAY) // spf)
+        return max(0, earliest, min(self.frame_count - 1, frame))
+
+    def end_frame_for(self, sample):
+        """
+        Frame boundary a part ending at ``sample`` has to reach, so the
+        decoder (which lags ``DECODER_DELAY`` samples) has output it.
+        """
+        needed = sample + self.encoder_delay + DECODER_DELAY
+        return min(self.frame_count, -(-needed // self.samples_per_frame))
+
+    def last_sample_before(self, end_frame):
+        """Latest end sample a part can have without reading past ``end_frame``."""
+        if end_frame >= self.frame_count:
+            return self.sample_count
+        sample = end_frame * self.samples_per_frame - self.encoder_delay - DECODER_DELAY
+        return max(0, min(self.sample_count, sample))
+
+    def frame_start_ms(self, frame):
+        """Gapless time of the first sample decoded from ``frame`` (negative for the first frames)."""
+        sample = frame * self.samples_per_frame - self.encoder_delay - DECODER_DELAY
+        return sample * 1000 / self.sample_rate
+
+    def _info_frame_header(self):
+        """Header and size of the smallest frame that can hold the Xing/LAME tag."""
+        xing_pos = 4 + side_info_size(self.first_frame['version_bits'], self.channels)
+        tag_end = xing_pos + 120 + LAME_TAG_SIZE
+
+        b1 = self.first_header[1] | 0x01   # no CRC on the tag frame
+        sr_bits = self.first_header[2] & 0x0C
+        for bitrate_index in range(1, 15):
+            header = bytes((0xFF, b1, (bitrate_index << 4) | sr_bits, self.first_header[3]))
+            frame_size = parse_frame_header(header)['frame_size']
+            if frame_size >= tag_end:
+                break
+        return header, frame_size
+
+    def max_end_frame(self, start_frame, max_bytes):
+        """
+        Last frame boundary such that a part starting at ``start_frame``
+        (including its tag frame) fits in ``max_bytes``.
+
+        Returns:
+            int: End frame (exclusive); equals ``start_frame`` if not even
+                 one audio frame fits
+        """
+        _, tag_size = self._info_frame_header()
+        budget = self.offsets[start_frame] + max_bytes - tag_size
+        end_frame = bisect_right(self.offsets, budget, start_frame) - 1
+        return max(start_frame, min(self.frame_count, end_frame))
+
+    def build_info_frame(self, start_frame, end_frame, delay=0, padding=0):
+        """
+        Build a fresh Xing/Info + LAME header frame describing a frame range.
+
+        Args:
+            start_frame (int): First audio frame of the part
+            end_frame (int): One past the last audio frame of the part
+            delay (int): Encoder delay in samples to record in the LAME tag
+            padding (int): End padding in samples to record in the LAME tag
+
+        Returns:
+            bytes: A complete, silent MPEG frame carrying the tag
+        """
+        xing_pos = 4 + side_info_size(self.first_frame['version_bits'], self.channels)
+        crc_pos = xing_pos + 120 + LAME_TAG_SIZE - 2
+        header, frame_size = self._info_frame_header()
+
+        frames = end_frame - start_frame
+        audio_bytes = self.offsets[end_frame] - self.offsets[start_frame]
+        total_bytes = frame_size + audio_bytes
+        part_bitrates = self.bitrates[start_frame:end_frame]
+        is_cbr = len(set(part_bitrates)) <= 1
+
+        toc = bytearray(100)
+        for i in range(100):
+            frame = start_frame + frames * i // 100
+            relative = frame_size + self.offsets[frame] - self.offsets[start_frame]
+            toc[i] = min(255, relative * 256 // total_bytes) if total_bytes else 0
+
+        buf = bytearray(frame_size)
+        buf[0:4] = header
+        buf[xing_pos:xing_pos + 4] = b'Info' if is_cbr else b'Xing'
+        struct.pack_into('>III', buf, xing_pos + 4, XING_FLAGS_ALL, frames, total_bytes)
+        buf[xing_pos + 16:xing_pos + 116] = toc
+        struct.pack_into('>I', buf, xing_pos + 116, 0)
+
+        # LAME extension: reuse the source encoder's fields where known
+        lame_pos = xing_pos + 120
+        source = (self.info_tag or {}).get('lame')
+        lame = bytearray(source) if source else bytearray(LAME_TAG_SIZE)
+        if not source:
+            lame[0:9] = b'LAME3.100'
+            lame[9] = 0x01 if is_cbr else 0x00
+        duration_s = frames * self.samples_per_frame / self.sample_rate
+        average_kbps = audio_bytes * 8 / duration_s / 1000 if duration_s else 0
+        lame[20] = min(255, int(round(average_kbps)))
+        lame[21:24] = ((min(delay, 0xFFF) << 12) | min(padding, 0xFFF)).to_bytes(3, 'big')
+        struct.pack_into('>IH', lame, 28, total_bytes, 0)
+        buf[lame_pos:lame_pos + LAME_TAG_SIZE - 2] = lame[:LAME_TAG_SIZE - 2]
+        struct.pack_into('>H', buf, crc_pos, crc16(buf[:crc_pos]))
+        return bytes(buf)
+
+    def frame_ranges(self, ranges_ms):
+        """
+        Frame ranges that decode to exactly each part's samples.
+
+        Each part keeps whole frames around its range; the LAME delay and
+        padding recorded in its tag tell a gapless decoder how many samples
+        to drop at either end. Played back to back, the parts give the
+        source's samples with nothing missing or repeated. (Where the bit
+        reservoir reaches back further than a tag's delay can describe, as
+        in very low-bitrate VBR, a part's first milliseconds decode as
+        silence; the sample count is still exact.)
+
+        Args:
+            ranges_ms (list): ``(start_ms, end_ms)`` tuples, one per part;
+                              the last part runs to the end of the audio
+
+        Returns:
+            list: ``(start_frame, end_frame, delay, padding)`` tuples
+        """
+        spf = self.samples_per_frame
+        frame_ranges = []
+        for i, (start_ms, end_ms) in enumerate(ranges_ms):
+            start = self.sample_at(start_ms)
+            end = self.sample_count if i == len(ranges_ms) - 1 else max(start, self.sample_at(end_ms))
+            start_frame = self.start_frame_for(start)
+            end_frame = max(start_frame + 1, self.end_frame_for(end))
+            # Decoders skip delay + DECODER_DELAY samples and stop padding - DECODER_DELAY early
+            delay = start + self.encoder_delay - start_frame * spf
+            padding = end_frame * spf - end - self.encoder_delay
+            frame_ranges.append((start_frame, end_frame, delay, padding))
+        return frame_ranges
+
+    def write_part(self, start_frame, end_frame, output_path, delay=0, padding=0):
+        """
+        Write frames ``[start_frame, end_frame)`` to ``output_path`` as a
+        standalone MP3 with its own Xing/LAME header.
+
+        Returns:
+            int: Number of bytes written
+        """
+        if not 0 <= start_frame < end_frame <= self.frame_count:
+            raise ValueError(f"Invalid frame range: {start_frame}-{end_frame}")
+
+        info_frame = self.build_info_frame(start_frame, end_frame, delay, padding)
+        start = self.offsets[start_frame]
+        remaining = self.offsets[end_frame] - start
+
+        with open(self.file_path, 'rb') as src, open(output_path, 'wb') as dst:
+            dst.write(info_frame)
+            src.seek(start)
+            while remaining > 0:
+                chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+
+        return len(info_frame) + self.offsets[end_frame] - start
+
@@ -3,19 +3,52 @@ Enhanced MP3 Splitter with Video-to-Audio conversion support
 """
 
 import os
-from pydub import AudioSegment
+import logging
+from contextlib import closing
 from .utils import (
-    validate_file_path, calculate_part_duration, create_output_directory, 
-    format_time, get_file_size, is_video_file, convert_video_to_mp3, get_file_info
+    validate_file_path, calculate_part_duration, calculate_part_ranges, ranges_from_cut_points,
+    snap_to_sample, snap_ranges_to_samples, duration_for_bytes, create_output_directory, 
+    format_time, get_file_size, is_video_file, is_mp3_file, convert_video_to_mp3, get_file_info
 )
 from .config import setup_ffmpeg
+from .mp3_frames import MP3FrameIndex
+from .pcm_store import PCMStore
+from .ffmpeg_tools import segment_media, encode_range, encode_ranges, resolve_workers, output_targets, target_path
+from .scheduler import AUTO_WORKERS
+from .streaming import stream_split, DEFAULT_SAMPLE_RATE, DEFAULT_CHANNELS
+from .progress import SplitProgress
+from .chapters import load_chapters, chapter_file_name, find_cue_sheet
+from .cache import get_media_cache, file_fingerprint
+from .manifest import SplitManifest, partial_path
+from .verify import verify_split, FORMAT_TOLERANCE_SAMPLES
+from .metrics import span, flush_metrics
+
+logger = logging.getLogger(__name__)
+
+# "encode":  decode once to memory-mapped PCM and re-encode every part from it
+# "copy":    lossless MP3 split, trimmed to exact samples by LAME tags (MP3 input only)
+# "segment": one ffmpeg pass straight from the source (no intermediate MP3)
+# "stream":  decoded PCM piped chunk by chunk into each part's encoder (bounded memory)
+SPLIT_MODES = ('encode', 'copy', 'segment', 'stream')
+
+# "equal":    cut at exact duration / num_parts offsets
+# "silence":  move each cut to the quietest region near its equal-split offset
+# "chapters": one part per embedded chapter or CUE sheet track
+SPLIT_STRATEGIES = ('equal', 'silence', 'chapters')
+DEFAULT_SILENCE_WINDOW_MS = 5000
+
+# ID3 tag, Xing header frame and encoder flush frames of a re-encoded part,
+# plus room for the last part to absorb ESTIMATED_DURATION_SLACK_MS
+ENCODED_PART_OVERHEAD_BYTES = 8192
+# A probed duration can overshoot by encoder padding; don't emit a part that short
+ESTIMATED_DURATION_SLACK_MS = 50
 
 class MediaProcessor:
     """
     Enhanced processor that handles both video conversion and audio splitting
     """
     
-    def __init__(self, input_file):
+    def __init__(self, input_file, use_cache=True):
         # Setup FFmpeg first
         if not setup_ffmpeg():
             raise RuntimeError("FFmpeg configuration failed. Cannot proceed.")
@@ -25,14 +58,25 @@ class MediaProcessor:
         validate_file_path(input_file)
         self.input_file = input_file
         self.is_video = is_video_file(input_file)
+        self.is_mp3 = is_mp3_file(input_file)
         self.converted_mp3_path = None
+        self.converted_from_cache = False
+        self.use_cache = use_cache
+        self.progress = SplitProgress()
+        self.part_names = None
+        self.manifest = None
+        self.pcm = None
+        self.sample_rate = None
+        self.targets = output_targets()
+        self.verification = None
+        self.loudness = None
         
-        print("📁 Analyzing media file...")
-        self.file_info = get_file_info(input_file)
+        logger.info("📁 Analyzing media file...")
+        self.file_info = get_file_info(input_file, use_cache)
         
-        print(f"📊 File Type: {'Video' if self.is_video else 'Audio'}")
-        print(f"📏 File size: {self.file_info['file_size_mb']} MB")
-        print(f"⏱️  Duration: {self.file_info['formatted_duration']}")
+        logger.info(f"📊 File Type: {'Video' if self.is_video else 'Audio'}")
+        logger.info(f"📏 File size: {self.file_info['file_size_mb']} MB")
+        logger.info(f"⏱️  Duration: {self.file_info['formatted_duration']}")
         
     def convert_to_mp3(self, output_path=None, bitrate='320k'):
         """
@@ -47,37 +91,83 @@ class MediaProcessor:
             str: Path to MP3 file ready for splitting
         """
         if not self.is_video:
-            print("✅ File is already audio, no conversion needed")
+            logger.info("✅ File is already audio, no conversion needed")
             return self.input_file
         
-        print("🎥 Video file detected, converting to MP3...")
+        cache = get_media_cache() if self.use_cache else None
+        if cache and output_path is None:
+            cached_path = cache.get_converted(self.input_file, bitrate)
+            if cached_path:
+                logger.info(f"♻️  Using cached conversion ({bitrate})")
+                self.converted_mp3_path = cached_path
+                self.converted_from_cache = True
+                return cached_path
+        
+        logger.info("🎥 Video file detected, converting to MP3...")
         self.converted_mp3_path = convert_video_to_mp3(
             self.input_file, 
             output_path, 
             bitrate
         )
+        self.converted_from_cache = False
+        if cache:
+            try:
+                cache.put_converted(self.input_file, bitrate, self.converted_mp3_path)
+            except OSError as e:
+                logger.warning(f"⚠️  Could not cache conversion: {e}")
         return self.converted_mp3_path
     
-    def load_audio_for_splitting(self, bitrate='320k'):
+    def load_pcm_for_splitting(self):
         """
-        Prepare audio for splitting - converts video if necessary.
+        Decode the source (video included) once into a memory-mapped raw PCM
+        file that the parts are encoded from (see ``PCMStore``). The PCM is
+        kept in the media cache, so a rerun on the same source skips the decode.
         
         Returns:
-            AudioSegment: Loaded audio ready for splitting
+            PCMStore: The decoded audio
         """
-        # Convert to MP3 if it's a video
-        mp3_path = self.convert_to_mp3(bitrate=bitrate)
+        self.close_pcm()
+        sample_rate = self.file_info.get('sample_rate') or DEFAULT_SAMPLE_RATE
+        channels = self.file_info.get('channels') or DEFAULT_CHANNELS
+        cache = get_media_cache() if self.use_cache else None
+        if cache:
+            try:
+                cached_path = cache.get_pcm(self.input_file, sample_rate, channels)
+                if cached_path:
+                    self.pcm = PCMStore(cached_path, sample_rate, channels, delete=False)
+                    logger.info("♻️  Using cached decoded audio")
+            except OSError:
+                self.pcm = None
         
-        print("📁 Loading audio for splitting...")
-        try:
-            self.audio = AudioSegment.from_mp3(mp3_path)
-            self.duration = len(self.audio)
-            print("✅ Audio loaded successfully for splitting")
-            return self.audio
-        except Exception as e:
-            raise RuntimeError(f"Failed to load audio for splitting: {str(e)}")
+        if self.pcm is None:
+            logger.info("📁 Decoding audio for splitting...")
+            try:
+                with span('decode', file=os.path.basename(self.input_file)) as decode:
+                    self.pcm = PCMStore.decode(self.input_file, sample_rate, channels)
+                    decode['bytes'] = self.pcm.byte_count
+            except Exception as e:
+                raise RuntimeError(f"Failed to load audio for splitting: {str(e)}")
+            if cache:
+                try:
+                    cache.put_pcm(self.input_file, sample_rate, channels, self.pcm.path)
+                except OSError as e:
+                    logger.warning(f"⚠️  Could not cache decoded audio: {e}")
+        self.duration = self.pcm.duration_ms
+        logger.info("✅ Audio loaded successfully for splitting")
+        return self.pcm
+    
+    def close_pcm(self):
+        """Unmap and delete the decoded PCM, if any."""
+        if self.pcm is not None:
+            self.pcm.close()
+            self.pcm = None
     
-    def split_media(self, num_parts, output_dir=None, bitrate='320k'):
+    def split_media(self, num_parts=None, output_dir=None, bitrate='320k', mode='encode', keep_converted=False,
+                    workers=1, split_strategy='equal',
+                    silence_window_ms=DEFAULT_SILENCE_WINDOW_MS,
+                    max_part_duration_ms=None, max_part_bytes=None,
+                    progress_callback=None, cancel_event=None, cue_file=None, resume=True, verify=False,
+                    outputs=None, loudness_target=None, cut_points_ms=None):
         """
         Main method: Convert video to MP3 (if needed) and split into parts.
         
@@ -85,57 +175,700 @@ class MediaProcessor:
             num_parts (int): Number of parts to split into
             output_dir (str): Custom output directory
             bitrate (str): Audio quality for conversion
+            mode (str): "encode" to re-encode each part, "copy" to cut an
+                        MP3 losslessly (each part's LAME tag trims it to
+                        exact samples), "segment" to decode and encode once
+                        in a single ffmpeg process, or "stream" to pipe
+                        decoded audio through a fixed-size buffer (memory
+                        use independent of length)
+            keep_converted (bool): In segment or encode mode, also write the
+                                   full-length MP3 of a video input (from the
+                                   same decode where there is one)
+            workers (int): In encode mode, number of parts to encode
+                           concurrently; in segment mode, number of
+                           segmenting ffmpeg processes sharing the parts
+                           (0 = one per available CPU; "auto" in
+                           encode mode tunes the count to the measured
+                           throughput)
+            split_strategy (str): "equal" cuts at exact duration/num_parts
+                                  offsets; "silence" moves each cut to the
+                                  quietest region nearby; "chapters" cuts
+                                  at the chapter marks (no ``num_parts``)
+            silence_window_ms (int): How far either side of each nominal cut
+                                     the "silence" strategy searches
+            max_part_duration_ms (int): Instead of ``num_parts``, fill each
+                                        part up to this duration
+            max_part_bytes (int): Instead of ``num_parts``, fill each part up
+                                  to this file size (from exact frame offsets
+                                  in copy mode, otherwise from ``bitrate``)
+            progress_callback (callable): Receives a progress event dict per
+                                          stage and finished part (see
+                                          ``SplitProgress``)
+            cancel_event (threading.Event): Set it to stop the split at the
+                                            next progress point; raises
+                                            ``SplitCancelled``
+            cue_file (str): CUE sheet for the "chapters" strategy (defaults
+                            to a ``.cue`` next to the input, then to
+                            embedded chapters)
+            resume (bool): If ``output_dir`` holds a manifest from an earlier
+                           run with the same source and settings, keep its
+                           cut points and only write the parts that are
+                           missing or fail their checksum
+            verify (bool): Afterwards, decode the source and every part and
+                           check that the parts hold exactly the source's
+                           samples (results per output format in
+                           ``self.verification``); raises ``RuntimeError``
+                           on a mismatch
+            outputs (list): Write every part in several formats from one
+                            decode, e.g. ``["mp3:320k", "opus:64k", "aac:128k"]``
+                            (see ``ffmpeg_tools.parse_output``); not in copy
+                            mode. Default: MP3 at ``bitrate``
+            loudness_target (float): Bring every part to this integrated
+                                     loudness in LUFS (EBU R128, e.g. -23;
+                                     -16 for podcasts), measured on the
+                                     decode the parts are encoded from and
+                                     applied as a gain in their encoders
+                                     (results in ``self.loudness``); encode
+                                     mode only
+            cut_points_ms (list): Instead of ``num_parts``, cut at exactly
+                                  these times (ascending), e.g. as placed
+                                  on the GUI's waveform
             
         Returns:
-            tuple: (converted_mp3_path, list_of_split_files)
+            tuple: (converted_mp3_path, list_of_split_files); with several
+                   ``outputs``, each part's files in the order given
         """
-        if num_parts <= 0:
-            raise ValueError("Number of parts must be greater than 0")
-        
-        # Load audio (converts video if necessary)
-        self.load_audio_for_splitting(bitrate)
+        self.progress = SplitProgress(progress_callback, cancel_event)
+        self.manifest = None
+        self.verification = None
+        self.loudness = None
         
-        # Create output directory
         base_name = os.path.splitext(os.path.basename(self.input_file))[0]
         if output_dir is None:
             output_dir = f"{base_name}_parts"
+        
+        ranges, index, pending = self.prepare_split(
+            output_dir, num_parts, mode=mode, bitrate=bitrate, workers=workers, split_strategy=split_strategy,
+            silence_window_ms=silence_window_ms, max_part_duration_ms=max_part_duration_ms,
+            max_part_bytes=max_part_bytes, cue_file=cue_file, resume=resume, outputs=outputs,
+            loudness_target=loudness_target, cut_points_ms=cut_points_ms
+        )
+        gains = [part['gain_db'] for part in self.loudness['parts']] if self.loudness else None
+        
+        try:
+            converted_path, output_files = self.write_parts(
+                ranges, output_dir, bitrate=bitrate, mode=mode, workers=workers, keep_converted=keep_converted,
+                split_strategy=split_strategy, index=index, pending=pending, gains=gains
+            )
+        finally:
+            self.manifest.save()
+            flush_metrics()
+        
+        if verify:
+            self.verify_parts(output_files, ranges)
+        
+        self.progress.finish(output_files=output_files)
+        return converted_path, output_files
+    
+    def prepare_split(self, output_dir, num_parts=None, mode='encode', bitrate='320k', workers=1,
+                      split_strategy='equal', silence_window_ms=DEFAULT_SILENCE_WINDOW_MS,
+                      max_part_duration_ms=None, max_part_bytes=None, cue_file=None, resume=True,
+                      outputs=None, loudness_target=None, cut_points_ms=None, plan_mode=None):
+        """
+        Everything ``split_media`` does before writing parts: take the plan
+        from a matching manifest in ``output_dir`` (resume) or plan the split
+        and create the manifest (``self.manifest``), measure loudness when
+        normalizing, and start the progress report. Takes the same options
+        as ``split_media``; ``plan_mode`` plans as that mode would (e.g.
+        "segment" for per-part seeks without a full decode).
+        
+        Returns:
+            tuple: (ranges, MP3FrameIndex in copy mode or None, indexes of
+                   the parts still to write when resuming or None)
+        """
+        self.targets = output_targets(outputs, bitrate)
+        settings = self.manifest_settings(num_parts, mode, bitrate, split_strategy, silence_window_ms,
+                                          max_part_duration_ms, max_part_bytes, cue_file, outputs,
+                                          loudness_target, cut_points_ms)
+        manifest = SplitManifest.load(output_dir) if resume else None
+        stale_files = []
+        if manifest and not manifest.matches(self.input_file, settings):
+            logger.info("📋 Existing manifest is for a different source or settings; starting over")
+            stale_files = manifest.all_files
+            manifest = None
+        if manifest and loudness_target is not None and manifest.loudness is None:
+            # Interrupted while measuring: no part was written yet
+            manifest = None
+        
+        pending = None
+        if manifest:
+            # Resume with the recorded plan: no re-planning, no full decode
+            ranges, index = manifest.ranges, None
+            self.part_names = manifest.part_files
+            self.duration = manifest.duration_ms
+            self.loudness = manifest.loudness
+            pending = manifest.pending_parts()
+        else:
+            ranges, index = self.plan_split(
+                num_parts, mode=plan_mode or mode, bitrate=bitrate, workers=workers, split_strategy=split_strategy,
+                silence_window_ms=silence_window_ms, max_part_duration_ms=max_part_duration_ms,
+                max_part_bytes=max_part_bytes, cue_file=cue_file, outputs=outputs,
+                loudness_target=loudness_target, cut_points_ms=cut_points_ms
+            )
+        
+        # Create output directory
         os.makedirs(output_dir, exist_ok=True)
+        if not manifest:
+            part_files = [os.path.basename(path) for path in self.part_paths(output_dir, len(ranges))]
+            manifest = SplitManifest.create(output_dir, self.input_file, settings, ranges, part_files,
+                                            self.duration)
+            # Parts of the previous plan that this one doesn't overwrite
+            new_files = {os.path.basename(path) for name in part_files for path in self.target_files(name)}
+            for name in set(stale_files) - new_files:
+                try:
+                    os.remove(os.path.join(output_dir, name))
+                except OSError:
+                    pass
+            if loudness_target is not None:
+                manifest.record_loudness(self.measure_loudness(ranges, loudness_target))
+        self.manifest = manifest
         
-        part_duration = calculate_part_duration(self.duration, num_parts)
-        output_files = []
+        logger.info(f"✂️  Splitting '{os.path.basename(self.input_file)}' into {len(ranges)} parts ({mode} mode)...")
+        logger.info(f"📁 Output directory: {output_dir}")
+        if max_part_duration_ms:
+            logger.info(f"⏱️  Maximum duration per part: {format_time(max_part_duration_ms)}")
+        if max_part_bytes:
+            logger.info(f"📦 Maximum size per part: {max_part_bytes / (1024 * 1024):.2f} MB")
+        if num_parts:
+            logger.info(f"⏱️  Duration per part: {format_time(calculate_part_duration(self.duration, num_parts))}")
+        self.progress.begin(len(ranges), self.duration)
+        if pending is not None:
+            logger.info(f"♻️  Resuming: {len(ranges) - len(pending)} of {len(ranges)} parts already complete")
+            for i in sorted(set(range(len(ranges))) - set(pending)):
+                self.progress.part_done(i, self._part_path(output_dir, i), *ranges[i])
+        
+        return ranges, index, pending
+    
+    def verify_parts(self, output_files, ranges):
+        """
+        Decode the source and each part and compare sample counts (see
+        ``verify_split``), once per output format; raises ``RuntimeError``
+        if they differ. ``self.verification`` maps each format to its result.
+        """
+        logger.info("🔎 Verifying parts against the source...")
+        self.progress.stage("Verifying parts")
+        self.verification = {}
+        for t, target in enumerate(self.targets):
+            # output_files holds each part's files in target order
+            target_files = output_files[t::len(self.targets)]
+            tolerance = FORMAT_TOLERANCE_SAMPLES.get(target['format'], 0)
+            with span('verify', file=os.path.basename(self.input_file), parts=len(target_files),
+                      format=target['format']):
+                result = verify_split(self.input_file, target_files, ranges, tolerance)
+            self.verification[target['format']] = result
+            for i, part in enumerate(result['parts']):
+                if abs(part['actual'] - part['expected']) > tolerance:
+                    logger.warning(f"  ⚠️  Part {i+1} ({target['format']}): {part['actual']} samples, "
+                                   f"expected {part['expected']} ({part['actual'] - part['expected']:+d})")
+            if not result['ok']:
+                raise RuntimeError(f"Verification failed for {target['format']}: parts hold "
+                                   f"{result['part_samples']} samples, source has {result['source_samples']} "
+                                   f"({result['difference']:+d})")
+            logger.info(f"✅ Verified {target['format']}: {result['part_samples']} samples at "
+                        f"{result['sample_rate']} Hz, {result['difference']:+d} against the source")
+        return self.verification
+    
+    def measure_loudness(self, ranges, target_lufs):
+        """
+        Measure the integrated loudness of the decoded source and of each
+        part in one pass over the PCM (see ``loudness.measure_pcm``), and
+        work out the gain that brings each part to ``target_lufs``.
         
-        print(f"✂️  Splitting '{os.path.basename(self.input_file)}' into {num_parts} parts...")
-        print(f"📁 Output directory: {output_dir}")
-        print(f"⏱️  Duration per part: {format_time(part_duration)}")
+        Returns:
+            dict: ``target``, ``integrated`` and per part ``loudness``,
+                  ``peak``, ``gain_db`` and ``limited`` (also kept in
+                  ``self.loudness``)
+        """
+        from .loudness import measure_pcm, normalization_gains
         
-        for i in range(num_parts):
-            start_time = int(i * part_duration)
-            end_time = int((i + 1) * part_duration)
+        logger.info("🔊 Measuring loudness...")
+        self.progress.stage("Measuring loudness")
+        with span('loudness', file=os.path.basename(self.input_file), parts=len(ranges),
+                  bytes=self.pcm.byte_count):
+            measurement = measure_pcm(self.pcm, self._sample_ranges(ranges))
+        gains = normalization_gains(measurement, target_lufs)
+        self.loudness = {
+            'target': target_lufs,
+            'integrated': measurement['integrated'],
+            'parts': [dict(part, **gain) for part, gain in zip(measurement['parts'], gains)],
+        }
+        if measurement['integrated'] is None:
+            logger.warning("⚠️  The source is silent; parts are left at their level")
+            return self.loudness
+        logger.info(f"🔊 Integrated loudness: {measurement['integrated']:.1f} LUFS, target {target_lufs:.1f} LUFS")
+        for i, part in enumerate(self.loudness['parts']):
+            if part['loudness'] is None:
+                logger.info(f"  Part {i+1}: silent or shorter than 400 ms, no gain")
+            elif part['limited']:
+                logger.warning(f"  ⚠️  Part {i+1}: {part['loudness']:.1f} LUFS, gain {part['gain_db']:+.1f} dB "
+                               f"(limited by its {part['peak']:.1f} dBFS peak)")
+            else:
+                logger.debug(f"  Part {i+1}: {part['loudness']:.1f} LUFS, gain {part['gain_db']:+.1f} dB")
+        return self.loudness
+    
+    def write_parts(self, ranges, output_dir, bitrate='320k', mode='encode', workers=1, keep_converted=False,
+                    split_strategy='equal', index=None, pending=None, gains=None):
+        """
+        Write the parts planned by ``plan_split`` to ``output_dir``. Each part
+        is written under a temporary name and renamed once complete.
+        
+        ``pending`` (indexes into ``ranges``) limits the parts written when
+        resuming; outside copy mode they are encoded one input-side seek per
+        part, so nothing else is decoded. ``gains`` (dB per part, see
+        ``measure_loudness``) are applied in encode mode.
+        
+        Returns:
+            tuple: (converted_mp3_path, list_of_split_files), with every
+                   output format's file of each part
+        """
+        converted_path = None
+        with span('write', file=os.path.basename(self.input_file), mode=mode, parts=len(ranges)) as write:
+            if keep_converted and self.is_video and (mode == 'encode' or (pending is not None and mode != 'copy')):
+                # Segment mode writes it from its own decode; encode mode from the PCM, if decoded
+                converted_path = self.write_converted(bitrate)
+            if pending is not None:
+                if mode == 'copy':
+                    written = self._split_copy(index or MP3FrameIndex(self.input_file), ranges, output_dir, pending)
+                else:
+                    written = self._split_parallel(ranges, output_dir, bitrate, workers, pending, gains)
+                write['bytes'] = sum(os.path.getsize(path) for part in written for path in self.target_files(part))
+                return converted_path, self.all_target_files(self.part_paths(output_dir, len(ranges)))
             
-            # For the last part, ensure we include the remaining audio
-            if i == num_parts - 1:
-                end_time = self.duration
+            if mode == 'copy':
+                output_files = self._split_copy(index or MP3FrameIndex(self.input_file), ranges, output_dir)
+            elif mode == 'segment':
+                converted_path, output_files = self._split_segment(ranges, output_dir, bitrate, keep_converted,
+                                                                   workers)
+            elif mode == 'stream':
+                output_files = self._split_stream(ranges, output_dir, bitrate)
+            elif self._seeks_per_part(mode, workers, split_strategy, gains is not None):
+                output_files = self._split_parallel(ranges, output_dir, bitrate, workers)
+            else:
+                output_files = self._split_encode(ranges, output_dir, bitrate, gains)
+            output_files = self.all_target_files(output_files)
+            write['bytes'] = sum(os.path.getsize(path) for path in output_files)
+        return converted_path, output_files
+    
+    def write_converted(self, bitrate='320k'):
+        """
+        Write the full-length MP3 of a video input next to it, as
+        ``<name>_converted.mp3``: from the decoded PCM if there is one,
+        otherwise with one ffmpeg pass over the source. Kept on request, so
+        not registered for ``cleanup()``.
+        
+        Returns:
+            str: Path of the MP3
+        """
+        converted_path = f"{os.path.splitext(self.input_file)[0]}_converted.mp3"
+        with span('convert', file=os.path.basename(self.input_file)) as convert:
+            if self.pcm is not None:
+                self.pcm.encode(0, None, partial_path(converted_path), bitrate, output_targets(bitrate=bitrate))
+                os.replace(partial_path(converted_path), converted_path)
+            else:
+                encode_range(self.input_file, 0, None, converted_path, bitrate, output_targets(bitrate=bitrate))
+            convert['bytes'] = os.path.getsize(converted_path)
+        logger.info(f"🎥 Converted: {os.path.basename(converted_path)}")
+        return converted_path
+    
+    def manifest_settings(self, num_parts=None, mode='encode', bitrate='320k', split_strategy='equal',
+                          silence_window_ms=DEFAULT_SILENCE_WINDOW_MS, max_part_duration_ms=None,
+                          max_part_bytes=None, cue_file=None, outputs=None, loudness_target=None,
+                          cut_points_ms=None):
+        """Split options that determine the parts' content, as recorded in the manifest."""
+        settings = {
+            'num_parts': num_parts,
+            'mode': mode,
+            'bitrate': bitrate,
+            'split_strategy': split_strategy,
+            'max_part_duration_ms': max_part_duration_ms,
+            'max_part_bytes': max_part_bytes,
+        }
+        if split_strategy == 'silence':
+            settings['silence_window_ms'] = silence_window_ms
+        if outputs:
+            settings['outputs'] = [f"{target['format']}:{target['bitrate']}"
+                                   for target in output_targets(outputs, bitrate)]
+        if loudness_target is not None:
+            settings['loudness_target'] = loudness_target
+        if cut_points_ms is not None:
+            settings['cut_points_ms'] = list(cut_points_ms)
+        if split_strategy == 'chapters':
+            cue_file = cue_file or find_cue_sheet(self.input_file)
+            settings['cue_fingerprint'] = file_fingerprint(cue_file) if cue_file else None
+        return settings
+    
+    def _seeks_per_part(self, mode, workers, split_strategy, normalize=False):
+        """Whether encode mode runs one ffmpeg per part instead of decoding the source once."""
+        # Chapters are encoded with one input-side seek per part, never a full decode,
+        # unless the decode is needed anyway to measure loudness
+        return mode == 'encode' and not normalize and (workers != 1 or split_strategy == 'chapters')
+    
+    def plan_split(self, num_parts=None, mode='encode', bitrate='320k', workers=1, split_strategy='equal',
+                   silence_window_ms=DEFAULT_SILENCE_WINDOW_MS, max_part_duration_ms=None,
+                   max_part_bytes=None, cue_file=None, outputs=None, loudness_target=None,
+                   cut_points_ms=None):
+        """
+        Validate split options and compute the part ranges, without writing
+        anything. Takes the same options as ``split_media``.
+        
+        Returns:
+            tuple: (list of ``(start_ms, end_ms)`` ranges, MP3FrameIndex in
+                   copy mode or None)
+        """
+        limited = bool(max_part_duration_ms or max_part_bytes)
+        by_chapters = split_strategy == 'chapters'
+        explicit = cut_points_ms is not None
+        if by_chapters and limited:
+            raise ValueError("Chapter splitting cannot be combined with a maximum part duration/size")
+        if sum([limited or by_chapters, explicit, num_parts is not None]) > 1:
+            raise ValueError("Specify either a number of parts, a maximum part duration/size, "
+                             "cut points or chapter splitting, not several")
+        if not (limited or by_chapters or explicit) and (num_parts is None or num_parts <= 0):
+            raise ValueError("Number of parts must be greater than 0")
+        if explicit:
+            if split_strategy != 'equal':
+                raise ValueError("Cut points are used as given; use them with the equal split strategy")
+            if any(cut <= 0 for cut in cut_points_ms[:1]) or any(
+                    later <= earlier for earlier, later in zip(cut_points_ms, cut_points_ms[1:])):
+                raise ValueError("Cut points must be positive and in ascending order")
+        for name, value in (('duration', max_part_duration_ms), ('size', max_part_bytes)):
+            if value is not None and value <= 0:
+                raise ValueError(f"Maximum part {name} must be greater than 0")
+        if mode not in SPLIT_MODES:
+            raise ValueError(f"Unknown split mode: {mode}. Supported modes: {', '.join(SPLIT_MODES)}")
+        if split_strategy not in SPLIT_STRATEGIES:
+            raise ValueError(f"Unknown split strategy: {split_strategy}. "
+                             f"Supported strategies: {', '.join(SPLIT_STRATEGIES)}")
+        if mode == 'copy' and not self.is_mp3:
+            raise ValueError("Copy mode requires an MP3 input file")
+        resolve_workers(workers)
+        self.targets = output_targets(outputs, bitrate)
+        if mode == 'copy' and outputs:
+            raise ValueError("Copy mode writes MP3 only; use segment, stream or encode mode for other outputs")
+        if loudness_target is not None:
+            # Loudness measurement needs NumPy, so it is imported on demand
+            from .loudness import ABSOLUTE_GATE_LUFS
+            if mode != 'encode':
+                raise ValueError("Loudness normalization measures the decoded audio before encoding; "
+                                 "use encode mode")
+            if not ABSOLUTE_GATE_LUFS < loudness_target < 0:
+                raise ValueError(f"Loudness target must be between {ABSOLUTE_GATE_LUFS:.0f} and 0 LUFS")
+        
+        self.part_names = None
+        
+        # Work out the duration the cut points are based on
+        index = None
+        if mode == 'copy':
+            logger.info("📁 Indexing MP3 frames...")
+            self.progress.stage("Indexing MP3 frames")
+            with span('index', file=os.path.basename(self.input_file), bytes=os.path.getsize(self.input_file)):
+                index = MP3FrameIndex(self.input_file)
+            self.duration = index.duration_ms
+            self.sample_rate = index.sample_rate
+        elif mode == 'encode' and not self._seeks_per_part(mode, workers, split_strategy,
+                                                           normalize=loudness_target is not None):
+            self.progress.stage("Loading audio")
+            self.load_pcm_for_splitting()
+            self.sample_rate = self.pcm.sample_rate
+        else:
+            self.duration = self.file_info['duration_ms']
+            if not self.duration:
+                raise RuntimeError("Cannot split: media duration is unknown")
+            self.sample_rate = self.file_info.get('sample_rate')
+        
+        if split_strategy == 'silence':
+            self.progress.stage("Searching for silence")
+        if by_chapters:
+            ranges = self.plan_chapter_ranges(cue_file)
+        elif explicit:
+            if cut_points_ms and cut_points_ms[-1] >= self.duration:
+                raise ValueError(f"Cut point {format_time(cut_points_ms[-1])} is past the end of the media")
+            ranges = ranges_from_cut_points(cut_points_ms, self.duration)
+        elif limited:
+            ranges = self.plan_limited_ranges(max_part_duration_ms, max_part_bytes, bitrate,
+                                              split_strategy, silence_window_ms, index)
+        else:
+            ranges = self.plan_part_ranges(num_parts, split_strategy, silence_window_ms, index)
+        if self.sample_rate:
+            # Every mode cuts on exact samples, so parts join up without gaps or overlaps
+            ranges = snap_ranges_to_samples(ranges, self.sample_rate)
+        return ranges, index
+    
+    def plan_part_ranges(self, num_parts, split_strategy='equal', silence_window_ms=DEFAULT_SILENCE_WINDOW_MS,
+                         index=None):
+        """
+        Compute (start, end) times in milliseconds for each part of the
+        currently loaded duration. ``index`` is the MP3 frame index, when one
+        has already been built.
+        """
+        ranges = calculate_part_ranges(self.duration, num_parts, self.sample_rate)
+        if split_strategy == 'silence' and num_parts > 1:
+            # Silence analysis needs NumPy, so it is imported on demand
+            from .silence import find_quiet_cut_points
             
-            part_audio = self.audio[start_time:end_time]
-            output_filename = f"part_{i+1:03d}.mp3"
-            output_path = os.path.join(output_dir, output_filename)
+            logger.info(f"🔇 Searching ±{format_time(silence_window_ms)} around each cut for silence...")
+            nominal_cuts = [start for start, _ in ranges[1:]]
+            with span('silence_search', file=os.path.basename(self.input_file), cuts=len(nominal_cuts)):
+                cuts = find_quiet_cut_points(self.input_file, nominal_cuts, silence_window_ms, self.duration, index)
+            for i, (nominal, cut) in enumerate(zip(nominal_cuts, cuts)):
+                if cut != int(nominal):
+                    logger.info(f"  Cut {i+1}: {format_time(nominal)} → {format_time(cut)} ({cut - int(nominal):+d} ms)")
+            ranges = ranges_from_cut_points(cuts, self.duration)
+        return ranges
+    
+    def plan_limited_ranges(self, max_part_duration_ms=None, max_part_bytes=None, bitrate='320k',
+                            split_strategy='equal', silence_window_ms=DEFAULT_SILENCE_WINDOW_MS, index=None):
+        """
+        Compute (start, end) times in milliseconds so that every part is as
+        long as the duration and size limits allow.
+        
+        With an MP3 frame index (copy mode) the size limit is applied to the
+        exact bytes each part will contain; otherwise it is converted to a
+        duration at ``bitrate``. The "silence" strategy only moves cuts
+        earlier, so parts never exceed a limit.
+        """
+        if max_part_bytes and index is None:
+            bytes_duration_ms = duration_for_bytes(max_part_bytes, bitrate, ENCODED_PART_OVERHEAD_BYTES)
+        
+        def latest_end(start):
+            limits = []
+            if max_part_duration_ms:
+                limits.append(start + max_part_duration_ms)
+            if max_part_bytes and index is not None:
+                end_frame = index.max_end_frame(index.start_frame_for(index.sample_at(start)), max_part_bytes)
+                limits.append(index.sample_time_ms(index.last_sample_before(end_frame)))
+            elif max_part_bytes:
+                limits.append(start + bytes_duration_ms)
+            return min(limits)
+        
+        quiet_cut = None
+        analysis_index = index
+        if split_strategy == 'silence':
+            # Silence analysis needs NumPy, so it is imported on demand
+            from .silence import quiet_cut, analysis_index as silence_index
+            analysis_index = silence_index(self.input_file, index)
+            logger.info(f"🔇 Searching {format_time(silence_window_ms)} before each cut for silence...")
+        
+        # Frame-indexed durations are exact; probed ones are not
+        slack = 0 if index is not None else ESTIMATED_DURATION_SLACK_MS
+        cuts = []
+        start = 0
+        while True:
+            limit = latest_end(start)
+            if limit >= self.duration - slack:
+                break
+            if limit <= start:
+                raise ValueError("Maximum part size is too small to hold any audio")
             
-            print(f"  Creating part {i+1}/{num_parts}...", end=" ")
-            part_audio.export(output_path, format="mp3", bitrate=bitrate)
+            cut = limit
+            if quiet_cut is not None:
+                with span('silence_search', file=os.path.basename(self.input_file), cuts=1):
+                    cut = quiet_cut(self.input_file, limit, max(start, limit - silence_window_ms), limit,
+                                    analysis_index)
+                if cut != int(limit):
+                    logger.info(f"  Cut {len(cuts)+1}: {format_time(limit)} → {format_time(cut)} "
+                          f"({cut - int(limit):+d} ms)")
+            # Snap down so rounding never pushes a part past its limit
+            cut = snap_to_sample(cut, self.sample_rate, round_down=True) if self.sample_rate else int(cut)
+            if cut <= start:
+                cut = limit
+            cuts.append(cut)
+            start = cut
+        return ranges_from_cut_points(cuts, self.duration)
+    
+    def plan_chapter_ranges(self, cue_file=None):
+        """
+        Compute (start, end) times in milliseconds for one part per chapter,
+        and name each part after its chapter title.
+        """
+        chapters = load_chapters(self.input_file, self.duration, cue_file)
+        logger.info(f"📑 Found {len(chapters)} chapters")
+        self.part_names = [chapter_file_name(i, chapter['title']) for i, chapter in enumerate(chapters)]
+        return [(chapter['start_ms'], chapter['end_ms']) for chapter in chapters]
+    
+    def _part_path(self, output_dir, index):
+        if self.part_names:
+            return os.path.join(output_dir, self.part_names[index])
+        return os.path.join(output_dir, f"part_{index+1:03d}.mp3")
+    
+    def part_paths(self, output_dir, count):
+        """Output path of each of ``count`` planned parts."""
+        return [self._part_path(output_dir, i) for i in range(count)]
+    
+    def target_files(self, path):
+        """The file of part ``path`` in each output format."""
+        return [target_path(path, target) for target in self.targets]
+    
+    def all_target_files(self, paths):
+        """Every output format's file of each part, part by part."""
+        return [output for path in paths for output in self.target_files(path)]
+    
+    def _finish_part(self, partial_file, output_path):
+        """Move a part's finished files (every output format) to their final names."""
+        for partial_output, final_output in zip(self.target_files(partial_file), self.target_files(output_path)):
+            os.replace(partial_output, final_output)
+    
+    def _report_part(self, index, total, output_path, start_time, end_time):
+        logger.info(f"  ✅ Part {index+1}/{total}: {os.path.basename(output_path)} "
+                    f"({format_time(start_time)} - {format_time(end_time)})")
+        if self.manifest:
+            self.manifest.mark_done(index, self.target_files(output_path))
+        self.progress.part_done(index, output_path, start_time, end_time)
+    
+    def _sample_ranges(self, ranges):
+        """``(start_sample, end_sample)`` of each part in the decoded PCM (the last runs to the end)."""
+        rate = self.pcm.sample_rate
+        return [
+            (round(start_time * rate / 1000), round(end_time * rate / 1000) if i < len(ranges) - 1 else None)
+            for i, (start_time, end_time) in enumerate(ranges)
+        ]
+    
+    def _split_encode(self, ranges, output_dir, bitrate, gains=None):
+        """
+        Encode each part from the decoded PCM, cut at exact samples: each
+        part's slice of the mapping is piped to its encoder as is (scaled
+        by its entry in ``gains``, if given).
+        """
+        output_files = []
+        try:
+            for i, (start_sample, end_sample) in enumerate(self._sample_ranges(ranges)):
+                start_time, end_time = ranges[i]
+                output_path = self._part_path(output_dir, i)
+                logger.debug(f"  Creating part {i+1}/{len(ranges)}...")
+                with span('encode', part=i, output=os.path.basename(output_path)) as encode:
+                    self.pcm.encode(start_sample, end_sample, partial_path(output_path), bitrate, self.targets,
+                                    gain_db=gains[i] if gains else None)
+                    self._finish_part(partial_path(output_path), output_path)
+                    encode['bytes'] = sum(os.path.getsize(path) for path in self.target_files(output_path))
+                output_files.append(output_path)
+                self._report_part(i, len(ranges), output_path, start_time, end_time)
+        finally:
+            self.close_pcm()
+        
+        return output_files
+    
+    def _split_copy(self, index, ranges, output_dir, todo=None):
+        """
+        Split an MP3 without decoding: copy the frames around each part's
+        range, each part with a fresh Xing/LAME header whose delay and
+        padding trim it to exactly its samples (see ``MP3FrameIndex.frame_ranges``).
+        ``todo`` limits the parts written (default: all).
+        """
+        output_files = []
+        for i, (start_frame, end_frame, delay, padding) in enumerate(index.frame_ranges(ranges)):
+            if todo is not None and i not in todo:
+                continue
+            output_path = self._part_path(output_dir, i)
+            with span('copy', part=i, output=os.path.basename(output_path)) as copy:
+                index.write_part(start_frame, end_frame, partial_path(output_path), delay, padding)
+                os.replace(partial_path(output_path), output_path)
+                copy['bytes'] = os.path.getsize(output_path)
             output_files.append(output_path)
-            
-            print(f"✅ {output_filename} ({format_time(start_time)} - {format_time(end_time)})")
+            self._report_part(i, len(ranges), output_path, *ranges[i])
+        
+        return output_files
+    
+    def _split_segment(self, ranges, output_dir, bitrate, keep_converted, workers=1):
+        """
+        Split with one ffmpeg process (more only for very many parts, or
+        ``workers`` side by side) that cuts the decoded audio at exact
+        samples, so the source is decoded once and each part encoded once.
+        For video this skips the intermediate ``_converted.mp3`` unless
+        asked to keep it.
+        """
+        converted_path = None
+        if keep_converted and self.is_video:
+            base_name = os.path.splitext(self.input_file)[0]
+            converted_path = f"{base_name}_converted.mp3"
+        
+        output_files = self.part_paths(output_dir, len(ranges))
+        partial_files = segment_media(self.input_file, ranges, [partial_path(path) for path in output_files],
+                                      bitrate, converted_path, on_progress=self.progress.advance,
+                                      targets=self.targets, workers=workers)
+        for partial_file, output_path in zip(partial_files, output_files):
+            self._finish_part(partial_file, output_path)
+        for i, (output_path, (start_time, end_time)) in enumerate(zip(output_files, ranges)):
+            self._report_part(i, len(ranges), output_path, start_time, end_time)
+        
+        if converted_path:
+            # Kept on request, so not registered for cleanup()
+            logger.info(f"🎥 Converted: {os.path.basename(converted_path)}")
+        return converted_path, output_files
+    
+    def _split_parallel(self, ranges, output_dir, bitrate, workers, todo=None, gains=None):
+        """
+        Encode parts concurrently, one ffmpeg process per part, each reading
+        only its own time range straight from the source (video included).
+        ``todo`` limits the parts written (default: all); ``gains`` gives
+        each part's gain in dB (optional).
+        """
+        todo = list(range(len(ranges))) if todo is None else list(todo)
+        output_paths = self.part_paths(output_dir, len(ranges))
+        if not todo:
+            return []
+        if workers != AUTO_WORKERS:
+            # With "auto" the scheduler logs its choice as it tunes
+            workers = resolve_workers(workers)
+            logger.info(f"⚙️  Encoding with {workers} workers")
+        
+        output_files = []
+        # The last part runs to the end of the input, however the probed duration rounded
+        todo_ranges = [(ranges[i][0], None if i == len(ranges) - 1 else ranges[i][1]) for i in todo]
+        partial_paths = [partial_path(output_paths[i]) for i in todo]
+        # Closed explicitly so an error or cancellation stops pending parts at once
+        parts = encode_ranges(self.input_file, todo_ranges, partial_paths, bitrate, workers, self.targets,
+                              [gains[i] for i in todo] if gains else None)
+        with closing(parts):
+            for position, partial_file in parts:
+                i = todo[position]
+                self._finish_part(partial_file, output_paths[i])
+                output_files.append(output_paths[i])
+                self._report_part(i, len(ranges), output_paths[i], *ranges[i])
+        
+        return output_files
+    
+    def _split_stream(self, ranges, output_dir, bitrate):
+        """
+        Split without holding the decoded audio in memory: one ffmpeg decodes
+        to raw PCM, which is fed in fixed-size chunks to each part's encoder.
+        """
+        output_paths = self.part_paths(output_dir, len(ranges))
+        output_files = []
+        parts = stream_split(
+            self.input_file, ranges, [partial_path(path) for path in output_paths],
+            sample_rate=self.file_info.get('sample_rate'),
+            channels=self.file_info.get('channels'),
+            bitrate=bitrate,
+            targets=self.targets
+        )
+        # Closed explicitly so an error or cancellation kills the ffmpeg processes at once
+        with closing(parts):
+            for i, partial_file in parts:
+                self._finish_part(partial_file, output_paths[i])
+                output_files.append(output_paths[i])
+                self._report_part(i, len(ranges), output_paths[i], *ranges[i])
         
-        return self.converted_mp3_path, output_files
+        return output_files
     
     def get_media_info(self):
         """Get comprehensive information about the media file."""
         return self.file_info
     
     def cleanup(self):
-        """Clean up any temporary converted files."""
+        """Clean up any temporary converted files and decoded PCM."""
+        self.close_pcm()
         if self.converted_mp3_path and os.path.exists(self.converted_mp3_path):
             # Only delete if it was created during this session
-            if self.converted_mp3_path != self.input_file:
+            if self.converted_mp3_path != self.input_file and not self.converted_from_cache:
                 os.remove(self.converted_mp3_path)
-                print(f"🧹 Cleaned up temporary file: {self.converted_mp3_path}")
\ No newline at end of file
+                logger.info(f"🧹 Cleaned up temporary file: {self.converted_mp3_path}")
\ No newline at end of file
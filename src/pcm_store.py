@@ -0,0 +1,147 @@
+"""
+Decoded audio as memory-mapped raw PCM: ffmpeg decodes the source once to a
+raw s16le file, and parts are handed out as zero-copy views of the mapping
+"""
+
+import os
+import mmap
+import weakref
+import tempfile
+
+from .ffmpeg_tools import run_ffmpeg, output_targets
+from .streaming import (
+    PartEncoders, PCM_SAMPLE_WIDTH, STREAM_CHUNK_BYTES, DEFAULT_SAMPLE_RATE, DEFAULT_CHANNELS
+)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class PCMStore:
+    """
+    Raw s16le PCM of a whole source in a file, memory-mapped read-only.
+
+    Slicing a part (``view``, ``samples``) copies nothing: the views point
+    into the mapping, and the OS pages the audio in as an encoder reads it.
+    ``encode`` pipes a part straight into its encoders' stdin, so there is
+    no per-part copy and no temporary WAV.
+
+    Use ``PCMStore.decode`` to create one; ``close`` unmaps and deletes the
+    file (also on leaving a ``with`` block, and at the latest when the store
+    is garbage collected or the interpreter exits).
+    """
+
+    def __init__(self, path, sample_rate, channels, delete=True):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_bytes = channels * PCM_SAMPLE_WIDTH
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # An empty file can't be mapped; it simply has no samples
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._map) if self._map is not None else memoryview(b'')
+        self.frame_count = size // self.frame_bytes
+        self._remove = weakref.finalize(self, _remove_file, path) if delete else None
+
+    @classmethod
+    def decode(cls, input_file, sample_rate=None, channels=None, directory=None):
+        """
+        Decode ``input_file``'s first audio stream (video included) into a
+        new raw PCM file and map it.
+
+        Args:
+            input_file (str): Source media file
+            sample_rate (int): Decode sample rate (defaults to 44100)
+            channels (int): Decode channel count (defaults to 2)
+            directory (str): Where to put the PCM file (default: the
+                             system temp directory, see ``TMPDIR``)
+
+        Returns:
+            PCMStore: The mapped audio
+        """
+        sample_rate = sample_rate or DEFAULT_SAMPLE_RATE
+        channels = channels or DEFAULT_CHANNELS
+        fd, path = tempfile.mkstemp(suffix='.pcm', prefix='mp3_splitter_', dir=directory)
+        os.close(fd)
+        try:
+            run_ffmpeg(['-y', '-i', input_file, '-map', '0:a:0', '-vn',
+                        '-f', 's16le', '-acodec', 'pcm_s16le',
+                        '-ar', str(sample_rate), '-ac', str(channels), path],
+                       f"Decoding {os.path.basename(input_file)}")
+            return cls(path, sample_rate, channels)
+        except BaseException:
+            os.remove(path)
+            raise
+
+    @property
+    def duration_ms(self):
+        return self.frame_count * 1000 / self.sample_rate
+
+    @property
+    def byte_count(self):
+        return self.frame_count * self.frame_bytes
+
+    def view(self, start_sample=0, end_sample=None):
+        """
+        Zero-copy ``memoryview`` of the interleaved s16le bytes of samples
+        ``start_sample`` up to ``end_sample`` (default: the end).
+        """
+        end_sample = self.frame_count if end_sample is None else min(end_sample, self.frame_count)
+        start_sample = min(max(0, start_sample), end_sample)
+        return self._view[start_sample * self.frame_bytes:end_sample * self.frame_bytes]
+
+    def samples(self, start_sample=0, end_sample=None):
+        """Zero-copy read-only NumPy view of the same samples, shaped ``(samples, channels)``."""
+        # Encoding only needs the bytes; NumPy is imported for analysis callers alone
+        import numpy as np
+        return np.frombuffer(self.view(start_sample, end_sample), dtype='<i2').reshape(-1, self.channels)
+
+    def encode(self, start_sample, end_sample, output_path, bitrate='320k', targets=None,
+               chunk_bytes=STREAM_CHUNK_BYTES, gain_db=None):
+        """
+        Encode samples ``start_sample`` to ``end_sample`` (None: the end) to
+        ``output_path``, in every output target's format, by writing views
+        of the mapping to the encoders' stdin. ``gain_db`` is applied by
+        the encoders.
+
+        Returns:
+            int: Bytes of PCM written to each encoder
+        """
+        data = self.view(start_sample, end_sample)
+        chunk_bytes = max(self.frame_bytes, chunk_bytes - chunk_bytes % self.frame_bytes)
+        encoders = PartEncoders(output_path, self.sample_rate, self.channels, bitrate,
+                                targets or output_targets(bitrate=bitrate), gain_db)
+        try:
+            # In chunks, so several encoders of a part advance together
+            for offset in range(0, len(data), chunk_bytes):
+                encoders.write(data[offset:offset + chunk_bytes])
+            encoders.finish()
+        finally:
+            encoders.kill()
+        return len(data)
+
+    def close(self):
+        """Unmap the audio and delete its file (if the store owns it)."""
+        if self._file is None:
+            return
+        self._view.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # Views handed out are still alive; the mapping goes with the last of them
+        self._file.close()
+        self._file = None
+        if self._remove is not None:
+            self._remove()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
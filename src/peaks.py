@@ -0,0 +1,201 @@
+"""
+Waveform peak index: min/max of the samples at a few resolutions, built in
+one streaming decode and cached next to the probe results, so a waveform of
+any length draws in milliseconds without decoding the audio again
+"""
+
+import io
+import zipfile
+
+import numpy as np
+
+from .cache import get_media_cache
+from .progress import SplitCancelled
+from .streaming import open_decoder, _finish, DEFAULT_SAMPLE_RATE, DEFAULT_CHANNELS
+
+# Samples per bin of each level, finest first; each is a whole multiple of the one before
+PEAK_BIN_SIZES = (256, 4096, 65536)
+# Frames decoded per step: whole bins of every level
+PEAK_CHUNK_FRAMES = PEAK_BIN_SIZES[-1] * 16
+
+
+def _read_full(stream, view):
+    """Fill ``view`` from ``stream`` unless it ends first; returns the bytes read."""
+    filled = 0
+    while filled < len(view):
+        size = stream.readinto(view[filled:])
+        if not size:
+            break
+        filled += size
+    return filled
+
+
+def _bin_extremes(samples, bin_size, channels):
+    """Min and max of every ``bin_size`` frames of interleaved samples, over all channels."""
+    bins = samples.reshape(-1, bin_size * channels)
+    return bins.min(axis=1), bins.max(axis=1)
+
+
+class PeakIndex:
+    """
+    Per-level ``(mins, maxs)`` int16 arrays of a decoded source: one entry
+    per ``bin_size`` samples (the last bin may be shorter), the extremes of
+    every channel in it.
+
+    ``columns`` picks the coarsest level that still resolves the requested
+    view and folds it into one min/max per pixel column, so drawing costs
+    the same for a minute and for ten hours.
+    """
+
+    def __init__(self, levels, sample_rate, frame_count):
+        self.levels = levels
+        self.sample_rate = sample_rate
+        self.frame_count = frame_count
+
+    @classmethod
+    def build(cls, input_file, sample_rate=None, channels=None, on_progress=None, cancel_event=None):
+        """
+        Decode ``input_file``'s audio once, streaming, and reduce it to peaks.
+
+        Args:
+            input_file (str): Source media file (audio or video)
+            sample_rate (int): Decode sample rate (defaults to 44100)
+            channels (int): Decode channel count (defaults to 2)
+            on_progress (callable): Called with the milliseconds decoded so
+                                    far after every chunk
+            cancel_event (threading.Event): Set it to stop decoding at the
+                                            next chunk; raises ``SplitCancelled``
+
+        Returns:
+            PeakIndex: The index
+        """
+        sample_rate = sample_rate or DEFAULT_SAMPLE_RATE
+        channels = channels or DEFAULT_CHANNELS
+        frame_bytes = channels * 2
+        buffer = bytearray(PEAK_CHUNK_FRAMES * frame_bytes)
+        view = memoryview(buffer)
+        chunks = {bin_size: ([], []) for bin_size in PEAK_BIN_SIZES}
+        frame_count = 0
+
+        decoder = open_decoder(input_file, sample_rate, channels)
+        try:
+            while True:
+                size = _read_full(decoder.stdout, view)
+                size -= size % frame_bytes
+                if not size:
+                    break
+                samples = np.frombuffer(buffer, dtype='<i2', count=size // 2)
+                frame_count += size // frame_bytes
+                if size < len(buffer):
+                    # Last chunk: repeat the final sample up to whole bins, which leaves the extremes as they are
+                    samples = np.pad(samples, (0, len(buffer) // 2 - len(samples)), mode='edge')
+                # Each level from the one below: the samples are only scanned once
+                mins, maxs = _bin_extremes(samples, PEAK_BIN_SIZES[0], channels)
+                previous = PEAK_BIN_SIZES[0]
+                for bin_size in PEAK_BIN_SIZES:
+                    if bin_size != previous:
+                        mins = mins.reshape(-1, bin_size // previous).min(axis=1)
+                        maxs = maxs.reshape(-1, bin_size // previous).max(axis=1)
+                        previous = bin_size
+                    chunks[bin_size][0].append(mins)
+                    chunks[bin_size][1].append(maxs)
+                if on_progress:
+                    on_progress(frame_count * 1000 / sample_rate)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise SplitCancelled("Waveform cancelled")
+                if size < len(buffer):
+                    break
+            _finish(decoder, "Building the waveform")
+        finally:
+            if decoder.poll() is None:
+                decoder.kill()
+                decoder.wait()
+                decoder.stderr_file.close()
+
+        levels = {}
+        for bin_size, (mins, maxs) in chunks.items():
+            count = -(-frame_count // bin_size)
+            levels[bin_size] = (np.concatenate(mins or [np.zeros(0, np.int16)])[:count],
+                                np.concatenate(maxs or [np.zeros(0, np.int16)])[:count])
+        return cls(levels, sample_rate, frame_count)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Read an index written by ``to_bytes``; raises ValueError if it isn't one."""
+        try:
+            with np.load(io.BytesIO(data)) as arrays:
+                levels = {
+                    bin_size: (arrays[f"min_{bin_size}"], arrays[f"max_{bin_size}"])
+                    for bin_size in PEAK_BIN_SIZES
+                }
+                return cls(levels, int(arrays['sample_rate']), int(arrays['frame_count']))
+        except (OSError, KeyError, EOFError, ValueError, zipfile.BadZipFile) as e:
+            raise ValueError(f"Not a peak index: {e}")
+
+    def to_bytes(self):
+        """The index as an ``.npz`` archive."""
+        arrays = {'sample_rate': self.sample_rate, 'frame_count': self.frame_count}
+        for bin_size, (mins, maxs) in self.levels.items():
+            arrays[f"min_{bin_size}"] = mins
+            arrays[f"max_{bin_size}"] = maxs
+        output = io.BytesIO()
+        np.savez(output, **arrays)
+        return output.getvalue()
+
+    @property
+    def duration_ms(self):
+        return self.frame_count * 1000 / self.sample_rate
+
+    def columns(self, start_sample, end_sample, width):
+        """
+        Peaks of samples ``start_sample`` to ``end_sample`` folded into
+        ``width`` pixel columns.
+
+        Returns:
+            tuple: ``(mins, maxs)`` float arrays of ``width`` values in
+                   [-1, 1]; columns past the end of the audio are 0
+        """
+        width = max(1, int(width))
+        samples_per_column = max(1.0, (end_sample - start_sample) / width)
+        # Coarsest level with at least one bin per column (the finest when zoomed in further)
+        bin_size = max([size for size in PEAK_BIN_SIZES if size <= samples_per_column] or [PEAK_BIN_SIZES[0]])
+        mins, maxs = self.levels[bin_size]
+
+        # First bin of each column, and one past the last bin of the view
+        edges = np.floor((start_sample + np.arange(width + 1) * samples_per_column) / bin_size).astype(np.int64)
+        edges = np.clip(edges, 0, len(mins))
+        # Every column gets at least its own bin, even when zoomed past the bin size
+        ends = np.maximum(edges[1:], edges[:-1] + 1)
+        valid = ends <= len(mins)
+        column_mins = np.zeros(width)
+        column_maxs = np.zeros(width)
+        if valid.any():
+            # reduceat folds each column's bins in one call; the extra index (and the
+            # sentinel bin it may point at) bounds the last column
+            indexes = np.append(edges[:-1][valid], ends[valid][-1])
+            column_mins[valid] = np.minimum.reduceat(np.append(mins, 0), indexes)[:-1]
+            column_maxs[valid] = np.maximum.reduceat(np.append(maxs, 0), indexes)[:-1]
+        return column_mins / 32768, column_maxs / 32768
+
+
+def cached_peak_index(input_file, sample_rate=None, channels=None, use_cache=True, on_progress=None,
+                      cancel_event=None):
+    """
+    The peak index of ``input_file`` from the media cache, or built (see
+    ``PeakIndex.build``) and stored there.
+    """
+    cache = get_media_cache() if use_cache else None
+    if cache:
+        try:
+            data = cache.get_peaks(input_file)
+            if data is not None:
+                return PeakIndex.from_bytes(data)
+        except (OSError, ValueError):
+            pass
+    index = PeakIndex.build(input_file, sample_rate, channels, on_progress, cancel_event)
+    if cache:
+        try:
+            cache.put_peaks(input_file, index.to_bytes())
+        except OSError:
+            pass
+    return index
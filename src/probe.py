@@ -0,0 +1,194 @@
+"""
+Fast media probing without decoding the audio
+"""
+
+import os
+import re
+import json
+import subprocess
+
+from .config import get_ffmpeg_path, get_ffprobe_path
+from .mp3_frames import find_sync, id3v2_size, parse_frame_header, parse_info_tag
+from .sniff import sniff_media
+
+# Bytes read after any ID3v2 tag when looking for the first MP3 frame
+MP3_PROBE_BYTES = 64 * 1024
+PROBE_TIMEOUT = 30
+
+
+def probe_mp3_headers(file_path):
+    """
+    Probe an MP3 by reading only its headers.
+
+    Uses the Xing/Info or VBRI frame count (less the LAME encoder delay and
+    padding) when present, otherwise assumes CBR and derives the duration
+    from the audio payload size.
+
+    Args:
+        file_path (str): Path to the MP3 file
+
+    Returns:
+        dict: Probe result (see ``probe_media``)
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        audio_start = id3v2_size(f.read(10))
+        f.seek(audio_start)
+        data = f.read(MP3_PROBE_BYTES)
+        f.seek(max(0, file_size - 128))
+        has_id3v1 = f.read(3) == b'TAG'
+
+    pos = find_sync(data)
+    if pos is None:
+        raise ValueError(f"No MPEG audio frames found in {file_path}")
+
+    header = parse_frame_header(data[pos:pos + 4])
+    tag = parse_info_tag(data[pos:pos + header['frame_size']], header)
+    audio_bytes = file_size - audio_start - pos - (128 if has_id3v1 else 0)
+
+    if tag and tag['frames']:
+        # Gapless length: the encoder delay and padding are not part of the audio
+        audio_samples = tag['frames'] * header['samples_per_frame']
+        if tag['lame']:
+            audio_samples = max(0, audio_samples - tag['delay'] - tag['padding'])
+        duration_ms = audio_samples * 1000 / header['sample_rate']
+        if tag['bytes']:
+            audio_bytes = tag['bytes']
+        bit_rate = int(audio_bytes * 8 * 1000 / duration_ms) if duration_ms else 0
+    else:
+        bit_rate = header['bitrate'] * 1000
+        duration_ms = audio_bytes * 8 * 1000 / bit_rate
+
+    return {
+        'duration_ms': int(round(duration_ms)),
+        'codec': 'mp3',
+        'sample_rate': header['sample_rate'],
+        'channels': header['channels'],
+        'bit_rate': bit_rate,
+        'has_video': False,
+        'probe_method': 'mp3_headers',
+    }
+
+
+def probe_with_ffprobe(file_path):
+    """
+    Probe any media file with ``ffprobe -print_format json``.
+
+    Args:
+        file_path (str): Path to the media file
+
+    Returns:
+        dict: Probe result (see ``probe_media``)
+    """
+    ffprobe = get_ffprobe_path()
+    if not ffprobe or 'ffprobe' not in os.path.basename(ffprobe).lower():
+        raise RuntimeError("FFprobe is not available")
+
+    cmd = [
+        ffprobe, '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', file_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFprobe failed: {result.stderr.strip()}")
+
+    data = json.loads(result.stdout)
+    streams = data.get('streams', [])
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    if audio is None:
+        raise ValueError(f"No audio stream found in {file_path}")
+
+    fmt = data.get('format', {})
+    duration = audio.get('duration') or fmt.get('duration')
+    if duration is None:
+        raise RuntimeError(f"FFprobe reported no duration for {file_path}")
+
+    return {
+        'duration_ms': int(round(float(duration) * 1000)),
+        'codec': audio.get('codec_name'),
+        'sample_rate': int(audio.get('sample_rate', 0)),
+        'channels': int(audio.get('channels', 0)),
+        'bit_rate': int(audio.get('bit_rate') or fmt.get('bit_rate') or 0),
+        'has_video': any(
+            s.get('codec_type') == 'video'
+            and not s.get('disposition', {}).get('attached_pic')
+            for s in streams
+        ),
+        'probe_method': 'ffprobe',
+    }
+
+
+def probe_with_ffmpeg(file_path):
+    """
+    Probe a media file from the stream summary ``ffmpeg -i`` prints.
+    Used when only the ffmpeg binary is available.
+
+    Args:
+        file_path (str): Path to the media file
+
+    Returns:
+        dict: Probe result (see ``probe_media``)
+    """
+    ffmpeg = get_ffmpeg_path()
+    if not ffmpeg:
+        raise RuntimeError("FFmpeg is not available")
+
+    result = subprocess.run(
+        [ffmpeg, '-hide_banner', '-i', file_path],
+        capture_output=True, text=True, timeout=PROBE_TIMEOUT
+    )
+    output = result.stderr
+
+    duration = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', output)
+    audio = re.search(r'Stream #\S+.*?: Audio: (\w+)[^,]*, (\d+) Hz, ([^,]+)(?:.*?(\d+) kb/s)?', output)
+    if duration is None or audio is None:
+        raise RuntimeError(f"Cannot probe {file_path}")
+
+    hours, minutes, seconds = duration.groups()
+    layout = audio.group(3).strip()
+    channels = {'mono': 1, 'stereo': 2}.get(layout)
+    if channels is None:
+        match = re.match(r'(\d+)', layout)
+        channels = int(match.group(1)) if match else 0
+
+    return {
+        'duration_ms': int(round((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000)),
+        'codec': audio.group(1),
+        'sample_rate': int(audio.group(2)),
+        'channels': channels,
+        'bit_rate': int(audio.group(4)) * 1000 if audio.group(4) else 0,
+        'has_video': re.search(r'Stream #\S+.*?: Video: (?!mjpeg|png)', output) is not None,
+        'probe_method': 'ffmpeg',
+    }
+
+
+def probe_media(file_path):
+    """
+    Get duration and audio stream parameters without decoding.
+
+    MP3 files (recognised by content) are probed from their headers in pure
+    Python; everything else (and MP3s whose headers cannot be read) goes
+    through ffprobe, falling back to ffmpeg's stream summary.
+
+    Args:
+        file_path (str): Path to the media file
+
+    Returns:
+        dict: ``duration_ms``, ``codec``, ``sample_rate``, ``channels``,
+              ``bit_rate`` (bits/s), ``has_video`` and ``probe_method``
+    """
+    probes = [probe_with_ffprobe, probe_with_ffmpeg]
+    try:
+        if (sniff_media(file_path) or {}).get('container') == 'mp3':
+            probes.insert(0, probe_mp3_headers)
+    except OSError as e:
+        raise RuntimeError(f"Cannot probe {file_path}: {e}")
+
+    errors = []
+    for probe in probes:
+        try:
+            return probe(file_path)
+        except (OSError, ValueError, RuntimeError, subprocess.SubprocessError) as e:
+            errors.append(f"{probe.__name__}: {e}")
+
+    raise RuntimeError(f"Cannot probe {file_path}: {'; '.join(errors)}")
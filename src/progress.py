@@ -0,0 +1,130 @@
+"""
+Progress events and cancellation for long-running splits
+"""
+
+import os
+import time
+
+from .utils import format_time
+
+
+class SplitCancelled(RuntimeError):
+    """Raised inside ``split_media`` when its cancel event is set."""
+
+
+class SplitProgress:
+    """
+    Track a split and report it to an optional callback.
+
+    The callback receives one dict per event with these keys:
+
+    - ``event``: ``"stage"``, ``"progress"``, ``"part"`` or ``"done"``
+    - ``message``: Human-readable description of the event
+    - ``part`` / ``output_path``: Finished part index and path (``"part"`` only)
+    - ``output_files``: Every part written (``"done"`` only)
+    - ``parts_done`` / ``total_parts``: Parts written so far / planned
+    - ``processed_ms`` / ``total_ms``: Audio handled so far / in total
+    - ``bytes_written``: Size of the parts written so far
+    - ``fraction``: Completion from 0.0 to 1.0
+    - ``elapsed_seconds``, ``speed`` (times realtime) and ``eta_seconds``
+      (None until there is enough data to estimate)
+
+    Cancellation is cooperative: every event checks ``cancel_event`` (a
+    ``threading.Event``) and raises ``SplitCancelled`` once it is set.
+    """
+
+    def __init__(self, callback=None, cancel_event=None):
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.started = time.time()
+        self.total_parts = 0
+        self.total_ms = 0
+        self.parts_done = 0
+        self.processed_ms = 0
+        self.bytes_written = 0
+
+    @property
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Raise ``SplitCancelled`` if cancellation was requested."""
+        if self.cancelled:
+            raise SplitCancelled("Split cancelled")
+
+    def begin(self, total_parts, total_ms):
+        """Record the planned work and restart the clock."""
+        self.started = time.time()
+        self.total_parts = total_parts
+        self.total_ms = total_ms
+        self._emit('stage', f"Splitting into {total_parts} parts")
+
+    def stage(self, message):
+        """Report a step that has no measurable progress of its own."""
+        self._emit('stage', message)
+
+    def advance(self, processed_ms):
+        """Report audio handled so far when parts finish all at once at the end."""
+        self.processed_ms = max(self.processed_ms, min(processed_ms, self.total_ms))
+        self._emit('progress', f"Processed {format_time(self.processed_ms)} of {format_time(self.total_ms)}")
+
+    def part_done(self, index, output_path, start_ms, end_ms):
+        """Report a finished part."""
+        self.parts_done += 1
+        self.processed_ms = min(self.processed_ms + end_ms - start_ms, self.total_ms)
+        try:
+            self.bytes_written += os.path.getsize(output_path)
+        except OSError:
+            pass
+        self._emit('part', f"Part {index+1}/{self.total_parts} done", part=index, output_path=output_path)
+
+    def finish(self, **extra):
+        """Report the end of the split; ``extra`` is added to the event."""
+        self.processed_ms = self.total_ms
+        self._emit('done', f"Finished {self.parts_done} parts", **extra)
+
+    def snapshot(self, event, message, **extra):
+        """Build the event dict for the current state."""
+        elapsed = time.time() - self.started
+        fraction = self.processed_ms / self.total_ms if self.total_ms else 0.0
+        speed = self.processed_ms / 1000 / elapsed if elapsed > 0 else None
+        eta = None
+        if speed and self.processed_ms:
+            eta = (self.total_ms - self.processed_ms) / 1000 / speed
+        info = {
+            'event': event,
+            'message': message,
+            'parts_done': self.parts_done,
+            'total_parts': self.total_parts,
+            'processed_ms': self.processed_ms,
+            'total_ms': self.total_ms,
+            'bytes_written': self.bytes_written,
+            'fraction': min(1.0, fraction),
+            'elapsed_seconds': round(elapsed, 2),
+            'speed': speed,
+            'eta_seconds': eta,
+        }
+        info.update(extra)
+        return info
+
+    def _emit(self, event, message, **extra):
+        self.check_cancelled()
+        if self.callback:
+            self.callback(self.snapshot(event, message, **extra))
+
+
+def format_progress(info):
+    """
+    One-line summary of a progress event, e.g.
+    ``45% • 3/10 parts • 12.3x realtime • 8.4 MB • ETA 00:41``.
+    """
+    parts = [f"{info['fraction'] * 100:.0f}%"]
+    if info['total_parts']:
+        parts.append(f"{info['parts_done']}/{info['total_parts']} parts")
+    if info['speed']:
+        parts.append(f"{info['speed']:.1f}x realtime")
+    if info['bytes_written']:
+        parts.append(f"{info['bytes_written'] / (1024 * 1024):.1f} MB")
+    if info['eta_seconds'] is not None and info['event'] != 'done':
+        parts.append(f"ETA {format_time(info['eta_seconds'] * 1000)}")
+    return " • ".join(parts)
@@ -0,0 +1,253 @@
+"""
+Encoder concurrency: the CPUs this process may actually use (affinity and
+cgroup CPU quota), and a scheduler that tunes the number of concurrent
+encoders to the throughput it measures while a split runs
+"""
+
+import os
+import sys
+import math
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# ``workers`` value that lets EncoderScheduler pick and tune the concurrency
+AUTO_WORKERS = 'auto'
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+NETWORK_FILESYSTEMS = (
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p', 'ceph', 'glusterfs', 'lustre',
+    'davfs', 'fuse.sshfs', 'fuse.rclone', 'fuse.s3fs', 'fuse.gcsfuse', 'fuse.glusterfs',
+)
+# GetDriveTypeW result for a mapped network drive
+DRIVE_REMOTE = 4
+
+# Most concurrent encoders per available CPU; a network source starts there,
+# as its encoders spend part of their time waiting for reads
+MAX_WORKERS_PER_CPU = 2
+# A step is kept only if it raises throughput by more than this fraction
+MIN_IMPROVEMENT = 0.05
+# Tuning starts again when throughput falls this far below the settled best
+RETUNE_DROP = 0.25
+# Parts finished per measurement window (at least one per concurrent encoder)
+MIN_WINDOW_PARTS = 2
+
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_v2_limit(path):
+    """Tightest ``cpu.max`` quota (in CPUs) from ``path`` up to the cgroup root."""
+    parts = [part for part in path.split('/') if part]
+    limits = []
+    for depth in range(len(parts), -1, -1):
+        quota, _, period = (_read(os.path.join(CGROUP_ROOT, *parts[:depth], 'cpu.max')) or 'max').partition(' ')
+        if quota != 'max' and period:
+            limits.append(int(quota) / int(period))
+    return min(limits) if limits else None
+
+
+def _cgroup_v1_limit(path):
+    """CFS quota (in CPUs) of the process's cgroup v1 ``cpu`` controller."""
+    for controller in ('cpu', 'cpu,cpuacct', 'cpuacct,cpu'):
+        # Without a cgroup namespace the mount shows the container's own group at its root
+        for directory in (os.path.join(CGROUP_ROOT, controller, path.lstrip('/')),
+                          os.path.join(CGROUP_ROOT, controller)):
+            quota = _read(os.path.join(directory, 'cpu.cfs_quota_us'))
+            period = _read(os.path.join(directory, 'cpu.cfs_period_us'))
+            if quota and period:
+                return int(quota) / int(period) if int(quota) > 0 else None
+    return None
+
+
+def cgroup_cpu_limit():
+    """
+    CPU quota of this process's cgroup, e.g. 1.5 for a container limited to
+    one and a half CPUs (Linux, cgroup v1 or v2).
+
+    Returns:
+        float: The quota in CPUs, or None if there is none (or no cgroups)
+    """
+    try:
+        for line in (_read('/proc/self/cgroup') or '').splitlines():
+            hierarchy, controllers, path = line.split(':', 2)
+            if hierarchy == '0' and not controllers:
+                limit = _cgroup_v2_limit(path)
+            elif 'cpu' in controllers.split(','):
+                limit = _cgroup_v1_limit(path)
+            else:
+                continue
+            if limit:
+                return limit
+    except ValueError:
+        pass
+    return None
+
+
+def available_cpus():
+    """
+    CPUs this process can use: those it may be scheduled on, capped by the
+    cgroup CPU quota (rounded up), so a container limited to 2 CPUs on a
+    64-core host gets 2.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def is_network_path(path):
+    """Whether ``path`` is on a network file system (NFS, SMB, sshfs, ... or a Windows network drive)."""
+    path = os.path.abspath(path)
+    if sys.platform == 'win32':
+        drive = os.path.splitdrive(path)[0]
+        if drive.startswith('\\\\'):
+            return True
+        try:
+            import ctypes
+            return ctypes.windll.kernel32.GetDriveTypeW(drive + '\\') == DRIVE_REMOTE
+        except (AttributeError, OSError):
+            return False
+
+    # The longest mount point containing the path decides its file system
+    path = os.path.realpath(path)
+    best, fs_type = '', None
+    for line in (_read('/proc/mounts') or '').splitlines():
+        fields = line.split()
+        if len(fields) < 3:
+            continue
+        mount_point = fields[1].replace('\\040', ' ')
+        inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+        if inside and len(mount_point) >= len(best):
+            best, fs_type = mount_point, fields[2]
+    return fs_type in NETWORK_FILESYSTEMS
+
+
+class EncoderScheduler:
+    """
+    Runs a split's encodes with a number of them at a time.
+
+    With a fixed ``workers`` count this is a plain pool. With
+    ``AUTO_WORKERS`` it starts from an estimate (the available CPUs, or the
+    most it allows for a source on a network mount) and hill-climbs: after
+    each window of finished parts it compares the total realtime factor
+    (seconds of audio encoded per wall second, all encoders together) with
+    the best so far and moves one encoder up or down, settling on the best
+    setting once neither direction helps. A later drop in throughput (a
+    busy disk or network) starts the search again.
+    """
+
+    def __init__(self, part_count, workers=AUTO_WORKERS, input_file=None):
+        self.adaptive = workers == AUTO_WORKERS
+        self.history = []
+        if not self.adaptive:
+            self.concurrency = self.max_workers = max(1, min(workers, part_count))
+            return
+
+        self.cpus = available_cpus()
+        self.network = bool(input_file) and is_network_path(input_file)
+        self.max_workers = max(1, min(part_count, self.cpus * MAX_WORKERS_PER_CPU))
+        self.concurrency = self.max_workers if self.network else min(self.cpus, self.max_workers)
+        self.direction = 1
+        self.reversed = False
+        self.settled = False
+        self.best = None
+        self._tried = set()
+        self._start_window()
+        source = ", network source" if self.network else ""
+        logger.info(f"⚙️  Encoding with {self.concurrency} workers (auto: {self.cpus} CPUs available{source}; "
+                    f"tuning up to {self.max_workers} by throughput)")
+
+    def _start_window(self):
+        self._window_started = time.monotonic()
+        self._window_ms = 0.0
+        self._window_parts = 0
+
+    def record(self, audio_ms):
+        """Count a finished part holding ``audio_ms`` of audio; may change ``concurrency``."""
+        if not self.adaptive:
+            return
+        self._window_ms += audio_ms
+        self._window_parts += 1
+        if self._window_parts < max(MIN_WINDOW_PARTS, self.concurrency):
+            return
+        elapsed = time.monotonic() - self._window_started
+        rate = self._window_ms / 1000 / elapsed if elapsed > 0 else 0.0
+        self.history.append((self.concurrency, rate))
+        self._adjust(rate)
+        self._start_window()
+
+    def _adjust(self, rate):
+        if self.settled:
+            if rate >= self.best[0] * (1 - RETUNE_DROP):
+                return
+            logger.info(f"⚙️  Throughput fell to {rate:.1f}x realtime; re-tuning")
+            self.best, self.settled, self.reversed = None, False, False
+            self._tried = set()
+
+        self._tried.add(self.concurrency)
+        if self.best is None or rate > self.best[0] * (1 + MIN_IMPROVEMENT):
+            self.best = (rate, self.concurrency)
+        elif self.reversed:
+            return self._settle()
+        else:
+            # Worse than the best: try the other side of it once
+            self.reversed = True
+            self.direction = -self.direction
+        target = self.best[1] + self.direction
+        if not 1 <= target <= self.max_workers and not self.reversed:
+            self.reversed = True
+            self.direction = -self.direction
+            target = self.best[1] + self.direction
+        # Out of range, or already measured below the best in this search
+        if not 1 <= target <= self.max_workers or target in self._tried:
+            return self._settle()
+        logger.info(f"⚙️  {self.concurrency} → {target} workers ({rate:.1f}x realtime at {self.concurrency})")
+        self.concurrency = target
+
+    def _settle(self):
+        self.settled = True
+        self.concurrency = self.best[1]
+        logger.info(f"⚙️  Settled on {self.concurrency} workers ({self.best[0]:.1f}x realtime)")
+
+    def run(self, tasks):
+        """
+        Run ``(function, audio_ms)`` tasks, at most ``concurrency`` at a
+        time (re-read whenever one finishes). ``audio_ms`` of None leaves a
+        task out of the throughput measurement.
+
+        Yields:
+            tuple: ``(index, result)`` in task order, as each is ready
+        """
+        results = {}
+        running = {}
+        submitted = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                for i in range(len(tasks)):
+                    while i not in results:
+                        while submitted < len(tasks) and len(running) < self.concurrency:
+                            function, audio_ms = tasks[submitted]
+                            running[executor.submit(function)] = (submitted, audio_ms)
+                            submitted += 1
+                        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            index, audio_ms = running.pop(future)
+                            results[index] = future.result()
+                            if audio_ms is not None:
+                                self.record(audio_ms)
+                    yield i, results.pop(i)
+            finally:
+                for future in running:
+                    future.cancel()
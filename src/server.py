@@ -0,0 +1,448 @@
+"""
+Local HTTP job server: queue split/convert jobs and report their progress
+
+Run with ``python -m src.server``. Endpoints (JSON in and out):
+
+- ``POST /jobs``: queue a job, e.g. ``{"input_file": "/data/talk.mp4",
+  "num_parts": 5, "mode": "segment"}`` or ``{"type": "convert", ...}``
+- ``GET /jobs``: every job, newest first
+- ``GET /jobs/<id>``: one job with its latest progress
+- ``GET /jobs/<id>/outputs``: the job's output files and sizes
+- ``DELETE /jobs/<id>``: cancel a queued or running job
+- ``GET /health``: worker count and queue length
+
+Job state is persisted, so jobs that were queued or running when the server
+stopped are queued again on the next start.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .config import setup_ffmpeg, get_cache_dir
+from .mp3_splitter import MediaProcessor, SPLIT_MODES
+from .scheduler import available_cpus
+from .ffmpeg_tools import run_ffmpeg, build_convert_args
+from .progress import SplitProgress, SplitCancelled
+from .metrics import (
+    configure_logging, configure_metrics, flush_metrics, LOG_LEVELS, METRICS_FORMATS
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+STATE_FILE = "jobs.json"
+# Concurrent jobs when the output disk is rotational (seeks dominate beyond this)
+ROTATIONAL_DISK_JOBS = 2
+# Minimum seconds between persisting progress-only updates
+PERSIST_INTERVAL = 2.0
+
+JOB_TYPES = ('split', 'convert')
+# Options a job may pass through to MediaProcessor.split_media
+SPLIT_OPTIONS = (
+    'num_parts', 'bitrate', 'mode', 'workers', 'split_strategy', 'silence_window_ms',
+    'max_part_duration_ms', 'max_part_bytes', 'cue_file', 'keep_converted', 'resume', 'verify',
+    'outputs', 'loudness_target', 'cut_points_ms'
+)
+PROGRESS_FIELDS = (
+    'event', 'message', 'parts_done', 'total_parts', 'processed_ms', 'total_ms',
+    'bytes_written', 'fraction', 'speed', 'eta_seconds'
+)
+
+logger = logging.getLogger(__name__)
+
+
+def is_rotational_disk(path):
+    """
+    Whether ``path`` lives on a spinning disk (Linux only).
+
+    Returns:
+        bool: True/False, or None when it cannot be determined
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        device = os.stat(path).st_dev
+    except OSError:
+        return None
+    sys_dir = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+    # Partitions keep the queue settings on their parent device
+    for candidate in (os.path.join(sys_dir, "queue", "rotational"),
+                      os.path.join(sys_dir, "..", "queue", "rotational")):
+        try:
+            with open(candidate) as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+def default_job_workers(output_root):
+    """One job per available CPU, or ``ROTATIONAL_DISK_JOBS`` on a spinning output disk."""
+    workers = available_cpus()
+    if is_rotational_disk(output_root):
+        workers = min(workers, ROTATIONAL_DISK_JOBS)
+    return workers
+
+
+class JobStore:
+    """
+    Jobs keyed by id, persisted to a JSON file on every state change.
+    All access goes through the store's lock.
+    """
+
+    def __init__(self, state_dir):
+        self.state_dir = state_dir
+        self.path = os.path.join(state_dir, STATE_FILE)
+        self.lock = threading.RLock()
+        self.jobs = {}
+        self._last_persisted = 0.0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.jobs = {job['id']: job for job in json.load(f)}
+        except FileNotFoundError:
+            self.jobs = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️  Could not read job state ({e}); starting empty")
+            self.jobs = {}
+
+    def persist(self, force=True):
+        """Write every job to disk (progress-only updates are rate-limited)."""
+        with self.lock:
+            now = time.time()
+            if not force and now - self._last_persisted < PERSIST_INTERVAL:
+                return
+            self._last_persisted = now
+            os.makedirs(self.state_dir, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self.jobs.values()), f, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def add(self, job):
+        with self.lock:
+            self.jobs[job['id']] = job
+            self.persist()
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self.lock:
+            return sorted((dict(job) for job in self.jobs.values()),
+                          key=lambda job: job['created'], reverse=True)
+
+    def update(self, job_id, force=True, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+            self.persist(force)
+
+    def resumable(self):
+        """Ids of jobs interrupted by a shutdown, oldest first, reset to queued."""
+        with self.lock:
+            interrupted = [job for job in self.jobs.values() if job['status'] in ('queued', 'running')]
+            resumed = []
+            for job in sorted(interrupted, key=lambda job: job['created']):
+                if job.get('cancel_requested'):
+                    job.update(status='cancelled', finished=time.time())
+                else:
+                    job.update(status='queued', started=None, progress=None)
+                    resumed.append(job['id'])
+            if interrupted:
+                self.persist()
+            return resumed
+
+
+class JobServer:
+    """
+    Runs queued jobs on a fixed pool of worker threads, sharing one FFmpeg
+    discovery and the probe cache across every job.
+    """
+
+    def __init__(self, state_dir=None, output_root=None, workers=None):
+        if not setup_ffmpeg():
+            raise RuntimeError("FFmpeg configuration failed. Cannot proceed.")
+
+        self.state_dir = state_dir or os.path.join(get_cache_dir(), "server")
+        self.output_root = os.path.abspath(output_root or "server_output")
+        os.makedirs(self.output_root, exist_ok=True)
+        self.workers = workers or default_job_workers(self.output_root)
+
+        self.store = JobStore(self.state_dir)
+        self.queue = queue.Queue()
+        self.cancel_events = {}
+        self._threads = []
+
+        for job_id in self.store.resumable():
+            logger.info(f"♻️  Resuming job {job_id}")
+            self._enqueue(job_id)
+
+    def start(self):
+        """Start the worker threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i+1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _enqueue(self, job_id):
+        self.cancel_events[job_id] = threading.Event()
+        self.queue.put(job_id)
+
+    def submit(self, request):
+        """
+        Validate a job request and queue it.
+
+        Returns:
+            dict: The new job
+        """
+        if not isinstance(request, dict):
+            raise ValueError("Job request must be a JSON object")
+        job_type = request.get('type', 'split')
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {job_type}. Supported types: {', '.join(JOB_TYPES)}")
+        input_file = request.get('input_file')
+        if not input_file or not os.path.isfile(input_file):
+            raise ValueError(f"Input file not found: {input_file}")
+        unknown = set(request) - set(SPLIT_OPTIONS) - {'type', 'input_file', 'output_dir'}
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+        mode = request.get('mode', 'segment')
+        if mode not in SPLIT_MODES:
+            raise ValueError(f"Unknown split mode: {mode}. Supported modes: {', '.join(SPLIT_MODES)}")
+
+        job_id = uuid.uuid4().hex[:12]
+        base_name = os.path.splitext(os.path.basename(input_file))[0]
+        options = {key: request[key] for key in SPLIT_OPTIONS if key in request}
+        options['mode'] = mode
+        job = {
+            'id': job_id,
+            'type': job_type,
+            'input_file': os.path.abspath(input_file),
+            'output_dir': request.get('output_dir') or os.path.join(self.output_root, f"{base_name}_{job_id}"),
+            'options': options,
+            'status': 'queued',
+            'created': time.time(),
+            'started': None,
+            'finished': None,
+            'error': None,
+            'progress': None,
+            'output_files': [],
+        }
+        self.store.add(job)
+        self._enqueue(job_id)
+        logger.info(f"📥 Queued {job_type} job {job_id}: {os.path.basename(input_file)}")
+        return job
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job.
+
+        Returns:
+            bool: False if the job had already finished
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job['status'] not in ('queued', 'running'):
+            return False
+        self.cancel_events[job_id].set()
+        if job['status'] == 'queued':
+            self.store.update(job_id, status='cancelled', finished=time.time())
+        else:
+            # Recorded so a restart before the job stops doesn't resume it
+            self.store.update(job_id, cancel_requested=True)
+        return True
+
+    def _worker(self):
+        while True:
+            job_id = self.queue.get()
+            try:
+                self._run(job_id)
+            finally:
+                self.queue.task_done()
+
+    def _run(self, job_id):
+        job = self.store.get(job_id)
+        cancel_event = self.cancel_events[job_id]
+        if job is None or job['status'] != 'queued' or cancel_event.is_set():
+            return
+
+        self.store.update(job_id, status='running', started=time.time())
+        logger.info(f"▶️  Job {job_id} started")
+
+        def on_progress(info):
+            # Persist stage changes and finished parts; throttle the rest
+            force = info['event'] != 'progress'
+            progress = {key: info.get(key) for key in PROGRESS_FIELDS}
+            self.store.update(job_id, force=force, progress=progress)
+
+        try:
+            processor = MediaProcessor(job['input_file'])
+            options = dict(job['options'])
+            if job['type'] == 'convert':
+                output_files = [self._convert(processor, job, options.get('bitrate', '320k'),
+                                              SplitProgress(on_progress, cancel_event))]
+            else:
+                num_parts = options.pop('num_parts', None)
+                _, output_files = processor.split_media(
+                    num_parts, output_dir=job['output_dir'],
+                    progress_callback=on_progress, cancel_event=cancel_event, **options
+                )
+            self.store.update(job_id, status='done', finished=time.time(), output_files=output_files)
+            logger.info(f"✅ Job {job_id} done: {len(output_files)} files")
+        except SplitCancelled:
+            self.store.update(job_id, status='cancelled', finished=time.time())
+            logger.info(f"⛔ Job {job_id} cancelled")
+        except Exception as e:
+            self.store.update(job_id, status='failed', finished=time.time(), error=str(e))
+            logger.error(f"❌ Job {job_id} failed: {e}")
+
+    def _convert(self, processor, job, bitrate, progress):
+        """Encode the whole input to one MP3 with a single ffmpeg pass."""
+        os.makedirs(job['output_dir'], exist_ok=True)
+        base_name = os.path.splitext(os.path.basename(job['input_file']))[0]
+        output_path = os.path.join(job['output_dir'], f"{base_name}.mp3")
+        duration = processor.file_info['duration_ms']
+
+        progress.begin(1, duration)
+        run_ffmpeg(build_convert_args(job['input_file'], output_path, bitrate),
+                   "Converting", progress.advance)
+        progress.part_done(0, output_path, 0, duration)
+        progress.finish(output_files=[output_path])
+        return output_path
+
+    def outputs(self, job_id):
+        """Output files of a job with their sizes."""
+        job = self.store.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        files = []
+        for path in job['output_files']:
+            size = os.path.getsize(path) if os.path.exists(path) else None
+            files.append({'path': path, 'name': os.path.basename(path), 'size_bytes': size})
+        return files
+
+    def health(self):
+        return {'status': 'ok', 'workers': self.workers, 'queued': self.queue.qsize()}
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API over a ``JobServer`` (set as the HTTP server's ``job_server``)."""
+
+    server_version = "MP3SplitterJobServer/1.0"
+
+    def _send(self, status, body):
+        data = json.dumps(body, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self):
+        """Path segments of the request, e.g. ``['jobs', '<id>', 'outputs']``."""
+        return [part for part in self.path.split('?', 1)[0].split('/') if part]
+
+    def do_GET(self):
+        jobs = self.server.job_server
+        parts = self._route()
+        try:
+            if parts == ['health']:
+                self._send(200, jobs.health())
+            elif parts == ['jobs']:
+                self._send(200, jobs.store.list())
+            elif len(parts) == 2 and parts[0] == 'jobs':
+                job = jobs.store.get(parts[1])
+                if job is None:
+                    raise KeyError(parts[1])
+                self._send(200, job)
+            elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'outputs':
+                self._send(200, jobs.outputs(parts[1]))
+            else:
+                self._send(404, {'error': 'Not found'})
+        except KeyError as e:
+            self._send(404, {'error': f"Unknown job: {e.args[0]}"})
+
+    def do_POST(self):
+        if self._route() != ['jobs']:
+            self._send(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            job = self.server.job_server.submit(request)
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(201, job)
+
+    def do_DELETE(self):
+        parts = self._route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._send(404, {'error': 'Not found'})
+            return
+        try:
+            cancelled = self.server.job_server.cancel(parts[1])
+        except KeyError:
+            self._send(404, {'error': f"Unknown job: {parts[1]}"})
+            return
+        if cancelled:
+            self._send(202, {'id': parts[1], 'cancelling': True})
+        else:
+            self._send(409, {'error': 'Job has already finished'})
+
+    def log_message(self, format, *args):
+        # Requests are frequent when polling progress; keep the console for job events
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MP3 Splitter job server")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, help="Concurrent jobs (default: available CPUs, fewer on spinning disks)")
+    parser.add_argument("--state-dir", help="Where job state is persisted (default: the cache directory)")
+    parser.add_argument("--output-root", default="server_output",
+                        help="Default parent directory for job outputs (default: server_output)")
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO", help="Console log level (default: INFO)")
+    parser.add_argument("--metrics", metavar="FILE", help="Write per-stage timing metrics to FILE")
+    parser.add_argument("--metrics-format", choices=METRICS_FORMATS, default="jsonl",
+                        help="jsonl: one line per stage span; prometheus: per-stage totals "
+                             "for the node_exporter textfile collector (default: jsonl)")
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_level)
+    try:
+        configure_metrics(args.metrics, args.metrics_format)
+        job_server = JobServer(args.state_dir, args.output_root, args.workers)
+    except Exception as e:
+        logger.error(f"❌ Error: {e}")
+        sys.exit(1)
+    job_server.start()
+
+    httpd = ThreadingHTTPServer((args.host, args.port), JobRequestHandler)
+    httpd.job_server = job_server
+    logger.info(f"🚀 Job server listening on http://{args.host}:{args.port} "
+          f"({job_server.workers} workers, state in {job_server.state_dir})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("\n🛑 Shutting down (unfinished jobs resume on next start)")
+    finally:
+        httpd.server_close()
+        flush_metrics()
+
+
+if __name__ == "__main__":
+    main()
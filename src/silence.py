@@ -0,0 +1,182 @@
+"""
+Silence-aware cut points: move each nominal cut to the quietest region nearby
+"""
+
+import subprocess
+
+import numpy as np
+
+from .config import get_ffmpeg_path
+from .mp3_frames import MP3FrameIndex
+from .sniff import sniff_media
+
+# Analysis runs on a downsampled mono stream; speech energy survives 8 kHz fine
+ANALYSIS_SAMPLE_RATE = 8000
+RMS_FRAME_MS = 20
+SMOOTHING_FRAMES = 5            # lowest-energy *region* of ~100 ms, not a single frame
+# Preference for cuts close to the nominal point, in dB across the whole window
+DISTANCE_PENALTY_DB = 3.0
+# Frames this close to the quietest level count as part of the same pause
+PAUSE_TOLERANCE_DB = 3.0
+# MP3 frames decoded ahead of a window (plus their bit reservoir) so the decoder has settled
+MP3_WARMUP_FRAMES = 2
+
+
+def _decode_mono(input_args, stdin_data=None):
+    """Run ffmpeg to decode to mono s16le at the analysis rate."""
+    cmd = [get_ffmpeg_path() or 'ffmpeg', '-hide_banner', '-v', 'error'] + input_args + [
+        '-map', '0:a:0', '-vn',
+        '-ac', '1', '-ar', str(ANALYSIS_SAMPLE_RATE), '-f', 's16le', 'pipe:1'
+    ]
+    result = subprocess.run(
+        cmd, input=stdin_data, capture_output=True,
+        stdin=subprocess.DEVNULL if stdin_data is None else None
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Silence analysis failed: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+def read_mono_window(input_file, start_ms, end_ms):
+    """
+    Decode ``[start_ms, end_ms]`` of ``input_file`` as mono int16 samples,
+    seeking on the input side so only that range is read.
+
+    Returns:
+        tuple: (samples, time in ms of the first sample)
+    """
+    samples = _decode_mono([
+        '-ss', f"{start_ms / 1000:.3f}", '-t', f"{(end_ms - start_ms) / 1000:.3f}",
+        '-i', input_file
+    ])
+    return samples, start_ms
+
+
+def read_mp3_window(index, start_ms, end_ms):
+    """
+    Decode ``[start_ms, end_ms]`` of an MP3 by piping just those frames (plus
+    a short warm-up) to ffmpeg. Frame offsets make this exact and avoid
+    ffmpeg's own seeking, which can scan from the start on long VBR files.
+
+    Returns:
+        tuple: (samples, time in ms of the first sample)
+    """
+    # The frame whose decoded output holds ``start_ms``, and the one just past ``end_ms``
+    first_frame = max(0, index.end_frame_for(index.sample_at(start_ms)) - 1)
+    warmup_frame = index.reservoir_start(max(0, first_frame - MP3_WARMUP_FRAMES))
+    end_frame = max(first_frame + 1, index.end_frame_for(index.sample_at(end_ms)))
+
+    with open(index.file_path, 'rb') as f:
+        f.seek(index.offsets[warmup_frame])
+        data = f.read(index.offsets[end_frame] - index.offsets[warmup_frame])
+
+    samples = _decode_mono(['-f', 'mp3', '-i', 'pipe:0'], stdin_data=data)
+    warmup_samples = int(round(
+        (first_frame - warmup_frame) * index.samples_per_frame * ANALYSIS_SAMPLE_RATE / index.sample_rate
+    ))
+    return samples[warmup_samples:], index.frame_start_ms(first_frame)
+
+
+def frame_rms_db(samples, frame_length):
+    """RMS level in dBFS of consecutive ``frame_length``-sample frames."""
+    usable = len(samples) - len(samples) % frame_length
+    if usable == 0:
+        return np.empty(0, dtype=np.float64)
+    frames = samples[:usable].astype(np.float32).reshape(-1, frame_length) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-7))
+
+
+def quietest_point(samples, window_start_ms, nominal_ms, low_ms, high_ms):
+    """
+    Find the quietest region of ``samples`` within ``[low_ms, high_ms]``,
+    preferring points close to ``nominal_ms``.
+
+    Args:
+        samples (numpy.ndarray): Mono int16 samples at the analysis rate
+        window_start_ms (float): Time of the first sample
+        nominal_ms (float): The equal-split cut point
+        low_ms (float): Earliest allowed cut
+        high_ms (float): Latest allowed cut
+
+    Returns:
+        int: Cut point in milliseconds (``nominal_ms`` if nothing was decoded)
+    """
+    frame_length = ANALYSIS_SAMPLE_RATE * RMS_FRAME_MS // 1000
+    levels = frame_rms_db(samples, frame_length)
+    centers_ms = window_start_ms + (np.arange(len(levels)) + 0.5) * RMS_FRAME_MS
+    inside = (centers_ms >= low_ms) & (centers_ms <= high_ms)
+    levels, centers_ms = levels[inside], centers_ms[inside]
+    if len(levels) == 0:
+        return int(nominal_ms)
+
+    if len(levels) >= SMOOTHING_FRAMES:
+        kernel = np.ones(SMOOTHING_FRAMES) / SMOOTHING_FRAMES
+        levels = np.convolve(levels, kernel, mode='same')
+
+    half_window = max(nominal_ms - low_ms, high_ms - nominal_ms, 1)
+    scores = levels + DISTANCE_PENALTY_DB * np.abs(centers_ms - nominal_ms) / half_window
+    best = int(np.argmin(scores))
+
+    # Cut in the middle of the pause containing the best frame, not at its edge
+    quiet = levels <= levels[best] + PAUSE_TOLERANCE_DB
+    loud_before = np.flatnonzero(~quiet[:best])
+    loud_after = np.flatnonzero(~quiet[best:])
+    first = loud_before[-1] + 1 if len(loud_before) else 0
+    last = best + loud_after[0] - 1 if len(loud_after) else len(levels) - 1
+    return int(round((centers_ms[first] + centers_ms[last]) / 2))
+
+
+def analysis_index(input_file, index=None):
+    """Frame index used to read analysis windows of an MP3 input, or None."""
+    if index is None and (sniff_media(input_file) or {}).get('container') == 'mp3':
+        try:
+            index = MP3FrameIndex(input_file)
+        except ValueError:
+            index = None
+    return index
+
+
+def quiet_cut(input_file, nominal_ms, low_ms, high_ms, index=None):
+    """
+    Quietest cut point within ``[low_ms, high_ms]``, preferring points close
+    to ``nominal_ms``. Windows too short to analyse return ``nominal_ms``.
+    """
+    if high_ms - low_ms < RMS_FRAME_MS * SMOOTHING_FRAMES:
+        return int(nominal_ms)
+    if index is not None:
+        samples, window_start = read_mp3_window(index, low_ms, high_ms)
+    else:
+        samples, window_start = read_mono_window(input_file, low_ms, high_ms)
+    return quietest_point(samples, window_start, nominal_ms, low_ms, high_ms)
+
+
+def find_quiet_cut_points(input_file, nominal_cuts_ms, window_ms, duration_ms, index=None):
+    """
+    Move each nominal cut to the lowest-energy region within ``window_ms``
+    on either side of it. Cuts stay in order and inside the audio.
+
+    Args:
+        input_file (str): Source media file (audio or video)
+        nominal_cuts_ms (list): Cut points from an equal split, in order
+        window_ms (int): Search distance on each side of a cut
+        duration_ms (int): Total duration of the audio
+        index (MP3FrameIndex): Frame index of an MP3 source (built on demand
+                               for ``.mp3`` files when not given)
+
+    Returns:
+        list: Refined cut points in milliseconds
+    """
+    index = analysis_index(input_file, index)
+
+    cuts = []
+    previous = 0
+    for i, nominal in enumerate(nominal_cuts_ms):
+        following = nominal_cuts_ms[i + 1] if i + 1 < len(nominal_cuts_ms) else duration_ms
+        # Never cross the previous cut or reach halfway to the next nominal one
+        low = max(previous + RMS_FRAME_MS, nominal - window_ms)
+        high = min((nominal + following) / 2, nominal + window_ms, duration_ms - RMS_FRAME_MS)
+        cut = quiet_cut(input_file, nominal, low, high, index)
+        cuts.append(cut)
+        previous = cut
+    return cuts
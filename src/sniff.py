@@ -0,0 +1,180 @@
+"""
+Media type sniffing from a file's first few KB, without ffmpeg
+
+Recognises the container from its magic bytes (skipping a leading ID3v2 tag)
+and, where the header says so, whether it holds video and audio streams.
+Misnamed or non-media files are told apart in microseconds, before anything
+is probed or decoded.
+"""
+
+import os
+import re
+import struct
+
+from .mp3_frames import find_sync, id3v2_size, parse_frame_header
+
+# Bytes read from the start of the file (after any ID3v2 tag)
+SNIFF_BYTES = 16 * 1024
+
+# MP4 brands of audio-only files (iTunes audio, audiobooks, Flash audio)
+MP4_AUDIO_BRANDS = (b'M4A ', b'M4B ', b'M4P ', b'F4A ', b'F4B ')
+ASF_HEADER_GUID = bytes.fromhex('3026b2758e66cf11a6d900aa0062ce6c')
+ASF_AUDIO_MEDIA_GUID = bytes.fromhex('409e69f84d5bcf11a8fd00805f5c442b')
+ASF_VIDEO_MEDIA_GUID = bytes.fromhex('c0ef19bc4d5bcf11a8fd00805f5c442b')
+OGG_AUDIO_CODECS = (b'\x01vorbis', b'OpusHead', b'\x7fFLAC', b'Speex   ')
+OGG_VIDEO_CODECS = (b'\x80theora',)
+# Matroska CodecID element (0x86, one-byte size) holding an audio or video codec
+MATROSKA_AUDIO_CODEC = re.compile(rb'\x86[\x81-\xff]A_')
+MATROSKA_VIDEO_CODEC = re.compile(rb'\x86[\x81-\xff]V_')
+TS_PACKET_SIZE = 188
+
+
+def _result(container, is_video, has_audio=True):
+    return {'container': container, 'is_video': is_video, 'has_audio': has_audio}
+
+
+def _sniff_mp4(data):
+    brand = data[8:12]
+    if brand in MP4_AUDIO_BRANDS:
+        return _result('mp4', False)
+    # The track list is in the moov box, which may sit at the end of the file
+    has_audio = True if b'soun' in data else None
+    return _result('mov' if brand == b'qt  ' else 'mp4', True, has_audio)
+
+
+def _mp4_boxes(f, start, end):
+    """Yield ``(type, payload_start, box_end)`` of the MP4 boxes between ``start`` and ``end``."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1 and len(header) == 16:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _mp4_track_types(f):
+    """
+    Handler types (``b'soun'``, ``b'vide'``, ...) of an MP4/MOV file's
+    tracks, found by walking box headers only (moov > trak > mdia > hdlr),
+    so a moov at the end of a large file costs a few seeks.
+
+    Returns:
+        set: Handler types, or None if there is no moov box
+    """
+    f.seek(0, os.SEEK_END)
+    for box_type, start, end in _mp4_boxes(f, 0, f.tell()):
+        if box_type != b'moov':
+            continue
+        types = set()
+        for trak_type, trak_start, trak_end in _mp4_boxes(f, start, end):
+            if trak_type != b'trak':
+                continue
+            for mdia_type, mdia_start, mdia_end in _mp4_boxes(f, trak_start, trak_end):
+                if mdia_type != b'mdia':
+                    continue
+                for hdlr_type, hdlr_start, _ in _mp4_boxes(f, mdia_start, mdia_end):
+                    if hdlr_type == b'hdlr':
+                        # version/flags and pre_defined come before the handler type
+                        f.seek(hdlr_start + 8)
+                        types.add(f.read(4))
+        return types
+    return None
+
+
+def _sniff_matroska(data):
+    container = 'webm' if b'webm' in data[:64] else 'matroska'
+    has_audio = MATROSKA_AUDIO_CODEC.search(data) is not None
+    has_video = MATROSKA_VIDEO_CODEC.search(data) is not None
+    if not (has_audio or has_video):
+        # Tracks not within the sniffed bytes: treat it like a video, let probing decide
+        return _result(container, True, None)
+    return _result(container, has_video, has_audio)
+
+
+def _sniff_mpeg_audio(data, after_tag):
+    pos = find_sync(data)
+    # Without an ID3 tag the frames must start the file (allowing zero padding),
+    # or any binary file with two plausible frame headers would pass
+    if pos is None or not (after_tag or not data[:pos].strip(b'\x00')):
+        return None
+    layer = parse_frame_header(data[pos:pos + 4])['layer']
+    return _result('mp3' if layer == 3 else 'mpeg_audio', False)
+
+
+def sniff_bytes(data, after_tag=False):
+    """
+    Classify media from its leading bytes.
+
+    Args:
+        data (bytes): Start of the file (after any ID3v2 tag)
+        after_tag (bool): ``data`` follows an ID3v2 tag
+
+    Returns:
+        dict: ``container``, ``is_video`` and ``has_audio`` (None when the
+              header doesn't tell), or None if the bytes aren't a known
+              media format
+    """
+    if data[:4] == b'fLaC':
+        return _result('flac', False)
+    if data[:4] in (b'RIFF', b'RF64') and data[8:12] == b'WAVE':
+        return _result('wav', False)
+    if data[:4] == b'RIFF' and data[8:12] == b'AVI ':
+        return _result('avi', True, b'auds' in data or None)
+    if data[:4] == b'FORM' and data[8:12] in (b'AIFF', b'AIFC'):
+        return _result('aiff', False)
+    if data[4:8] == b'ftyp':
+        return _sniff_mp4(data)
+    if data[:4] == b'\x1a\x45\xdf\xa3':
+        return _sniff_matroska(data)
+    if data[:4] == b'OggS':
+        has_video = any(codec in data for codec in OGG_VIDEO_CODECS)
+        return _result('ogg', has_video, any(codec in data for codec in OGG_AUDIO_CODECS))
+    if data[:16] == ASF_HEADER_GUID:
+        return _result('asf', ASF_VIDEO_MEDIA_GUID in data, ASF_AUDIO_MEDIA_GUID in data)
+    if data[:3] == b'FLV' and len(data) > 4:
+        return _result('flv', bool(data[4] & 0x01), bool(data[4] & 0x04))
+    if data[:4] == b'\x00\x00\x01\xba':
+        return _result('mpeg_ps', True, None)
+    if len(data) > 2 * TS_PACKET_SIZE and data[0] == data[TS_PACKET_SIZE] == data[2 * TS_PACKET_SIZE] == 0x47:
+        return _result('mpeg_ts', True, None)
+    if data[:1] == b'\xff' and len(data) > 1 and data[1] & 0xF6 == 0xF0:
+        return _result('aac', False)
+    return _sniff_mpeg_audio(data, after_tag)
+
+
+def sniff_media(file_path):
+    """
+    Classify a media file from its first ``SNIFF_BYTES`` (plus any ID3v2 tag).
+    For MP4/MOV the track handlers are read as well, wherever the moov box is.
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        dict: See ``sniff_bytes``; None if the file isn't a known media format
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read(SNIFF_BYTES)
+        tag_size = id3v2_size(data)
+        if tag_size:
+            f.seek(tag_size)
+            data = f.read(SNIFF_BYTES)
+        result = sniff_bytes(data, after_tag=bool(tag_size))
+        if result and result['container'] in ('mp4', 'mov') and not tag_size:
+            types = _mp4_track_types(f)
+            if types is not None:
+                result['has_audio'] = b'soun' in types
+                # Audio brands stay audio: an audiobook's chapter artwork can be a video track
+                result['is_video'] = result['is_video'] and b'vide' in types
+    return result
@@ -0,0 +1,181 @@
+"""
+Bounded-memory splitting: decoded PCM is streamed from one ffmpeg process
+straight into each part's encoder, a fixed-size chunk at a time
+"""
+
+import os
+import tempfile
+import subprocess
+
+from .config import get_ffmpeg_path
+from .ffmpeg_tools import output_targets, target_path, encoder_args, gain_args
+
+PCM_SAMPLE_WIDTH = 2            # s16le
+STREAM_CHUNK_BYTES = 1024 * 1024
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHANNELS = 2
+
+
+def _start(args, stdin=None, stdout=None):
+    """Start ffmpeg with stderr spooled to a temp file (pipes could fill and block)."""
+    ffmpeg = get_ffmpeg_path() or 'ffmpeg'
+    stderr = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        [ffmpeg, '-hide_banner', '-nostdin', '-v', 'error', '-y'] + args,
+        stdin=stdin, stdout=stdout, stderr=stderr
+    )
+    process.stderr_file = stderr
+    return process
+
+
+def _finish(process, description):
+    """Wait for an ffmpeg process and raise with its stderr if it failed."""
+    returncode = process.wait()
+    process.stderr_file.seek(0)
+    errors = process.stderr_file.read().decode(errors='replace').strip()
+    process.stderr_file.close()
+    if returncode != 0:
+        raise RuntimeError(f"{description} failed: {errors}")
+
+
+def open_decoder(input_file, sample_rate, channels):
+    """Start ffmpeg decoding ``input_file``'s audio to raw s16le PCM on stdout."""
+    args = [
+        '-i', input_file, '-map', '0:a:0', '-vn',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate), '-ac', str(channels), 'pipe:1'
+    ]
+    return _start(args, stdout=subprocess.PIPE)
+
+
+def open_encoder(output_path, sample_rate, channels, bitrate='320k', target=None, gain_db=None):
+    """
+    Start ffmpeg encoding raw s16le PCM from stdin to an MP3 file (or to
+    ``target``'s format), scaled by ``gain_db`` if given.
+    """
+    target = target or output_targets(bitrate=bitrate)[0]
+    args = [
+        '-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+        *gain_args(gain_db), *encoder_args(target), target_path(output_path, target)
+    ]
+    return _start(args, stdin=subprocess.PIPE)
+
+
+class PartEncoders:
+    """One encoder per output target for a part, all fed the same PCM."""
+
+    def __init__(self, output_path, sample_rate, channels, bitrate, targets, gain_db=None):
+        self.output_path = output_path
+        self.processes = []
+        for target in targets:
+            self.processes.append(open_encoder(output_path, sample_rate, channels, bitrate, target, gain_db))
+
+    def write(self, data):
+        for process in self.processes:
+            try:
+                process.stdin.write(data)
+            except BrokenPipeError:
+                # The encoder exited early: report its error, not the broken pipe
+                _finish(process, f"Encoding {os.path.basename(self.output_path)}")
+                raise
+
+    def finish(self):
+        for process in self.processes:
+            process.stdin.close()
+        for process in self.processes:
+            _finish(process, f"Encoding {os.path.basename(self.output_path)}")
+        self.processes = []
+
+    def kill(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stderr_file.close()
+        self.processes = []
+
+
+def ms_to_byte_offset(milliseconds, sample_rate, channels):
+    """Byte offset of the sample frame at ``milliseconds`` in s16le PCM."""
+    return int(round(milliseconds * sample_rate / 1000)) * channels * PCM_SAMPLE_WIDTH
+
+
+def stream_split(input_file, ranges_ms, output_paths, sample_rate=None, channels=None,
+                 bitrate='320k', chunk_bytes=STREAM_CHUNK_BYTES, targets=None):
+    """
+    Split a media file into MP3 parts with memory bounded by ``chunk_bytes``.
+
+    The source is decoded once; PCM flows through a single reusable buffer
+    into the encoder of whichever part it belongs to (one encoder per
+    output target, all fed the same chunks).
+
+    Args:
+        input_file (str): Source media file (audio or video)
+        ranges_ms (list): ``(start_ms, end_ms)`` tuples, one per part
+        output_paths (list): Destination path for each part
+        sample_rate (int): Decode sample rate (defaults to 44100)
+        channels (int): Decode channel count (defaults to 2)
+        bitrate (str): MP3 bitrate for the parts
+        chunk_bytes (int): Size of the PCM read buffer
+        targets (list): Output targets (see ``ffmpeg_tools.output_targets``);
+                        defaults to MP3 at ``bitrate``
+
+    Yields:
+        tuple: ``(index, output_path)`` as each part is finished
+    """
+    sample_rate = sample_rate or DEFAULT_SAMPLE_RATE
+    channels = channels or DEFAULT_CHANNELS
+    frame_bytes = channels * PCM_SAMPLE_WIDTH
+    chunk_bytes = max(frame_bytes, chunk_bytes - chunk_bytes % frame_bytes)
+
+    # Byte offset where each part after the first begins; the last runs to EOF
+    boundaries = [ms_to_byte_offset(start, sample_rate, channels) for start, _ in ranges_ms[1:]]
+
+    targets = targets or output_targets(bitrate=bitrate)
+    decoder = open_decoder(input_file, sample_rate, channels)
+    encoders = None
+    buffer = bytearray(chunk_bytes)
+    view = memoryview(buffer)
+    position = 0
+    part = 0
+
+    try:
+        encoders = PartEncoders(output_paths[0], sample_rate, channels, bitrate, targets)
+        while True:
+            size = decoder.stdout.readinto(buffer)
+            if not size:
+                break
+
+            offset = 0
+            while offset < size:
+                limit = boundaries[part] if part < len(boundaries) else None
+                take = size - offset
+                if limit is not None:
+                    take = min(take, limit - position)
+
+                if take > 0:
+                    encoders.write(view[offset:offset + take])
+                    offset += take
+                    position += take
+
+                if limit is not None and position >= limit:
+                    encoders.finish()
+                    encoders = None
+                    yield part, output_paths[part]
+                    part += 1
+                    encoders = PartEncoders(output_paths[part], sample_rate, channels, bitrate, targets)
+
+        _finish(decoder, "Decoding")
+        encoders.finish()
+        encoders = None
+        # Checked before the last yield: a caller that stops after the parts it expects still sees it
+        if part != len(output_paths) - 1:
+            raise RuntimeError(f"Source ended after {part + 1} of {len(output_paths)} parts")
+        yield part, output_paths[part]
+    finally:
+        if decoder.poll() is None:
+            decoder.kill()
+            decoder.wait()
+            decoder.stderr_file.close()
+        if encoders is not None:
+            encoders.kill()
@@ -3,38 +3,47 @@ Enhanced utility functions for video and audio processing
 """
 
 import os
-from pydub import AudioSegment
+import logging
+from .config import get_audio_segment
+from .probe import probe_media
+from .cache import cached_probe_media
+from .metrics import span
+from .sniff import sniff_media
+
+logger = logging.getLogger(__name__)
 
 def validate_file_path(file_path):
-    """Validate if the file exists and is a supported media format."""
+    """
+    Validate that the file exists and its content is a supported media
+    format with audio, judged from its magic bytes (see ``sniff_media``)
+    rather than its extension.
+    """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
     
-    # Supported formats
-    supported_extensions = [
-        # Video formats
-        '.mp4', '.avi', '.mov', '.wmv', '.mkv', '.flv', '.webm',
-        # Audio formats  
-        '.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg'
-    ]
-    
-    file_ext = os.path.splitext(file_path)[1].lower()
-    if file_ext not in supported_extensions:
-        raise ValueError(f"Unsupported file format: {file_ext}. Supported formats: {', '.join(supported_extensions)}")
+    kind = sniff_media(file_path)
+    if kind is None:
+        raise ValueError(f"Unsupported file format: {os.path.basename(file_path)} is not a recognised "
+                         f"audio or video file")
+    if kind['has_audio'] is False:
+        raise ValueError(f"No audio stream found in {os.path.basename(file_path)} ({kind['container']})")
     
     return True
 
 def is_video_file(file_path):
-    """Check if file is a supported video format."""
-    video_extensions = ['.mp4', '.avi', '.mov', '.wmv', '.mkv', '.flv', '.webm']
-    file_ext = os.path.splitext(file_path)[1].lower()
-    return file_ext in video_extensions
+    """Check if the file's content is a video container."""
+    kind = sniff_media(file_path)
+    return bool(kind and kind['is_video'])
 
 def is_audio_file(file_path):
-    """Check if file is a supported audio format."""
-    audio_extensions = ['.mp3', '.wav', '.flac', '.m4a', '.aac', '.ogg']
-    file_ext = os.path.splitext(file_path)[1].lower()
-    return file_ext in audio_extensions
+    """Check if the file's content is an audio-only format."""
+    kind = sniff_media(file_path)
+    return bool(kind and not kind['is_video'])
+
+def is_mp3_file(file_path):
+    """Check if the file's content is an MP3 (MPEG-1/2 Layer III) stream."""
+    kind = sniff_media(file_path)
+    return bool(kind and kind['container'] == 'mp3')
 
 def convert_video_to_mp3(input_file, output_file=None, bitrate='320k'):
     """
@@ -52,19 +61,21 @@ def convert_video_to_mp3(input_file, output_file=None, bitrate='320k'):
         base_name = os.path.splitext(input_file)[0]
         output_file = f"{base_name}_converted.mp3"
     
-    print(f"🎥 Converting video to audio: {os.path.basename(input_file)}")
-    print(f"   Input: {input_file}")
-    print(f"   Output: {output_file}")
-    print(f"   Quality: {bitrate}")
+    logger.info(f"🎥 Converting video to audio: {os.path.basename(input_file)}")
+    logger.info(f"   Input: {input_file}")
+    logger.info(f"   Output: {output_file}")
+    logger.info(f"   Quality: {bitrate}")
     
     try:
-        # Load video and extract audio
-        video = AudioSegment.from_file(input_file)
-        
-        # Export as MP3 with specified quality
-        video.export(output_file, format="mp3", bitrate=bitrate)
+        with span('convert', file=os.path.basename(input_file)) as convert:
+            # Load video and extract audio
+            video = get_audio_segment().from_file(input_file)
+            
+            # Export as MP3 with specified quality
+            video.export(output_file, format="mp3", bitrate=bitrate)
+            convert['bytes'] = os.path.getsize(output_file)
         
-        print(f"✅ Conversion successful: {os.path.basename(output_file)}")
+        logger.info(f"✅ Conversion successful: {os.path.basename(output_file)}")
         return output_file
         
     except Exception as e:
@@ -76,6 +87,85 @@ def calculate_part_duration(audio_duration, num_parts):
         raise ValueError("Number of parts must be greater than 0")
     return audio_duration / num_parts
 
+def calculate_part_ranges(audio_duration, num_parts, sample_rate=None):
+    """
+    Calculate (start, end) times in milliseconds for equal-length parts.
+    The last part always runs to the end of the audio.
+    
+    With ``sample_rate``, cut points are whole samples and part lengths
+    differ by at most one sample.
+    """
+    if sample_rate:
+        total_samples = round(audio_duration * sample_rate / 1000)
+        cuts = [sample_time_ms(total_samples * i // num_parts, sample_rate) for i in range(1, num_parts)]
+        return ranges_from_cut_points(cuts, audio_duration)
+    
+    part_duration = calculate_part_duration(audio_duration, num_parts)
+    ranges = []
+    for i in range(num_parts):
+        start_time = int(i * part_duration)
+        end_time = int((i + 1) * part_duration)
+        if i == num_parts - 1:
+            end_time = audio_duration
+        ranges.append((start_time, end_time))
+    return ranges
+
+def ranges_from_cut_points(cut_points, audio_duration):
+    """Turn ordered cut points (ms) into (start, end) ranges covering the audio."""
+    starts = [0] + list(cut_points)
+    ends = list(cut_points) + [audio_duration]
+    return list(zip(starts, ends))
+
+def sample_time_ms(sample, sample_rate):
+    """Time in milliseconds of sample number ``sample``."""
+    return sample * 1000 / sample_rate
+
+def snap_to_sample(milliseconds, sample_rate, round_down=False):
+    """
+    Move a time in milliseconds onto the nearest sample boundary (or the
+    one at or before it with ``round_down``).
+    """
+    position = milliseconds * sample_rate / 1000
+    # Tolerate float error so a sample's own time maps back to it
+    sample = int(position + 1e-6) if round_down else round(position)
+    return sample_time_ms(sample, sample_rate)
+
+def snap_ranges_to_samples(ranges, sample_rate):
+    """
+    Move the times of (start, end) ranges onto the nearest sample boundary.
+    The end of the last range (the end of the audio) is kept as it is.
+    """
+    snapped = [(snap_to_sample(start, sample_rate), snap_to_sample(end, sample_rate)) for start, end in ranges]
+    if snapped:
+        snapped[-1] = (snapped[-1][0], ranges[-1][1])
+    return snapped
+
+def parse_bitrate(bitrate):
+    """Convert an FFmpeg bitrate such as ``'320k'`` to bits per second."""
+    text = str(bitrate).strip().lower()
+    multiplier = 1
+    if text.endswith('k'):
+        text, multiplier = text[:-1], 1000
+    elif text.endswith('m'):
+        text, multiplier = text[:-1], 1000000
+    try:
+        bits = float(text) * multiplier
+    except ValueError:
+        raise ValueError(f"Invalid bitrate: {bitrate}")
+    if bits <= 0:
+        raise ValueError(f"Invalid bitrate: {bitrate}")
+    return int(bits)
+
+def duration_for_bytes(max_bytes, bitrate, overhead_bytes=0):
+    """
+    Longest duration in milliseconds whose constant-bitrate encode fits in
+    ``max_bytes`` after ``overhead_bytes`` of headers and tags.
+    """
+    usable = max_bytes - overhead_bytes
+    if usable <= 0:
+        raise ValueError(f"Maximum part size must be larger than {overhead_bytes} bytes")
+    return usable * 8 * 1000 / parse_bitrate(bitrate)
+
 def create_output_directory(input_file):
     """Create output directory based on input filename."""
     base_name = os.path.splitext(os.path.basename(input_file))[0]
@@ -100,13 +190,19 @@ def get_file_size(file_path):
 def get_media_duration(file_path):
     """Get duration of video or audio file in milliseconds."""
     try:
-        media = AudioSegment.from_file(file_path)
+        return probe_media(file_path)['duration_ms']
+    except RuntimeError:
+        pass
+    
+    # Last resort: decode the whole file
+    try:
+        media = get_audio_segment().from_file(file_path)
         return len(media)
     except Exception as e:
         raise RuntimeError(f"Cannot get duration of {file_path}: {str(e)}")
 
-def get_file_info(file_path):
-    """Get comprehensive information about media file."""
+def get_file_info(file_path, use_cache=True):
+    """Get comprehensive information about media file (probe results are cached on disk)."""
     file_ext = os.path.splitext(file_path)[1].lower()
     file_size = get_file_size(file_path)
     
@@ -119,9 +215,24 @@ def get_file_info(file_path):
         'is_audio': is_audio_file(file_path),
     }
     
+    # Probe headers for duration and stream parameters (no decoding)
+    try:
+        with span('probe', file=info['file_name']):
+            probe = cached_probe_media(file_path, use_cache)
+        info.update({
+            'codec': probe['codec'],
+            'sample_rate': probe['sample_rate'],
+            'channels': probe['channels'],
+            'bit_rate': probe['bit_rate'],
+        })
+        duration_ms = probe['duration_ms']
+    except RuntimeError:
+        duration_ms = None
+    
     # Get duration if possible
     try:
-        duration_ms = get_media_duration(file_path)
+        if duration_ms is None:
+            duration_ms = get_media_duration(file_path)
         duration_seconds = duration_ms / 1000
         info.update({
             'duration_ms': duration_ms,
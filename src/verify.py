@@ -0,0 +1,101 @@
+"""
+Split verification: decoded back to back, the parts must hold exactly the
+source's samples
+"""
+
+import os
+import tempfile
+import subprocess
+
+from .config import get_ffmpeg_path
+from .probe import probe_media
+
+COUNT_CHUNK_BYTES = 1024 * 1024
+# Samples counted as mono s16le
+COUNT_SAMPLE_BYTES = 2
+# Allowed difference per part for lossy formats whose length ffmpeg can't keep exact:
+# it decodes AAC in MP4 to whole 1024-sample frames, ignoring the end of the edit
+# list, and its libvorbis encoder can end a part a sample off depending on framing
+FORMAT_TOLERANCE_SAMPLES = {'aac': 1023, 'vorbis': 1}
+
+
+def count_samples(file_path, sample_rate=None):
+    """
+    Decode ``file_path``'s audio and count its samples per channel, the way
+    a gapless player sees it (encoder delay and padding removed).
+
+    Args:
+        file_path (str): Media file to decode
+        sample_rate (int): Resample to this rate first (optional)
+
+    Returns:
+        int: Number of decoded samples
+    """
+    cmd = [get_ffmpeg_path() or 'ffmpeg', '-hide_banner', '-nostdin', '-v', 'error',
+           '-i', file_path, '-map', '0:a:0', '-vn', '-ac', '1']
+    if sample_rate:
+        cmd += ['-ar', str(sample_rate)]
+    cmd += ['-f', 's16le', 'pipe:1']
+
+    total = 0
+    # stderr is spooled to a file so a chatty ffmpeg can't block on a full pipe
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr_file)
+        with process.stdout:
+            # Counted chunk by chunk: memory stays flat however long the file is
+            for chunk in iter(lambda: process.stdout.read(COUNT_CHUNK_BYTES), b''):
+                total += len(chunk)
+        if process.wait() != 0:
+            stderr_file.seek(0)
+            errors = stderr_file.read().decode(errors='replace').strip()
+            raise RuntimeError(f"Decoding {os.path.basename(file_path)} failed: {errors}")
+    return total // COUNT_SAMPLE_BYTES
+
+
+def verify_split(input_file, output_files, ranges_ms, tolerance_samples=0):
+    """
+    Check that the parts of a split join up to the source: each part must
+    decode to the samples of its range and, together, to the source's total.
+    The source is decoded once, each part once.
+
+    Args:
+        input_file (str): Source media file (audio or video)
+        output_files (list): Part files, in order
+        ranges_ms (list): ``(start_ms, end_ms)`` of each part; the last part
+                          runs to the end of the source
+        tolerance_samples (int): Allowed difference per part (and that much
+                                 per part in total)
+
+    Returns:
+        dict: ``ok``, ``sample_rate``, ``source_samples``, ``part_samples``,
+              ``difference`` and per-part ``parts`` (``file``, ``expected``,
+              ``actual``)
+    """
+    # Compare at the parts' rate (an encoder may have resampled the source)
+    sample_rate = probe_media(output_files[0])['sample_rate']
+    source_rate = probe_media(input_file)['sample_rate']
+    if source_rate != sample_rate:
+        # Resampling can round each part's length by a sample
+        tolerance_samples = max(tolerance_samples, 1)
+
+    source_samples = count_samples(input_file, sample_rate)
+    starts = [round(start * sample_rate / 1000) for start, _ in ranges_ms] + [source_samples]
+    parts = []
+    for i, output_file in enumerate(output_files):
+        parts.append({
+            'file': os.path.basename(output_file),
+            'expected': starts[i + 1] - starts[i],
+            'actual': count_samples(output_file, sample_rate),
+        })
+
+    part_samples = sum(part['actual'] for part in parts)
+    ok = (abs(part_samples - source_samples) <= tolerance_samples * len(parts) and
+          all(abs(part['actual'] - part['expected']) <= tolerance_samples for part in parts))
+    return {
+        'ok': ok,
+        'sample_rate': sample_rate,
+        'source_samples': source_samples,
+        'part_samples': part_samples,
+        'difference': part_samples - source_samples,
+        'parts': parts,
+    }
@@ -11,10 +11,3 @@ __version__ = "2.0.0"
 __author__ = "Isaac Tetteh-Apotey"
 __email__ = "life2allsofts@gmail.com"
 __description__ = "Self-configuring MP3 file splitting tool"
-
-# Auto-run self-test on package import
-try:
-    from src.self_test import run_self_test
-    run_self_test()
-except ImportError:
-    print("⚠️  Self-test module not available")
\ No newline at end of file
@@ -0,0 +1,1117 @@
+"""
+Unit tests for the splitter's parsing, planning and measuring code, on
+synthetic data (no ffmpeg needed, except for the tests marked
+``requires_ffmpeg``, which are skipped without it)
+"""
+
+import os
+import json
+import time
+import inspect
+import logging
+import struct
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src import config
+from src.config import get_ffmpeg_path
+from src.mp3_frames import parse_frame_header, MP3FrameIndex, DECODER_DELAY, MAX_TAG_DELAY
+from src.manifest import SplitManifest, partial_path, MANIFEST_FILE
+from src.chapters import parse_cue_sheet, load_chapters
+from src.sniff import sniff_bytes, sniff_media
+from src.probe import probe_mp3_headers
+from src.ffmpeg_tools import parse_output, output_targets, target_path, segment_groups, SEGMENT_PART_CHARS
+from src.utils import validate_file_path, is_video_file, is_mp3_file
+from src.loudness import LoudnessMeter, normalization_gains
+from src.silence import quietest_point, ANALYSIS_SAMPLE_RATE
+from src.peaks import PeakIndex, PEAK_BIN_SIZES
+from src.cache import (
+    MediaCache, file_fingerprint, HASH_BLOCK_SIZE, CACHE_LIMIT_ENV, DEFAULT_CACHE_LIMIT_MB
+)
+from src import batch as batch_module
+from src.batch import BatchProcessor
+from src.server import JobServer, JobRequestHandler
+from src.mp3_splitter import MediaProcessor, ENCODED_PART_OVERHEAD_BYTES
+from src.utils import (
+    parse_bitrate, duration_for_bytes, calculate_part_ranges, snap_to_sample, snap_ranges_to_samples
+)
+from src import scheduler
+from src.scheduler import EncoderScheduler, RETUNE_DROP
+
+requires_ffmpeg = pytest.mark.skipif(get_ffmpeg_path() is None, reason="MediaProcessor needs FFmpeg configured")
+
+
+# MPEG-1 Layer III, no CRC, 128 kbps, 44100 Hz, stereo: 417-byte frames
+MPEG1_HEADER = bytes((0xFF, 0xFB, 0x90, 0x00))
+MPEG1_FRAME_SIZE = 417
+SIDE_INFO_END = 4 + 32
+
+
+def mp3_frame(main_data_begin=0):
+    """One silent frame whose side info points ``main_data_begin`` bytes back into the reservoir."""
+    side_info = bytes(((main_data_begin >> 1) & 0xFF, (main_data_begin & 1) << 7)) + bytes(30)
+    return MPEG1_HEADER + side_info + bytes(MPEG1_FRAME_SIZE - SIDE_INFO_END)
+
+
+def write_mp3(path, frame_count, delay=576, padding=1000, main_data_begin=0):
+    """An Info/LAME tag frame recording ``delay`` and ``padding``, then ``frame_count`` audio frames."""
+    info = bytearray(mp3_frame())
+    info[SIDE_INFO_END:SIDE_INFO_END + 8] = b'Info' + bytes(4)
+    lame = bytearray(36)
+    lame[:9] = b'LAME3.100'
+    lame[21:24] = ((delay << 12) | padding).to_bytes(3, 'big')
+    info[SIDE_INFO_END + 8:SIDE_INFO_END + 44] = lame
+    with open(path, 'wb') as f:
+        f.write(info)
+        for _ in range(frame_count):
+            f.write(mp3_frame(main_data_begin))
+    return str(path)
+
+
+def test_parse_frame_header_mpeg1_layer3():
+    header = parse_frame_header(MPEG1_HEADER)
+    assert header['version_bits'] == 3
+    assert header['layer'] == 3
+    assert header['bitrate'] == 128
+    assert header['sample_rate'] == 44100
+    assert header['samples_per_frame'] == 1152
+    assert header['frame_size'] == MPEG1_FRAME_SIZE
+    assert header['channels'] == 2
+    assert not header['has_crc']
+
+
+def test_parse_frame_header_padding_crc_and_mono():
+    header = parse_frame_header(bytes((0xFF, 0xFA, 0x92, 0xC0)))
+    assert header['frame_size'] == MPEG1_FRAME_SIZE + 1
+    assert header['has_crc']
+    assert header['channels'] == 1
+
+
+@pytest.mark.parametrize("header, sample_rate, bitrate, frame_size", [
+    (bytes((0xFF, 0xF3, 0x80, 0x00)), 22050, 64, 208),   # MPEG-2
+    (bytes((0xFF, 0xE3, 0x80, 0x00)), 11025, 64, 417),   # MPEG-2.5
+])
+def test_parse_frame_header_lower_sampling_frequencies(header, sample_rate, bitrate, frame_size):
+    parsed = parse_frame_header(header)
+    assert parsed['layer'] == 3
+    assert parsed['sample_rate'] == sample_rate
+    assert parsed['bitrate'] == bitrate
+    assert parsed['samples_per_frame'] == 576
+    assert parsed['frame_size'] == frame_size
+
+
+@pytest.mark.parametrize("header", [
+    bytes((0xFF, 0xFB, 0x00, 0x00)),   # free format (bitrate index 0)
+    bytes((0xFF, 0xFB, 0xF0, 0x00)),   # bitrate index 15
+    bytes((0xFF, 0xEB, 0x90, 0x00)),   # reserved version
+    bytes((0xFF, 0xF9, 0x90, 0x00)),   # reserved layer
+    bytes((0xFF, 0xFB, 0x9C, 0x00)),   # reserved sample rate
+    bytes((0xFE, 0xFB, 0x90, 0x00)),   # no sync word
+    MPEG1_HEADER[:3],                   # truncated
+])
+def test_parse_frame_header_rejects_invalid(header):
+    assert parse_frame_header(header) is None
+
+
+def test_frame_index_reads_lame_delay_and_padding(tmp_path):
+    index = MP3FrameIndex(write_mp3(tmp_path / "tagged.mp3", 100, delay=576, padding=1000))
+    assert index.frame_count == 100
+    assert index.encoder_delay == 576
+    assert index.encoder_padding == 1000
+    assert index.sample_count == 100 * 1152 - 576 - 1000
+
+
+def test_frame_ranges_trim_to_exact_samples(tmp_path):
+    index = MP3FrameIndex(write_mp3(tmp_path / "tagged.mp3", 100))
+    ranges = [(0, 1000), (1000, 2000), (2000, index.duration_ms)]
+    expected_ends = [index.sample_at(1000), index.sample_at(2000), index.sample_count]
+
+    frame_ranges = index.frame_ranges(ranges)
+    start = 0
+    for (start_frame, end_frame, delay, padding), end in zip(frame_ranges, expected_ends):
+        # The tag's delay and padding leave exactly the part's samples
+        assert (end_frame - start_frame) * 1152 - delay - padding == end - start
+        assert DECODER_DELAY <= delay <= MAX_TAG_DELAY
+        assert padding >= DECODER_DELAY
+        start = end
+    # The last part runs to the last frame and keeps the source's own padding
+    assert frame_ranges[-1][1] == index.frame_count
+    assert frame_ranges[-1][3] == 1000
+
+
+def test_frame_ranges_include_bit_reservoir_preroll(tmp_path):
+    plain = MP3FrameIndex(write_mp3(tmp_path / "plain.mp3", 100))
+    # 300 bytes reach back into the previous frame's 381 bytes of main data
+    borrowing = MP3FrameIndex(write_mp3(tmp_path / "reservoir.mp3", 100, main_data_begin=300))
+    ranges = [(0, 1000), (1000, plain.duration_ms)]
+
+    plain_start, _, plain_delay, _ = plain.frame_ranges(ranges)[1]
+    start_frame, _, delay, _ = borrowing.frame_ranges(ranges)[1]
+    assert start_frame == plain_start - 1
+    assert delay == plain_delay + 1152
+
+
+def test_frame_ranges_preroll_stays_within_tag_delay(tmp_path):
+    # The whole 9-bit reservoir: more preroll than a LAME tag's delay can always describe
+    index = MP3FrameIndex(write_mp3(tmp_path / "reservoir.mp3", 100, main_data_begin=511))
+    for start_frame, end_frame, delay, padding in index.frame_ranges([(0, 700), (700, 1300), (1300, 2600)]):
+        assert 0 <= delay <= MAX_TAG_DELAY
+
+
+SETTINGS = {'num_parts': 3, 'mode': 'copy', 'bitrate': '320k'}
+RANGES = [(0, 1000), (1000, 2000), (2000, 3000)]
+PART_FILES = ['part_001.mp3', 'part_002.mp3', 'part_003.mp3']
+
+
+def make_manifest(tmp_path):
+    source = tmp_path / "source.mp3"
+    source.write_bytes(b"source audio")
+    return SplitManifest.create(str(tmp_path), str(source), SETTINGS, RANGES, PART_FILES, 3000), str(source)
+
+
+def test_partial_path_keeps_the_extension():
+    assert partial_path(os.path.join("out", "part_001.mp3")) == os.path.join("out", "part_001.partial.mp3")
+    assert partial_path("part_001.opus") == "part_001.partial.opus"
+    assert partial_path("part_001") == "part_001.partial"
+
+
+def test_manifest_save_and_load(tmp_path):
+    manifest, source = make_manifest(tmp_path)
+    (tmp_path / "part_001.mp3").write_bytes(b"audio")
+    manifest.mark_done(0, [str(tmp_path / "part_001.mp3")])
+    manifest.save()
+
+    loaded = SplitManifest.load(str(tmp_path))
+    assert loaded.ranges == RANGES
+    assert loaded.part_files == PART_FILES
+    assert loaded.duration_ms == 3000
+    assert loaded.matches(source, SETTINGS)
+    assert [part['status'] for part in loaded.data['parts']] == ['done', 'pending', 'pending']
+
+
+def test_manifest_load_rejects_missing_and_foreign_files(tmp_path):
+    assert SplitManifest.load(str(tmp_path)) is None
+    (tmp_path / MANIFEST_FILE).write_text("not json")
+    assert SplitManifest.load(str(tmp_path)) is None
+    (tmp_path / MANIFEST_FILE).write_text(json.dumps({'version': 1}))
+    assert SplitManifest.load(str(tmp_path)) is None
+
+
+def test_manifest_is_stale_after_source_or_settings_change(tmp_path):
+    manifest, source = make_manifest(tmp_path)
+    assert not manifest.matches(source, dict(SETTINGS, num_parts=4))
+    with open(source, 'ab') as f:
+        f.write(b" edited")
+    assert not manifest.matches(source, SETTINGS)
+
+
+def test_manifest_detects_checksum_mismatch(tmp_path):
+    manifest, _ = make_manifest(tmp_path)
+    for name in PART_FILES:
+        (tmp_path / name).write_bytes(b"audio of " + name.encode())
+        manifest.mark_done(PART_FILES.index(name), [str(tmp_path / name)])
+    assert manifest.pending_parts() == []
+
+    # Same size, different content: only the checksum can tell
+    (tmp_path / "part_002.mp3").write_bytes(b"audio of part_002.mp4")
+    os.remove(tmp_path / "part_003.mp3")
+    assert not manifest.part_is_valid(1)
+    assert manifest.pending_parts() == [1, 2]
+    assert manifest.data['parts'][1]['status'] == 'pending'
+
+
+@requires_ffmpeg
+def test_split_resumes_only_missing_and_corrupt_parts(tmp_path):
+    source = write_mp3(tmp_path / "source.mp3", 200)
+    output_dir = str(tmp_path / "parts")
+    _, output_files = MediaProcessor(source, use_cache=False).split_media(3, output_dir, mode='copy')
+    kept, missing, corrupt = output_files
+    os.utime(kept, (0, 0))
+    os.remove(missing)
+    with open(corrupt, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\x01")
+
+    _, resumed_files = MediaProcessor(source, use_cache=False).split_media(3, output_dir, mode='copy')
+    assert resumed_files == output_files
+    assert os.stat(kept).st_mtime == 0   # not rewritten
+    manifest = SplitManifest.load(output_dir)
+    assert manifest.pending_parts() == []
+
+
+def write_cgroup_file(root, relative_path, content):
+    path = root / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content + "\n")
+
+
+@pytest.mark.parametrize("cpu_max, expected", [
+    ("max 100000", None),
+    ("150000 100000", 1.5),
+])
+def test_cgroup_v2_limit(tmp_path, monkeypatch, cpu_max, expected):
+    monkeypatch.setattr(scheduler, 'CGROUP_ROOT', str(tmp_path))
+    write_cgroup_file(tmp_path, "app/cpu.max", cpu_max)
+    assert scheduler._cgroup_v2_limit("/app") == expected
+
+
+def test_cgroup_v2_limit_takes_tightest_ancestor(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, 'CGROUP_ROOT', str(tmp_path))
+    write_cgroup_file(tmp_path, "cpu.max", "max 100000")
+    write_cgroup_file(tmp_path, "pod/cpu.max", "200000 100000")
+    write_cgroup_file(tmp_path, "pod/app/cpu.max", "50000 100000")
+    write_cgroup_file(tmp_path, "pod/app/worker/cpu.max", "max 100000")
+    assert scheduler._cgroup_v2_limit("/pod/app/worker") == 0.5
+
+
+@pytest.mark.parametrize("controller, path", [
+    ("cpu", "docker/abc"),
+    ("cpu,cpuacct", "docker/abc"),
+    ("cpu", ""),   # no cgroup namespace: the group is mounted at the controller root
+])
+def test_cgroup_v1_limit(tmp_path, monkeypatch, controller, path):
+    monkeypatch.setattr(scheduler, 'CGROUP_ROOT', str(tmp_path))
+    write_cgroup_file(tmp_path, os.path.join(controller, path, "cpu.cfs_quota_us"), "250000")
+    write_cgroup_file(tmp_path, os.path.join(controller, path, "cpu.cfs_period_us"), "100000")
+    assert scheduler._cgroup_v1_limit("/docker/abc") == 2.5
+
+
+def test_cgroup_v1_limit_unlimited(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, 'CGROUP_ROOT', str(tmp_path))
+    write_cgroup_file(tmp_path, "cpu/cpu.cfs_quota_us", "-1")
+    write_cgroup_file(tmp_path, "cpu/cpu.cfs_period_us", "100000")
+    assert scheduler._cgroup_v1_limit("/") is None
+    assert scheduler._cgroup_v1_limit("/missing") is None
+
+
+@pytest.mark.parametrize("proc_cgroup, expected", [
+    ("0::/app", 1.5),
+    ("12:memory:/docker/abc\n4:cpu,cpuacct:/docker/abc", 2.5),
+    ("12:memory:/docker/abc", None),
+    ("", None),
+])
+def test_cgroup_cpu_limit(tmp_path, monkeypatch, proc_cgroup, expected):
+    monkeypatch.setattr(scheduler, 'CGROUP_ROOT', str(tmp_path))
+    write_cgroup_file(tmp_path, "app/cpu.max", "150000 100000")
+    write_cgroup_file(tmp_path, "cpu,cpuacct/docker/abc/cpu.cfs_quota_us", "250000")
+    write_cgroup_file(tmp_path, "cpu,cpuacct/docker/abc/cpu.cfs_period_us", "100000")
+    read = scheduler._read
+    monkeypatch.setattr(scheduler, '_read', lambda path: proc_cgroup if path == '/proc/self/cgroup' else read(path))
+    assert scheduler.cgroup_cpu_limit() == expected
+
+
+def tuning_scheduler(concurrency, max_workers=8):
+    sc = EncoderScheduler(16)
+    sc.concurrency, sc.max_workers = concurrency, max_workers
+    return sc
+
+
+def test_scheduler_climbs_while_throughput_improves():
+    sc = tuning_scheduler(2)
+    for rate, next_concurrency in [(10.0, 3), (14.0, 4), (18.0, 5)]:
+        sc._adjust(rate)
+        assert sc.concurrency == next_concurrency
+    assert not sc.settled
+
+
+def test_scheduler_reverses_once_then_settles():
+    sc = tuning_scheduler(4)
+    sc._adjust(20.0)
+    assert sc.concurrency == 5
+    # One more encoder does not help: try one fewer than the best
+    sc._adjust(20.5)
+    assert sc.reversed and sc.concurrency == 3
+    sc._adjust(16.0)
+    assert sc.settled and sc.concurrency == 4
+    assert sc.best == (20.0, 4)
+
+
+def test_scheduler_stays_within_max_workers():
+    sc = tuning_scheduler(2, max_workers=2)
+    sc._adjust(10.0)
+    assert sc.reversed and sc.concurrency == 1
+    sc._adjust(6.0)
+    assert sc.settled and sc.concurrency == 2
+
+
+def test_scheduler_retunes_after_throughput_drop():
+    sc = tuning_scheduler(4)
+    for rate in (20.0, 20.5, 16.0):
+        sc._adjust(rate)
+    assert sc.settled and sc.concurrency == 4
+
+    # A small dip keeps the setting
+    sc._adjust(20.0 * (1 - RETUNE_DROP) + 0.5)
+    assert sc.settled and sc.concurrency == 4
+
+    sc._adjust(10.0)
+    assert not sc.settled
+    assert sc.best == (10.0, 4)
+    # The new search starts in the direction the last one ended with
+    assert sc.concurrency == 3
+    sc._adjust(12.0)
+    assert sc.concurrency == 2
+
+
+CUE_SHEET = '''REM GENRE Jazz
+PERFORMER "The Band"
+TITLE "Live Album"
+FILE "album.flac" WAVE
+  TRACK 01 AUDIO
+    TITLE "Opening"
+    INDEX 01 00:00:00
+  TRACK 02 AUDIO
+    TITLE "Second Song"
+    PERFORMER "Guest Singer"
+    INDEX 00 03:58:50
+    INDEX 01 04:00:37
+  TRACK 03 AUDIO
+    TITLE "Encore"
+    INDEX 01 10:02:74
+'''
+
+
+def test_parse_cue_sheet(tmp_path):
+    cue = tmp_path / "album.cue"
+    cue.write_text(CUE_SHEET)
+    tracks = parse_cue_sheet(str(cue))
+    assert tracks == [
+        {'title': 'Opening', 'performer': 'The Band', 'start_ms': 0},
+        # INDEX 01 is the start, not the pregap's INDEX 00; 37 frames of 1/75 s
+        {'title': 'Second Song', 'performer': 'Guest Singer', 'start_ms': 240493},
+        {'title': 'Encore', 'performer': 'The Band', 'start_ms': 602987},
+    ]
+
+
+def test_parse_cue_sheet_rejects_several_files(tmp_path):
+    cue = tmp_path / "album.cue"
+    cue.write_text(CUE_SHEET + 'FILE "bonus.flac" WAVE\n  TRACK 04 AUDIO\n    INDEX 01 00:00:00\n')
+    with pytest.raises(ValueError, match="several files"):
+        parse_cue_sheet(str(cue))
+
+
+def test_parse_cue_sheet_requires_index_01(tmp_path):
+    cue = tmp_path / "album.cue"
+    cue.write_text(CUE_SHEET.replace("INDEX 01 04:00:37", "INDEX 02 04:00:37"))
+    with pytest.raises(ValueError, match="track 2 has no INDEX 01"):
+        parse_cue_sheet(str(cue))
+
+
+def test_load_chapters_finds_cue_next_to_media(tmp_path):
+    media = tmp_path / "album.flac"
+    media.write_bytes(b"")
+    (tmp_path / "album.cue").write_text(CUE_SHEET)
+    chapters = load_chapters(str(media), 700000)
+    assert chapters == [
+        {'title': 'The Band - Opening', 'start_ms': 0, 'end_ms': 240493},
+        {'title': 'Guest Singer - Second Song', 'start_ms': 240493, 'end_ms': 602987},
+        {'title': 'The Band - Encore', 'start_ms': 602987, 'end_ms': 700000},
+    ]
+
+
+def test_load_chapters_drops_tracks_past_the_end(tmp_path):
+    cue = tmp_path / "sheet.cue"
+    cue.write_text(CUE_SHEET)
+    chapters = load_chapters(str(tmp_path / "other.flac"), 500000, cue_file=str(cue))
+    assert [(c['start_ms'], c['end_ms']) for c in chapters] == [(0, 240493), (240493, 500000)]
+
+
+def id3v2_tag(payload_size=100):
+    """An ID3v2.4 header whose syncsafe size covers ``payload_size`` bytes of padding."""
+    size = bytes((payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b'ID3\x04\x00\x00' + size + bytes(payload_size)
+
+
+def wav_header():
+    fmt = struct.pack('<HHIIHH', 1, 2, 44100, 44100 * 4, 4, 16)
+    return b'RIFF' + struct.pack('<I', 36) + b'WAVE' + b'fmt ' + struct.pack('<I', 16) + fmt + b'data' + bytes(4)
+
+
+def mp4_header(brand, extra=b''):
+    return struct.pack('>I', 24) + b'ftyp' + brand + bytes(4) + b'isomiso2' + extra
+
+
+def matroska_header(*codec_ids):
+    tracks = b''.join(b'\x86' + bytes((0x80 | len(codec),)) + codec for codec in codec_ids)
+    return b'\x1a\x45\xdf\xa3\x9f\x42\x82\x88matroska' + bytes(16) + tracks
+
+
+@pytest.mark.parametrize("data, container, is_video, has_audio", [
+    (mp3_frame() * 3, 'mp3', False, True),
+    (wav_header(), 'wav', False, True),
+    (b'fLaC' + bytes(38), 'flac', False, True),
+    (mp4_header(b'M4A '), 'mp4', False, True),
+    (mp4_header(b'isom'), 'mp4', True, None),           # tracks are in the moov box
+    (mp4_header(b'qt  ', b'hdlrsoun'), 'mov', True, True),
+    (matroska_header(b'V_VP9', b'A_OPUS'), 'matroska', True, True),
+    (matroska_header(b'A_FLAC'), 'matroska', False, True),
+    (matroska_header(), 'matroska', True, None),         # no tracks within the sniffed bytes
+])
+def test_sniff_bytes_containers(data, container, is_video, has_audio):
+    assert sniff_bytes(data) == {'container': container, 'is_video': is_video, 'has_audio': has_audio}
+
+
+def test_sniff_bytes_mp3_after_id3_tag(tmp_path):
+    # Garbage before the first frame is only accepted after an ID3v2 tag
+    data = b'\x01\x02junk' + mp3_frame() * 3
+    assert sniff_bytes(data) is None
+    assert sniff_bytes(data, after_tag=True)['container'] == 'mp3'
+
+    path = tmp_path / "tagged.mp3"
+    path.write_bytes(id3v2_tag() + mp3_frame() * 3)
+    assert sniff_media(str(path))['container'] == 'mp3'
+
+
+@pytest.mark.parametrize("data", [
+    b'',
+    b'plain text, not media' * 10,
+    b'RIFF' + bytes(4) + b'XYZW',
+    mp3_frame()[:4] + bytes(1000),   # a lone frame header in a binary file
+])
+def test_sniff_bytes_rejects_other_data(data):
+    assert sniff_bytes(data) is None
+
+
+def test_sniff_media_ignores_the_extension(tmp_path):
+    wav_named_mp3 = tmp_path / "song.mp3"
+    wav_named_mp3.write_bytes(wav_header() + bytes(1000))
+    assert sniff_media(str(wav_named_mp3))['container'] == 'wav'
+    assert not is_mp3_file(str(wav_named_mp3))
+
+    text_named_mp4 = tmp_path / "movie.mp4"
+    text_named_mp4.write_text("not a video")
+    assert not is_video_file(str(text_named_mp4))
+    with pytest.raises(ValueError, match="Unsupported file format"):
+        validate_file_path(str(text_named_mp4))
+
+
+def sine(level_dbfs, seconds, sample_rate=48000, frequency=1000):
+    """A stereo int16 sine whose peak is ``level_dbfs``."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    wave = 10 ** (level_dbfs / 20) * 32767 * np.sin(2 * np.pi * frequency * t)
+    return np.repeat(wave[:, None], 2, axis=1).astype(np.int16)
+
+
+def measure(*signals, sample_rate=48000):
+    meter = LoudnessMeter(sample_rate, 2)
+    for i, samples in enumerate(signals):
+        if i:
+            meter.next_part()
+        meter.feed(samples)
+    return meter.result()
+
+
+@pytest.mark.parametrize("sample_rate", [44100, 48000])
+def test_loudness_meter_reference_sine(sample_rate):
+    # BS.1770: a 1 kHz sine at -23 dBFS in both channels reads -23 LUFS
+    result = measure(sine(-23, 10, sample_rate), sample_rate=sample_rate)
+    assert result['integrated'] == pytest.approx(-23, abs=0.05)
+    assert result['parts'][0]['peak'] == pytest.approx(-23, abs=0.01)
+
+
+def test_loudness_meter_gates_silence():
+    tone = sine(-23, 5)
+    silence = np.zeros_like(tone)
+    result = measure(tone, silence, tone)
+    # Silence falls under the absolute gate and doesn't pull the average down
+    # (only the few blocks straddling an edge, part tone and part silence, do)
+    assert result['integrated'] == pytest.approx(-23, abs=0.2)
+    assert result['parts'][1] == {'loudness': None, 'peak': None}
+    assert result['parts'][2]['loudness'] == pytest.approx(-23, abs=0.05)
+
+
+def test_loudness_meter_relative_gate():
+    # A quiet passage 30 LU down is below the relative gate (-10 LU)
+    result = measure(sine(-23, 5), sine(-53, 5), sine(-23, 5))
+    assert result['integrated'] == pytest.approx(-23, abs=0.2)
+    # Measured on its own (about 73 LSB of amplitude, hence the int16 rounding)
+    assert result['parts'][1]['loudness'] == pytest.approx(-53, abs=0.1)
+
+
+def test_normalization_gains_leave_silent_parts_alone():
+    tone = sine(-33, 5)
+    gains = normalization_gains(measure(tone, np.zeros_like(tone), tone))
+    assert gains[0] == gains[2] == {'gain_db': 10.0, 'limited': False}
+    assert gains[1] == {'gain_db': 0.0, 'limited': False}
+
+
+def speech_like(duration_ms, pauses, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """A loud mono int16 tone with digital silence over each ``(start_ms, end_ms)`` of ``pauses``."""
+    t = np.arange(duration_ms * sample_rate // 1000) / sample_rate
+    samples = (10000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+    for start_ms, end_ms in pauses:
+        samples[start_ms * sample_rate // 1000:end_ms * sample_rate // 1000] = 0
+    return samples
+
+
+def test_quietest_point_cuts_in_the_middle_of_the_pause():
+    # Window 10-14 s of the source; the pause is off-centre, so the cut moves to it
+    samples = speech_like(4000, [(2400, 2800)])
+    assert quietest_point(samples, 10000, 12000, 10500, 13500) == 12600
+
+
+def test_quietest_point_prefers_the_pause_nearest_the_nominal_cut():
+    samples = speech_like(4000, [(1200, 1600), (2200, 2600)])
+    assert quietest_point(samples, 10000, 12000, 10500, 13500) == 12400
+
+
+def test_quietest_point_tie_goes_to_the_earlier_pause():
+    samples = speech_like(4000, [(1400, 1800), (2200, 2600)])
+    assert quietest_point(samples, 10000, 12000, 10500, 13500) == 11600
+
+
+def test_quietest_point_stays_within_bounds():
+    # A pause running past ``low_ms`` is cut inside the allowed range
+    samples = speech_like(4000, [(0, 800)])
+    cut = quietest_point(samples, 10000, 12000, 10500, 13500)
+    assert 10500 <= cut < 10800
+
+
+def test_quietest_point_window_clamped_at_file_edges():
+    # Last window: the file ends at 12.5 s, before ``high_ms``
+    samples = speech_like(2500, [(1800, 2100)])
+    assert quietest_point(samples, 10000, 12000, 10500, 13500) == 11950
+    # First window starts at the top of the file
+    samples = speech_like(3000, [(600, 1000)])
+    assert quietest_point(samples, 0, 1500, 0, 3000) == 800
+
+
+def test_quietest_point_without_audio_keeps_the_nominal_cut():
+    assert quietest_point(np.zeros(0, np.int16), 10000, 12000.4, 10500, 13500) == 12000
+    # Decoded audio entirely outside the allowed range
+    assert quietest_point(speech_like(400, [(0, 400)]), 10000, 12000, 11000, 13000) == 12000
+
+
+def peak_index(samples, sample_rate=44100):
+    """A mono ``PeakIndex`` built from ``samples`` the way ``PeakIndex.build`` bins them."""
+    levels = {}
+    for bin_size in PEAK_BIN_SIZES:
+        padded = np.pad(samples, (0, -len(samples) % bin_size), mode='edge').reshape(-1, bin_size)
+        levels[bin_size] = (padded.min(axis=1), padded.max(axis=1))
+    return PeakIndex(levels, sample_rate, len(samples))
+
+
+def constant_levels(frame_count):
+    """Levels holding a different constant per bin size, to see which one ``columns`` reads."""
+    levels = {}
+    for number, bin_size in enumerate(PEAK_BIN_SIZES, 1):
+        count = -(-frame_count // bin_size)
+        levels[bin_size] = (np.full(count, -1000 * number, np.int16), np.full(count, 1000 * number, np.int16))
+    return PeakIndex(levels, 44100, frame_count)
+
+
+@pytest.mark.parametrize("start, end, width, bin_size", [
+    (0, 1_000_000, 10, 65536),       # a whole long file: the coarsest level
+    (0, 1_000_000, 200, 4096),
+    (0, 1_000_000, 1000, 256),
+    (500_000, 510_000, 1000, 256),   # zoomed in past the finest bin
+])
+def test_peak_columns_pick_the_coarsest_sufficient_level(start, end, width, bin_size):
+    index = constant_levels(1_000_000)
+    mins, maxs = index.columns(start, end, width)
+    number = PEAK_BIN_SIZES.index(bin_size) + 1
+    assert len(mins) == len(maxs) == width
+    assert np.all(maxs == 1000 * number / 32768)
+    assert np.all(mins == -1000 * number / 32768)
+
+
+def test_peak_columns_fold_bins_into_columns():
+    samples = np.zeros(65536 * 4, np.int16)
+    samples[70000] = 20000
+    samples[200000] = -16384
+    index = peak_index(samples)
+    mins, maxs = index.columns(0, len(samples), 4)
+    assert list(maxs) == [0, 20000 / 32768, 0, 0]
+    assert list(mins) == [0, 0, 0, -0.5]
+    # The same peaks at a finer level land in the matching columns
+    mins, maxs = index.columns(0, len(samples), 64)
+    assert np.flatnonzero(maxs).tolist() == [70000 // 4096]
+    assert np.flatnonzero(mins).tolist() == [200000 // 4096]
+
+
+def test_peak_columns_view_wider_than_the_audio():
+    samples = np.full(8192, 8192, np.int16)
+    index = peak_index(samples)
+    mins, maxs = index.columns(0, 32768, 8)
+    # 4096 samples per column: the first two columns hold the audio, the rest are empty
+    assert maxs.tolist() == [0.25, 0.25] + [0.0] * 6
+    assert mins.tolist() == [0.25, 0.25] + [0.0] * 6
+    # A view starting past the end is all empty
+    mins, maxs = index.columns(20000, 30000, 5)
+    assert not maxs.any() and not mins.any()
+
+
+def test_media_cache_keeps_decoded_pcm(tmp_path):
+    source = tmp_path / "source.mp3"
+    source.write_bytes(b"source audio")
+    pcm = tmp_path / "decoded.pcm"
+    pcm.write_bytes(bytes(4000))
+    cache = MediaCache(str(tmp_path / "cache"), max_bytes=10000)
+
+    assert cache.get_pcm(str(source), 44100, 2) is None
+    cached = cache.put_pcm(str(source), 44100, 2, str(pcm))
+    assert cache.get_pcm(str(source), 44100, 2) == cached
+    assert open(cached, 'rb').read() == bytes(4000)
+    # Another decode format is another entry
+    assert cache.get_pcm(str(source), 48000, 2) is None
+
+    # More than half the cache: not kept, rather than evicting everything else
+    pcm.write_bytes(bytes(6000))
+    assert cache.put_pcm(str(source), 22050, 1, str(pcm)) is None
+    assert cache.get_pcm(str(source), 22050, 1) is None
+
+
+def test_batch_needs_a_part_count_or_a_limit(tmp_path):
+    with pytest.raises(ValueError, match="Number of parts"):
+        BatchProcessor([str(tmp_path / "a.mp3")], str(tmp_path / "out"))
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("options", [
+    {'num_parts': 3},
+    {'cut_points_ms': [5000, 10000]},
+    {'max_part_duration_ms': 60000},
+    {'split_strategy': 'chapters'},
+])
+def test_batch_accepts_every_way_to_place_cuts(tmp_path, options):
+    batch = BatchProcessor([str(tmp_path / "a.mp3")], str(tmp_path / "out"), **options)
+    assert batch.input_files == [str(tmp_path / "a.mp3")]
+
+
+@requires_ffmpeg
+def test_batch_skips_files_that_are_not_media(tmp_path):
+    source_dir = tmp_path / "in"
+    source_dir.mkdir()
+    audio = write_mp3(source_dir / "audio.mp3", 200)
+    (source_dir / "notes.txt").write_text("track list")
+
+    batch = BatchProcessor.from_directory(str(source_dir), output_root=str(tmp_path / "out"), num_parts=2,
+                                          mode='copy')
+    results = batch.run()
+    assert [os.path.basename(result['input_file']) for result in results] == ["audio.mp3", "notes.txt"]
+    assert results[0]['error'] is None and results[0]['skipped'] is None
+    assert len(results[0]['output_files']) == 2
+    assert results[1]['error'] is None
+    assert "Unsupported file format" in results[1]['skipped']
+    assert os.path.isfile(audio)
+
+
+def test_batch_defaults_to_the_split_media_mode():
+    default = inspect.signature(BatchProcessor).parameters['mode'].default
+    assert default == inspect.signature(MediaProcessor.split_media).parameters['mode'].default == 'encode'
+
+
+def test_file_fingerprint_tracks_mtime_and_head_and_tail(tmp_path):
+    path = tmp_path / "source.mp3"
+    data = bytearray(os.urandom(5 * HASH_BLOCK_SIZE))
+    path.write_bytes(data)
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    original = file_fingerprint(str(path))
+    assert file_fingerprint(str(path)) == original
+
+    os.utime(path, ns=(1_000_000_000, 2_000_000_000))
+    assert file_fingerprint(str(path)) != original
+
+    fingerprints = set()
+    for offset in (0, len(data) - 1):
+        changed = bytearray(data)
+        changed[offset] ^= 0xFF
+        path.write_bytes(changed)
+        os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+        fingerprints.add(file_fingerprint(str(path)))
+    assert original not in fingerprints and len(fingerprints) == 2
+
+    # The middle isn't read: same size and mtime, same fingerprint
+    changed = bytearray(data)
+    changed[len(data) // 2] ^= 0xFF
+    path.write_bytes(changed)
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+    assert file_fingerprint(str(path)) == original
+
+
+def test_media_cache_evicts_least_recently_used(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=3000)
+    paths = []
+    for age, name in enumerate(["newest", "middle", "oldest", "kept"]):
+        path = tmp_path / "ab" / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(bytes(1000))
+        os.utime(path, (1000 - age * 100, 1000 - age * 100))
+        paths.append(str(path))
+    (tmp_path / "ab" / "entry.123.tmp").write_bytes(bytes(5000))   # a write in progress
+
+    # 4000 bytes over a 3000 limit: the oldest entry goes, unless it is the one to keep
+    assert cache.evict(keep=paths[3]) == 1000
+    assert [os.path.exists(path) for path in paths] == [True, True, False, True]
+    assert (tmp_path / "ab" / "entry.123.tmp").exists()
+
+    cache.max_bytes = 1000
+    assert cache.evict() == 2000
+    assert [os.path.exists(path) for path in paths] == [True, False, False, False]
+
+
+@pytest.mark.parametrize("value, expected_mb", [
+    (None, DEFAULT_CACHE_LIMIT_MB),
+    ("512", 512),
+    ("1.5", DEFAULT_CACHE_LIMIT_MB),
+    ("lots", DEFAULT_CACHE_LIMIT_MB),
+])
+def test_media_cache_limit_from_environment(tmp_path, monkeypatch, value, expected_mb):
+    if value is None:
+        monkeypatch.delenv(CACHE_LIMIT_ENV, raising=False)
+    else:
+        monkeypatch.setenv(CACHE_LIMIT_ENV, value)
+    assert MediaCache(str(tmp_path)).max_bytes == expected_mb * 1024 * 1024
+
+
+def limited_planner(duration_ms, sample_rate=44100):
+    """A ``MediaProcessor`` holding just what ``plan_limited_ranges`` reads (no probing)."""
+    processor = MediaProcessor.__new__(MediaProcessor)
+    processor.input_file = "source.mp3"
+    processor.duration = duration_ms
+    processor.sample_rate = sample_rate
+    return processor
+
+
+# 160000 bytes of audio at 128 kbps is 10 s
+TEN_SECONDS_AT_128K = ENCODED_PART_OVERHEAD_BYTES + 160000
+
+
+@pytest.mark.parametrize("duration_ms, limits, expected", [
+    (10000, {'max_part_duration_ms': 3000}, [(0, 3000), (3000, 6000), (6000, 9000), (9000, 10000)]),
+    # Within the probed duration's slack of a whole number of parts: no sliver of a last part
+    (9030, {'max_part_duration_ms': 3000}, [(0, 3000), (3000, 6000), (6000, 9030)]),
+    (5000, {'max_part_duration_ms': 6000}, [(0, 5000)]),
+    (25000, {'max_part_bytes': TEN_SECONDS_AT_128K, 'bitrate': '128k'}, [(0, 10000), (10000, 20000), (20000, 25000)]),
+    # The tighter of the two limits wins
+    (25000, {'max_part_bytes': TEN_SECONDS_AT_128K, 'bitrate': '128k', 'max_part_duration_ms': 8000},
+     [(0, 8000), (8000, 16000), (16000, 24000), (24000, 25000)]),
+])
+def test_plan_limited_ranges(duration_ms, limits, expected):
+    assert limited_planner(duration_ms).plan_limited_ranges(**limits) == expected
+
+
+def test_plan_limited_ranges_cuts_on_samples():
+    ranges = limited_planner(12000, sample_rate=48000).plan_limited_ranges(max_part_duration_ms=3333.33)
+    assert len(ranges) == 4
+    for start, end in ranges[:-1]:
+        # Snapped down onto a sample, so a part never passes the limit
+        assert end * 48 == round(end * 48)
+        assert end - start <= 3333.33
+    assert ranges[-1][1] == 12000
+
+
+def test_plan_limited_ranges_exact_bytes_in_copy_mode(tmp_path):
+    index = MP3FrameIndex(write_mp3(tmp_path / "source.mp3", 100))
+    max_bytes = 31 * MPEG1_FRAME_SIZE    # a tag frame and 30 audio frames
+    ranges = limited_planner(index.duration_ms).plan_limited_ranges(max_part_bytes=max_bytes, index=index)
+    assert len(ranges) == 4
+    for start_frame, end_frame, _, _ in index.frame_ranges(ranges):
+        assert (end_frame - start_frame + 1) * MPEG1_FRAME_SIZE <= max_bytes
+
+
+@pytest.mark.parametrize("limits, index_frames, message", [
+    ({'max_part_bytes': ENCODED_PART_OVERHEAD_BYTES}, None, "must be larger than"),
+    ({'max_part_bytes': 2 * MPEG1_FRAME_SIZE - 1}, 100, "too small to hold any audio"),
+])
+def test_plan_limited_ranges_rejects_too_small_limits(tmp_path, limits, index_frames, message):
+    index = MP3FrameIndex(write_mp3(tmp_path / "source.mp3", index_frames)) if index_frames else None
+    with pytest.raises(ValueError, match=message):
+        limited_planner(10000).plan_limited_ranges(index=index, **limits)
+
+
+@pytest.mark.parametrize("bitrate, bits", [
+    ('320k', 320000),
+    (' 64K ', 64000),
+    ('1.5M', 1500000),
+    ('128000', 128000),
+    (96000, 96000),
+])
+def test_parse_bitrate(bitrate, bits):
+    assert parse_bitrate(bitrate) == bits
+
+
+@pytest.mark.parametrize("bitrate", ['fast', '0k', '-128k', ''])
+def test_parse_bitrate_rejects_invalid(bitrate):
+    with pytest.raises(ValueError, match="Invalid bitrate"):
+        parse_bitrate(bitrate)
+
+
+def test_duration_for_bytes():
+    assert duration_for_bytes(40000, '320k') == 1000
+    assert duration_for_bytes(48192, '320k', overhead_bytes=8192) == 1000
+    with pytest.raises(ValueError, match="larger than 8192 bytes"):
+        duration_for_bytes(8192, '320k', overhead_bytes=8192)
+
+
+@pytest.mark.parametrize("duration_ms, num_parts, sample_rate", [
+    (10000, 3, 44100),
+    (3_600_000, 7, 48000),
+    (12345.678, 4, 22050),
+    (1000, 1, 44100),
+    (25, 10, 8000),     # fewer samples per part than a millisecond's worth
+])
+def test_calculate_part_ranges_on_sample_boundaries(duration_ms, num_parts, sample_rate):
+    ranges = calculate_part_ranges(duration_ms, num_parts, sample_rate=sample_rate)
+    assert len(ranges) == num_parts
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == duration_ms
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert snap_to_sample(end, sample_rate) == end
+    total_samples = round(duration_ms * sample_rate / 1000)
+    lengths = [round(end * sample_rate / 1000) - round(start * sample_rate / 1000) for start, end in ranges]
+    assert sum(lengths) == total_samples
+    assert max(lengths) - min(lengths) <= 1
+
+
+def test_calculate_part_ranges_without_sample_rate():
+    assert calculate_part_ranges(10000, 3) == [(0, 3333), (3333, 6666), (6666, 10000)]
+    with pytest.raises(ValueError):
+        calculate_part_ranges(10000, 0)
+
+
+@pytest.mark.parametrize("milliseconds, round_down, expected_sample", [
+    (1000, False, 44100),
+    (1000.01, False, 44100),
+    (1000.02, False, 44101),
+    (1000.02, True, 44100),
+    # A sample's own time, a hair under after float arithmetic, maps back to that sample
+    (44101 * 1000 / 44100, True, 44101),
+])
+def test_snap_to_sample(milliseconds, round_down, expected_sample):
+    assert snap_to_sample(milliseconds, 44100, round_down=round_down) == expected_sample * 1000 / 44100
+
+
+def test_snap_ranges_to_samples_keeps_the_end_of_the_audio():
+    ranges = [(0, 1000.011), (1000.011, 2500.3), (2500.3, 3000.004)]
+    snapped = snap_ranges_to_samples(ranges, 44100)
+    assert snapped[0] == (0, 44100 * 1000 / 44100)
+    assert snapped[1] == (44100 * 1000 / 44100, snap_to_sample(2500.3, 44100))
+    assert snapped[-1] == (snap_to_sample(2500.3, 44100), 3000.004)
+    assert snap_ranges_to_samples([], 44100) == []
+
+
+def job_server(tmp_path):
+    """A ``JobServer`` without started workers, so queued jobs stay queued."""
+    return JobServer(state_dir=str(tmp_path / "state"), output_root=str(tmp_path / "out"), workers=1)
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("request_fields, message", [
+    ({'num_parts': 3, 'colour': 'blue'}, "Unknown job options: colour"),
+    ({'num_parts': 3, 'mode': 'fast'}, "Unknown split mode: fast"),
+    ({'type': 'transcode'}, "Unknown job type: transcode"),
+    ({'input_file': 'missing.mp3'}, "Input file not found: missing.mp3"),
+    ({'input_file': None}, "Input file not found"),
+])
+def test_job_server_rejects_invalid_requests(tmp_path, request_fields, message):
+    server = job_server(tmp_path)
+    request = dict({'input_file': write_mp3(tmp_path / "talk.mp3", 10)}, **request_fields)
+    with pytest.raises(ValueError, match=message):
+        server.submit(request)
+    with pytest.raises(ValueError, match="JSON object"):
+        server.submit(["talk.mp3"])
+    assert server.store.list() == [] and server.queue.qsize() == 0
+
+
+@requires_ffmpeg
+def test_job_server_requeues_interrupted_jobs(tmp_path):
+    server = job_server(tmp_path)
+    source = write_mp3(tmp_path / "talk.mp3", 10)
+    queued = server.submit({'input_file': source, 'num_parts': 2})
+    running = server.submit({'input_file': source, 'num_parts': 3, 'mode': 'copy'})
+    finished = server.submit({'input_file': source, 'num_parts': 4})
+    server.store.update(running['id'], status='running', started=time.time(), progress={'fraction': 0.5})
+    server.store.update(finished['id'], status='done', finished=time.time())
+
+    restarted = job_server(tmp_path)
+    jobs = {job['id']: job for job in restarted.store.list()}
+    assert jobs[queued['id']]['options'] == {'num_parts': 2, 'mode': 'segment'}
+    assert jobs[running['id']]['status'] == 'queued'
+    assert jobs[running['id']]['started'] is None and jobs[running['id']]['progress'] is None
+    assert jobs[finished['id']]['status'] == 'done'
+    # Oldest first
+    assert [restarted.queue.get_nowait() for _ in range(2)] == [queued['id'], running['id']]
+    assert restarted.queue.empty()
+
+
+@requires_ffmpeg
+def test_job_server_cancel(tmp_path):
+    server = job_server(tmp_path)
+    source = write_mp3(tmp_path / "talk.mp3", 10)
+    queued = server.submit({'input_file': source, 'num_parts': 2})
+    running = server.submit({'input_file': source, 'num_parts': 2})
+    server.store.update(running['id'], status='running', started=time.time())
+
+    assert server.cancel(queued['id'])
+    assert server.store.get(queued['id'])['status'] == 'cancelled'
+    # A running job stops at its next progress point; the request survives a restart
+    assert server.cancel(running['id'])
+    assert server.cancel_events[running['id']].is_set()
+    assert server.store.get(running['id'])['cancel_requested']
+    with pytest.raises(KeyError):
+        server.cancel("no-such-job")
+
+    restarted = job_server(tmp_path)
+    assert restarted.store.get(running['id'])['status'] == 'cancelled'
+    assert restarted.queue.empty()
+    assert not restarted.cancel(running['id'])
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("status, code", [('queued', 202), ('running', 202), ('done', 409), ('failed', 409)])
+def test_job_server_delete_answers(tmp_path, status, code):
+    server = job_server(tmp_path)
+    job = server.submit({'input_file': write_mp3(tmp_path / "talk.mp3", 10), 'num_parts': 2})
+    server.store.update(job['id'], status=status)
+
+    sent = []
+    handler = JobRequestHandler.__new__(JobRequestHandler)
+    handler.server = SimpleNamespace(job_server=server)
+    handler._send = lambda status, body: sent.append((status, body))
+    handler.path = f"/jobs/{job['id']}"
+    handler.do_DELETE()
+    handler.path = "/jobs/no-such-job"
+    handler.do_DELETE()
+    assert [answer for answer, _ in sent] == [code, 404]
+
+
+def xing_frame(frame_count, byte_count, delay=576, padding=1000):
+    """A Xing tag frame with frame and byte counts and a LAME extension."""
+    frame = bytearray(mp3_frame())
+    lame = bytearray(36)
+    lame[:9] = b'LAME3.100'
+    lame[21:24] = ((delay << 12) | padding).to_bytes(3, 'big')
+    tag = b'Xing' + struct.pack('>III', 0x03, frame_count, byte_count) + lame
+    frame[SIDE_INFO_END:SIDE_INFO_END + len(tag)] = tag
+    return bytes(frame)
+
+
+def test_probe_mp3_headers_uses_the_xing_frame_count(tmp_path):
+    path = tmp_path / "vbr.mp3"
+    path.write_bytes(xing_frame(200, 201 * MPEG1_FRAME_SIZE) + mp3_frame() * 200)
+    info = probe_mp3_headers(str(path))
+    # Gapless length: the LAME delay and padding are not audio
+    samples = 200 * 1152 - 576 - 1000
+    assert info['duration_ms'] == round(samples * 1000 / 44100)
+    assert info['bit_rate'] == int(201 * MPEG1_FRAME_SIZE * 8 * 1000 / (samples * 1000 / 44100))
+    assert (info['sample_rate'], info['channels'], info['codec']) == (44100, 2, 'mp3')
+    assert info['probe_method'] == 'mp3_headers'
+
+
+@pytest.mark.parametrize("prefix, suffix", [
+    (b'', b''),
+    (id3v2_tag(1000), b''),
+    (id3v2_tag(1000), b'TAG' + bytes(125)),   # ID3v1 at the end
+])
+def test_probe_mp3_headers_cbr_from_payload_size(tmp_path, prefix, suffix):
+    path = tmp_path / "cbr.mp3"
+    path.write_bytes(prefix + mp3_frame() * 100 + suffix)
+    info = probe_mp3_headers(str(path))
+    # 100 frames of 417 bytes at 128 kbps; tags are not audio
+    assert info['duration_ms'] == round(100 * MPEG1_FRAME_SIZE * 8 / 128)
+    assert info['bit_rate'] == 128000
+
+
+def test_probe_mp3_headers_rejects_non_mpeg_data(tmp_path):
+    path = tmp_path / "notes.mp3"
+    path.write_text("not audio " * 100)
+    with pytest.raises(ValueError, match="No MPEG audio frames"):
+        probe_mp3_headers(str(path))
+
+
+def test_batch_schedules_largest_first(tmp_path, monkeypatch):
+    durations = {'short.mp3': 60_000, 'long.mp4': 3_600_000, 'medium.wav': 600_000}
+    sizes = {'unprobed_big.mp3': 5000, 'unprobed_small.mp3': 10}
+    for name, size in sizes.items():
+        (tmp_path / name).write_bytes(bytes(size))
+
+    def probe(path):
+        name = os.path.basename(path)
+        if name not in durations:
+            raise RuntimeError("probe failed")
+        return {'duration_ms': durations[name]}
+
+    monkeypatch.setattr(batch_module, 'cached_probe_media', probe)
+    batch = BatchProcessor.__new__(BatchProcessor)
+    batch.input_files = [str(tmp_path / name) for name in ['short.mp3', 'long.mp4', 'medium.wav']]
+    order = [os.path.basename(path) for path in batch.schedule()]
+    assert order == ['long.mp4', 'medium.wav', 'short.mp3']
+
+    # Without a probed duration the file size stands in (bytes against milliseconds)
+    mixed = [str(tmp_path / name) for name in ['unprobed_small.mp3', 'short.mp3', 'unprobed_big.mp3']]
+    order = [os.path.basename(path) for path in batch.schedule(mixed)]
+    assert order == ['short.mp3', 'unprobed_big.mp3', 'unprobed_small.mp3']
+    assert batch.schedule([]) == []
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ('mp3', ('mp3', '320k', 'libmp3lame', '.mp3')),
+    ('opus:64k', ('opus', '64k', 'libopus', '.opus')),
+    (' AAC:128k ', ('aac', '128k', 'aac', '.m4a')),
+    ('vorbis:', ('vorbis', '320k', 'libvorbis', '.ogg')),
+    ({'format': 'opus'}, ('opus', '320k', 'libopus', '.opus')),
+    ({'format': 'MP3', 'bitrate': '192k'}, ('mp3', '192k', 'libmp3lame', '.mp3')),
+])
+def test_parse_output(spec, expected):
+    target = parse_output(spec)
+    assert (target['format'], target['bitrate'], target['codec'], target['extension']) == expected
+
+
+@pytest.mark.parametrize("spec", ['flac', 'wav:1411k', {'bitrate': '64k'}, ''])
+def test_parse_output_rejects_unknown_formats(spec):
+    with pytest.raises(ValueError, match="Unknown output format"):
+        parse_output(spec)
+
+
+def test_output_targets():
+    assert [t['format'] for t in output_targets()] == ['mp3']
+    assert output_targets(bitrate='128k')[0]['bitrate'] == '128k'
+    targets = output_targets(['mp3:320k', 'opus:64k'], bitrate='128k')
+    assert [(t['format'], t['bitrate']) for t in targets] == [('mp3', '320k'), ('opus', '64k')]
+    assert target_path(os.path.join("out", "part_001.mp3"), targets[1]) == os.path.join("out", "part_001.opus")
+
+
+def test_output_targets_reject_duplicate_formats():
+    # The parts of both would share file names
+    with pytest.raises(ValueError, match="only once: mp3, opus"):
+        output_targets(['mp3:320k', 'opus:64k', 'MP3:128k', {'format': 'opus'}])
+
+
+PART_PATHS = [f"p{i:02d}.mp3" for i in range(10)]   # 7 characters each
+PART_COST = len(PART_PATHS[0]) + SEGMENT_PART_CHARS
+
+
+@pytest.mark.parametrize("options, expected", [
+    ({}, [(0, 10)]),
+    ({'max_chars': 3 * PART_COST}, [(0, 3), (3, 6), (6, 9), (9, 10)]),
+    ({'max_chars': 3 * PART_COST, 'outputs_per_part': 2}, [(i, i + 1) for i in range(10)]),
+    # Spread over at least min_groups groups of similar size
+    ({'min_groups': 3}, [(0, 4), (4, 8), (8, 10)]),
+    ({'min_groups': 5}, [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10)]),
+    ({'min_groups': 20}, [(i, i + 1) for i in range(10)]),
+    # The command-line limit still applies when it allows fewer parts per group
+    ({'min_groups': 2, 'max_chars': 4 * PART_COST}, [(0, 4), (4, 8), (8, 10)]),
+    # A part over the limit on its own still gets a group
+    ({'max_chars': PART_COST - 1}, [(i, i + 1) for i in range(10)]),
+])
+def test_segment_groups(options, expected):
+    assert segment_groups(PART_PATHS, **options) == expected
+
+
+def test_failed_ffmpeg_discovery_is_remembered(monkeypatch, caplog):
+    searches = []
+    monkeypatch.setitem(config._FFMPEG_CACHE, 'ffmpeg', None)
+    monkeypatch.setitem(config._FFMPEG_CACHE, 'ffprobe', None)
+    monkeypatch.setitem(config._FFMPEG_CACHE, 'search_failed', False)
+    monkeypatch.setattr(config, '_load_discovery_cache', lambda project_root: False)
+    monkeypatch.setattr(config, 'find_ffmpeg_automatically', lambda: searches.append(1) and False)
+
+    with caplog.at_level(logging.INFO, logger=config.logger.name):
+        assert [config.get_ffmpeg_path() for _ in range(3)] == [None, None, None]
+        assert not config.setup_ffmpeg()
+    assert len(searches) == 1
+    assert sum("Could not auto-configure FFmpeg" in record.message for record in caplog.records) == 1